@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dw_etl.instrumentation.InstrumentationMiddleware', # primero: mide toda la solicitud
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,3 +132,74 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Caché local de respuestas de la API del Banco Mundial (populate_dw --cache / --replay)
+ETL_HTTP_CACHE_PATH = BASE_DIR / '.etl_cache' / 'worldbank.sqlite3'
+ETL_HTTP_CACHE_TTL = 24 * 60 * 60 # segundos
+ETL_HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Versión de los datos (dw_etl/versioning.py), compartida por el servidor web y populate_dw:
+# cada carga la incrementa e invalida lo cacheado y las exportaciones pre-generadas. Es un
+# archivo y no una entrada de la caché para que un desalojo no la pierda
+DATA_VERSION_PATH = BASE_DIR / '.etl_cache' / 'version_datos'
+
+# Caché de Django (dashboard y respuestas de la API, con la versión de los datos en la clave)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.etl_cache' / 'django',
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = 7 * 24 * 60 * 60 # segundos
+
+# Exportaciones pre-generadas (dw_etl/artifacts.py): directorio, exportaciones que populate_dw
+# genera después de cada carga (formato, filtros; las únicas que se guardan en disco, cualquier
+# otro filtro se genera en cada solicitud) e hilos del proceso web que generan en segundo plano
+# las de EXPORT_PREBUILD que se piden y no existen (0 lo desactiva: se envían en streaming)
+EXPORT_ARTIFACTS_DIR = BASE_DIR / '.etl_cache' / 'exportaciones'
+EXPORT_PREBUILD = [('xlsx', {}), ('csv', {}), ('json', {})]
+EXPORT_WORKERS = 2
+# Con 'X-Sendfile' (Apache, lighttpd) o 'X-Accel-Redirect' (nginx) el servidor web envía el archivo
+# y Django solo responde las cabeceras. Para nginx, EXPORT_SENDFILE_URL es la location interna
+# (`internal`) que apunta a EXPORT_ARTIFACTS_DIR
+EXPORT_SENDFILE = None
+EXPORT_SENDFILE_URL = '/exportaciones-internas/'
+
+# Detector de episodios de devaluación con recesión (dw_etl/crisis.py, comando detect_crisis)
+CRISIS_UMBRAL_DEVALUACION = 20.0 # % de alza interanual del tipo de cambio
+CRISIS_ANIOS_RECESION = 1 # años seguidos de crecimiento negativo del PIB
+CRISIS_MARGEN_ANIOS = 1 # años antes de la recesión en que aún cuenta la devaluación
+
+# Línea base de los benchmarks (manage.py benchmark --save-baseline / --compare)
+BENCHMARK_BASELINE_PATH = BASE_DIR / 'benchmarks' / 'baseline.json'
+
+# Máximo de consultas SQL por vista (nombre de la URL), con la caché vacía. El middleware de
+# instrumentación registra un warning al superarlo y los tests lo verifican para cada vista
+VIEW_QUERY_BUDGETS = {
+    'dashboard': 10,
+    'home': 10,
+    'export_excel': 1,
+    'export_csv': 1,
+    'export_json': 1,
+    'export_parquet': 1,
+    'export_arrow': 1,
+    'api_series': 2,
+    'api_analitica': 2,
+    'api_crisis': 2,
+    'api_correlaciones': 2,
+    'api_etl': 1,
+    'metrics': 0,
+}
+
+# Log JSON de cada solicitud (logger dw_etl.instrumentation): por defecto solo las que superan
+# su presupuesto de consultas; con DW_LOG_LEVEL=INFO, todas
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'dw_etl': {'handlers': ['console'], 'level': os.environ.get('DW_LOG_LEVEL', 'WARNING')},
+    },
+}
@@ -0,0 +1,136 @@
+# dw_etl/analytics.py
+"""
+Analítica sobre los valores anuales de los hechos: rankings, percentiles, variación
+interanual y medias móviles.
+
+Todo se calcula en la base de datos con funciones de ventana (`Window` con `Rank`,
+`PercentRank`, `Lag` y `Avg` sobre un marco de filas) sobre el valor anual de cada país
+e indicador (el promedio de los períodos en las series trimestrales y mensuales). Un
+ranking de todos los años e indicadores es una sola consulta: la ventana se particiona
+por (año, indicador) y el filtro por puesto se aplica sobre el resultado.
+"""
+from django.db.models import Avg, F, FloatField, Func, RowRange, Window
+from django.db.models.functions import Cast, Lag, PercentRank, Rank
+
+from .exports import ITERATOR_CHUNK_SIZE, ExportFilterError, filter_hechos
+from .models import HechosEconomicos
+
+# Países por defecto en cada extremo del ranking
+DEFAULT_TOP = 5
+MAX_TOP = 100
+
+# Años por defecto de la media móvil
+DEFAULT_VENTANA = 3
+MAX_VENTANA = 50
+
+ORDENES = ('asc', 'desc')
+
+# Columnas de cada fila de resultado
+CAMPOS = {
+    'anio': 'anio',
+    'codigo_iso': 'id_pais__codigo_iso',
+    'pais': 'id_pais__nombre_pais',
+    'indicador': 'id_indicador__nombre_indicador',
+}
+
+
+class MediaVentana(Func):
+    """
+    AVG como función de ventana sobre el valor anual, que ya es un agregado: `Avg` no
+    admite agregados anidados, aunque `AVG(AVG(valor)) OVER (...)` es SQL válido.
+    """
+    function = 'AVG'
+    window_compatible = True
+    output_field = FloatField()
+
+
+def annual_values(hechos=None):
+    """
+    Valor anual (float) de cada (año, país, indicador) de un queryset de hechos.
+    """
+    hechos = HechosEconomicos.objects.all() if hechos is None else hechos
+    return hechos.values('anio', 'id_pais', 'id_indicador').annotate(
+        valor_anual=Cast(Avg('valor'), FloatField())
+    ).filter(valor_anual__isnull=False)
+
+
+def rankings(hechos=None, top=DEFAULT_TOP, orden='asc'):
+    """
+    Los `top` países con menor (`asc`) o mayor (`desc`) valor de cada año e indicador,
+    con su puesto (los empates comparten puesto) y su percentil dentro del año.
+    Devuelve un queryset de diccionarios.
+    """
+    valor = F('valor_anual').asc() if orden == 'asc' else F('valor_anual').desc()
+    por_anio = {'partition_by': [F('anio'), F('id_indicador')], 'order_by': valor}
+    return annual_values(hechos).annotate(
+        puesto=Window(Rank(), **por_anio),
+        percentil=Window(PercentRank(), partition_by=por_anio['partition_by'], order_by=F('valor_anual').asc()),
+    ).filter(puesto__lte=top).values(
+        *CAMPOS.values(), 'valor_anual', 'puesto', 'percentil'
+    ).order_by('id_indicador__nombre_indicador', '-anio', 'puesto', 'id_pais__nombre_pais')
+
+
+def series_metrics(hechos=None, ventana=DEFAULT_VENTANA):
+    """
+    Cada valor anual con el valor del año anterior con dato de la serie (`anterior`) y
+    la media móvil de los últimos `ventana` valores (`media_movil`).
+    Devuelve un queryset de diccionarios ordenado por serie y año.
+
+    La variación interanual (`valor_anual - anterior`) se calcula al leer las filas: una
+    expresión sobre la ventana terminaría en el GROUP BY, y SQLite no lo admite.
+    """
+    por_serie = {'partition_by': [F('id_pais'), F('id_indicador')], 'order_by': F('anio').asc()}
+    return annual_values(hechos).annotate(
+        anterior=Window(Lag('valor_anual'), **por_serie),
+        media_movil=Window(MediaVentana('valor_anual'), frame=RowRange(start=-(ventana - 1), end=0), **por_serie),
+    ).values(
+        *CAMPOS.values(), 'valor_anual', 'anterior', 'media_movil'
+    ).order_by('id_pais__nombre_pais', 'id_indicador__nombre_indicador', 'anio')
+
+
+def _entero(params, nombre, defecto, maximo):
+    valor = params.get(nombre) or defecto
+    try:
+        valor = int(valor)
+    except (TypeError, ValueError):
+        raise ExportFilterError(f'El parámetro {nombre} debe ser un entero, no {valor!r}.')
+    if not 1 <= valor <= maximo:
+        raise ExportFilterError(f'El parámetro {nombre} debe estar entre 1 y {maximo}.')
+    return valor
+
+
+def _filas(queryset, columnas):
+    """
+    Filas de un queryset de `rankings` o `series_metrics` con los nombres de la API.
+    """
+    nombres = {campo: nombre for nombre, campo in CAMPOS.items()}
+    nombres['valor_anual'] = 'valor'
+    for fila in queryset.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        if 'anterior' in fila:
+            anterior = fila.pop('anterior')
+            fila['variacion'] = fila['valor_anual'] - anterior if anterior is not None else None
+        yield {nombres.get(clave, clave): fila[clave] for clave in columnas}
+
+
+def analytics_report(params):
+    """
+    Resultado de la API de analítica para una QueryDict con los filtros de exportación
+    (`pais`, `indicador`, `desde`, `hasta`) y:
+
+    - tipo=ranking (por defecto): `top` (1-100) y `orden` ('asc' o 'desc').
+    - tipo=series: `ventana` (años de la media móvil, 1-50).
+    """
+    tipo = params.get('tipo', 'ranking')
+    hechos = filter_hechos(params)
+    if tipo == 'ranking':
+        orden = params.get('orden', 'asc')
+        if orden not in ORDENES:
+            raise ExportFilterError("El parámetro orden debe ser 'asc' o 'desc'.")
+        top = _entero(params, 'top', DEFAULT_TOP, MAX_TOP)
+        columnas = [*CAMPOS.values(), 'valor_anual', 'puesto', 'percentil']
+        return {'tipo': tipo, 'orden': orden, 'top': top, 'filas': list(_filas(rankings(hechos, top, orden), columnas))}
+    if tipo == 'series':
+        ventana = _entero(params, 'ventana', DEFAULT_VENTANA, MAX_VENTANA)
+        columnas = [*CAMPOS.values(), 'valor_anual', 'variacion', 'media_movil']
+        return {'tipo': tipo, 'ventana': ventana, 'filas': list(_filas(series_metrics(hechos, ventana), columnas))}
+    raise ExportFilterError("El parámetro tipo debe ser 'ranking' o 'series'.")
@@ -0,0 +1,255 @@
+# dw_etl/artifacts.py
+"""
+Exportaciones pre-generadas (Excel, CSV, JSON y NDJSON) guardadas en disco.
+
+Cada archivo se guarda en EXPORT_ARTIFACTS_DIR/<versión de los datos>/ con un nombre
+que depende del formato y de los filtros (`pais`, `indicador`, `desde`, `hasta`): una
+exportación ya generada se sirve como un archivo hasta que la siguiente carga del ETL
+cambia la versión. La versión se guarda en un archivo (ver `dw_etl.versioning`), así que
+vaciar o desalojar la caché de Django no deja inalcanzables los artefactos.
+
+- `populate_dw` genera al terminar los artefactos de EXPORT_PREBUILD y borra los de
+  versiones anteriores; el comando `build_exports` hace lo mismo a pedido.
+- Las vistas sirven el archivo si existe. Si no existe y sus filtros son de los de
+  EXPORT_PREBUILD, Excel y CSV lo generan en la solicitud y JSON se envía en streaming
+  mientras el archivo se encarga a `builder`, un pool de hilos del proceso web
+  (EXPORT_WORKERS).
+- Cualquier otra combinación de filtros se genera en cada solicitud sin guardarse
+  (Excel y CSV en un archivo temporal, JSON en streaming): las combinaciones a pedido
+  no tienen límite y llenarían el disco.
+
+Los archivos se escriben con un nombre temporal y se renombran al terminar, así que
+nunca se sirve un artefacto a medio escribir.
+"""
+import hashlib
+import json
+import logging
+import os
+import io
+import shutil
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.http import QueryDict
+
+from .exports import SPOOL_MAX_SIZE, _anio, _indicadores_pivote, _lista, filter_pivot, write_csv, write_excel, write_json
+from .versioning import data_version
+
+logger = logging.getLogger(__name__)
+
+Formato = namedtuple('Formato', 'extension content_type')
+
+FORMATOS_ARTEFACTO = {
+    'xlsx': Formato('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': Formato('csv', 'text/csv; charset=utf-8'),
+    'json': Formato('json', 'application/json; charset=utf-8'),
+    'ndjson': Formato('ndjson', 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def artifact_filters(params):
+    """
+    Filtros de exportación de una QueryDict en forma canónica (sin repetidos, ordenados
+    y sin los vacíos): dos solicitudes con los mismos filtros comparten el artefacto.
+    """
+    filtros = {
+        'pais': sorted({pais.upper() for pais in _lista(params, 'pais')}),
+        'indicador': sorted(set(_indicadores_pivote(params))),
+        'desde': _anio(params, 'desde'),
+        'hasta': _anio(params, 'hasta'),
+    }
+    return {nombre: valor for nombre, valor in filtros.items() if valor not in (None, [])}
+
+
+def _params(filtros):
+    params = QueryDict(mutable=True)
+    for nombre, valor in filtros.items():
+        params.setlist(nombre, valor if isinstance(valor, list) else [str(valor)])
+    return params
+
+
+def prebuilt_requests(pedidos=None):
+    """
+    Pares (formato, filtros canónicos) de `pedidos` (por defecto, EXPORT_PREBUILD).
+    """
+    return [
+        (formato, artifact_filters(_params(filtros)))
+        for formato, filtros in (settings.EXPORT_PREBUILD if pedidos is None else pedidos)
+    ]
+
+
+def is_prebuilt(formato, filtros):
+    """
+    Si el artefacto es uno de los de EXPORT_PREBUILD, los únicos que las vistas guardan
+    en disco.
+    """
+    return (formato, filtros) in prebuilt_requests()
+
+
+def artifact_path(formato, filtros, version=None):
+    """
+    Ruta del artefacto de `formato` con los filtros canónicos `filtros`, para una
+    versión de los datos (por defecto, la actual).
+    """
+    version = data_version() if version is None else version
+    clave = hashlib.sha256(json.dumps(filtros, sort_keys=True).encode()).hexdigest()[:16] if filtros else 'completo'
+    return Path(settings.EXPORT_ARTIFACTS_DIR) / str(version) / f'{formato}-{clave}.{FORMATOS_ARTEFACTO[formato].extension}'
+
+
+def find_artifact(formato, filtros):
+    """
+    Ruta del artefacto de la versión actual, o None si todavía no se generó.
+    """
+    ruta = artifact_path(formato, filtros)
+    return ruta if ruta.is_file() else None
+
+
+def _write(destino, formato, filtros):
+    # `destino` es una ruta o un archivo binario abierto, que queda abierto
+    queryset, claves = filter_pivot(_params(filtros))
+    if formato == 'xlsx':
+        write_excel(destino, queryset, claves)
+        return
+    texto = io.TextIOWrapper(open(destino, 'wb') if isinstance(destino, Path) else destino, encoding='utf-8', newline='')
+    try:
+        if formato == 'csv':
+            write_csv(texto, queryset, claves)
+        else:
+            write_json(texto, queryset, claves, formato)
+        texto.flush()
+    finally:
+        if isinstance(destino, Path):
+            texto.close()
+        else:
+            texto.detach()
+
+
+def build_artifact(formato, filtros, version=None):
+    """
+    Genera el artefacto (si no existe) y devuelve su ruta.
+    """
+    ruta = artifact_path(formato, filtros, version)
+    if ruta.is_file():
+        return ruta
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'.{ruta.name}.{os.getpid()}.{threading.get_ident()}')
+    try:
+        _write(temporal, formato, filtros)
+        os.replace(temporal, ruta)
+    finally:
+        temporal.unlink(missing_ok=True)
+    return ruta
+
+
+def build_temporary(formato, filtros):
+    """
+    Genera la exportación en un archivo temporal (en memoria si es chica) que se borra
+    al cerrarse, para las combinaciones de filtros que no se guardan en disco.
+    """
+    archivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, suffix=f'.{FORMATOS_ARTEFACTO[formato].extension}')
+    _write(archivo, formato, filtros)
+    archivo.seek(0)
+    return archivo
+
+
+def purge_stale_artifacts(version=None):
+    """
+    Borra los artefactos de las versiones de los datos anteriores a `version` (por
+    defecto, la actual). Devuelve la cantidad de versiones borradas.
+    """
+    version = str(data_version() if version is None else version)
+    raiz = Path(settings.EXPORT_ARTIFACTS_DIR)
+    if not raiz.is_dir():
+        return 0
+    anteriores = [directorio for directorio in raiz.iterdir() if directorio.is_dir() and directorio.name != version]
+    for directorio in anteriores:
+        # Un archivo que se está enviando sigue disponible para quien lo tiene abierto
+        shutil.rmtree(directorio, ignore_errors=True)
+    return len(anteriores)
+
+
+def prebuild_artifacts(pedidos=None, workers=1):
+    """
+    Genera los artefactos de `pedidos` (pares (formato, filtros); por defecto
+    EXPORT_PREBUILD) para la versión actual, con `workers` hilos, y borra los de
+    versiones anteriores. Devuelve las rutas generadas.
+    """
+    version = data_version()
+    pedidos = prebuilt_requests(pedidos)
+    if workers > 1:
+        constructor = ArtifactBuilder(max_workers=workers)
+        try:
+            futuros = [constructor.submit(formato, filtros, version) for formato, filtros in pedidos]
+            rutas = [futuro.result() for futuro in futuros]
+        finally:
+            constructor.shutdown()
+    else:
+        rutas = [build_artifact(formato, filtros, version) for formato, filtros in pedidos]
+    purge_stale_artifacts(version)
+    return rutas
+
+
+class ArtifactBuilder:
+    """
+    Pool de hilos que genera artefactos en segundo plano. Los pedidos de un artefacto
+    que ya se está generando reciben el mismo Future.
+    """
+
+    def __init__(self, max_workers=None, construir=build_artifact):
+        self.max_workers = max_workers
+        self._construir = construir
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pendientes = {}
+
+    def submit(self, formato, filtros, version=None):
+        version = data_version() if version is None else version
+        clave = (formato, json.dumps(filtros, sort_keys=True), version)
+        with self._lock:
+            futuro = self._pendientes.get(clave)
+            if futuro is not None:
+                return futuro
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.max_workers or settings.EXPORT_WORKERS, thread_name_prefix='dw_etl_exportaciones',
+                )
+            futuro = self._pendientes[clave] = self._executor.submit(self._ejecutar, formato, filtros, version)
+        futuro.add_done_callback(lambda _: self._terminar(clave))
+        return futuro
+
+    def schedule(self, formato, filtros):
+        """
+        Encarga el artefacto al confirmarse la transacción actual (de inmediato en modo
+        autocommit), para que el hilo lea los mismos datos. No hace nada con
+        EXPORT_WORKERS = 0.
+        """
+        if settings.EXPORT_WORKERS:
+            transaction.on_commit(lambda: self.submit(formato, filtros))
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _ejecutar(self, formato, filtros, version):
+        try:
+            return self._construir(formato, filtros, version)
+        except Exception:
+            logger.exception('No se pudo generar la exportación %s %s', formato, filtros)
+            raise
+        finally:
+            # La conexión de este hilo no la cierra el fin de ninguna solicitud
+            close_old_connections()
+
+    def _terminar(self, clave):
+        with self._lock:
+            self._pendientes.pop(clave, None)
+
+
+builder = ArtifactBuilder()
@@ -0,0 +1,2 @@
+# dw_etl/bench/__init__.py
+# Utilidades de benchmark: generador de datos sintéticos y base de datos aislada.
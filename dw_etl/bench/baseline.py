@@ -0,0 +1,58 @@
+# dw_etl/bench/baseline.py
+"""
+Línea base de los benchmarks: se guarda en JSON (objetivo -> países -> métricas) y una
+ejecución posterior se compara contra ella para detectar regresiones.
+"""
+import json
+from pathlib import Path
+
+# Tolerancia por defecto sobre el tiempo y la memoria (las consultas deben ser iguales o menos)
+DEFAULT_TOLERANCE = 0.25
+
+# Aumentos mínimos que se consideran regresión (las mediciones cortas y el muestreo de
+# memoria son ruidosos)
+SEGUNDOS_MINIMO = 0.05
+RSS_MINIMO = 8 * 2**20
+
+
+def save_baseline(path, resultados):
+    """
+    Guarda `resultados` (`{objetivo: {paises: Medicion}}`) como línea base.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    datos = {
+        objetivo: {str(paises): medicion._asdict() for paises, medicion in por_paises.items()}
+        for objetivo, por_paises in resultados.items()
+    }
+    path.write_text(json.dumps(datos, indent=2, sort_keys=True), encoding='utf-8')
+
+
+def load_baseline(path):
+    return json.loads(Path(path).read_text(encoding='utf-8'))
+
+
+def compare(resultados, base, tolerance=DEFAULT_TOLERANCE):
+    """
+    Regresiones de `resultados` respecto de la línea base `base` (de `load_baseline`):
+    más consultas, o tiempo / memoria sobre la base más la tolerancia. Devuelve una
+    lista de mensajes (vacía si no hay regresiones). Las mediciones sin base se ignoran.
+    """
+    regresiones = []
+    for objetivo, por_paises in resultados.items():
+        for paises, medicion in por_paises.items():
+            anterior = base.get(objetivo, {}).get(str(paises))
+            if anterior is None:
+                continue
+            etiqueta = f'{objetivo} ({paises} países)'
+            if medicion.consultas > anterior['consultas']:
+                regresiones.append(f"{etiqueta}: {medicion.consultas} consultas (base {anterior['consultas']}).")
+            limite_segundos = max(anterior['segundos'] * (1 + tolerance), anterior['segundos'] + SEGUNDOS_MINIMO)
+            if medicion.segundos > limite_segundos:
+                regresiones.append(f"{etiqueta}: {medicion.segundos:.2f} s (base {anterior['segundos']:.2f} s).")
+            limite_rss = max(anterior['rss_pico'] * (1 + tolerance), anterior['rss_pico'] + RSS_MINIMO)
+            if medicion.rss_pico > limite_rss:
+                regresiones.append(
+                    f"{etiqueta}: {medicion.rss_pico / 2**20:.1f} MB de RSS (base {anterior['rss_pico'] / 2**20:.1f} MB)."
+                )
+    return regresiones
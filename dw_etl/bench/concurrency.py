@@ -0,0 +1,118 @@
+# dw_etl/bench/concurrency.py
+"""
+Benchmark de concurrencia: muchas descargas simultáneas de una URL servida por la
+aplicación ASGI del proyecto (la que levanta uvicorn), en el mismo proceso y con
+clientes lentos simulados (cada bloque recibido espera `demora` segundos).
+
+Si la vista no bloquea un hilo mientras el cliente descarga, N clientes tardan mucho
+menos que N descargas seguidas. Los hilos del proceso sí crecen con N: Django ejecuta
+las partes síncronas de cada solicitud en un hilo propio de su contexto, que queda
+inactivo mientras el cliente recibe.
+"""
+import asyncio
+import threading
+import time
+from collections import namedtuple
+
+from django.core.asgi import get_asgi_application
+
+# Resultado de una corrida: `segundos_un_cliente` es la misma descarga sin concurrencia
+Concurrencia = namedtuple('Concurrencia', 'clientes segundos segundos_un_cliente bytes errores hilos_max')
+
+INTERVALO_MUESTREO = 0.005 # segundos
+
+
+class ThreadSampler:
+    """
+    Máximo de hilos vivos del proceso mientras dura el bloque `with`.
+    """
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.maximo = 0
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def __enter__(self):
+        self.maximo = threading.active_count()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._detener.set()
+        self._hilo.join()
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            # Sin contar el hilo del muestreo
+            self.maximo = max(self.maximo, threading.active_count() - 1)
+
+
+async def fetch(app, path, query='', demora=0.0):
+    """
+    GET de `path` contra la aplicación ASGI `app`. Devuelve `(estado, bytes)`.
+    """
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    pedido = False
+    estado, recibidos = None, 0
+
+    async def receive():
+        nonlocal pedido
+        if not pedido:
+            pedido = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # El cliente no se desconecta: Django cancela esta espera al terminar la respuesta
+        await asyncio.Future()
+
+    async def send(mensaje):
+        nonlocal estado, recibidos
+        if mensaje['type'] == 'http.response.start':
+            estado = mensaje['status']
+        elif mensaje['type'] == 'http.response.body':
+            recibidos += len(mensaje.get('body', b''))
+            if mensaje.get('more_body') and demora:
+                await asyncio.sleep(demora)
+
+    await app(scope, receive, send)
+    return estado, recibidos
+
+
+def run_concurrent(path, clientes, query='', demora=0.0):
+    """
+    Descarga `path` una vez sola y luego con `clientes` clientes simultáneos.
+    """
+    app = get_asgi_application()
+
+    async def principal():
+        inicio = time.perf_counter()
+        await fetch(app, path, query, demora)
+        un_cliente = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(fetch(app, path, query, demora) for _ in range(clientes)))
+        return time.perf_counter() - inicio, un_cliente, resultados
+
+    with ThreadSampler() as hilos:
+        segundos, un_cliente, resultados = asyncio.run(principal())
+    return Concurrencia(
+        clientes=clientes,
+        segundos=segundos,
+        segundos_un_cliente=un_cliente,
+        bytes=sum(recibidos for _, recibidos in resultados),
+        errores=sum(estado != 200 for estado, _ in resultados),
+        hilos_max=hilos.maximo,
+    )
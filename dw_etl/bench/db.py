@@ -0,0 +1,18 @@
+# dw_etl/bench/db.py
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def isolated_database():
+    """
+    Crea una base de datos de prueba (la misma que usan los tests) y la destruye al
+    salir, para que los benchmarks nunca escriban sobre el DW real.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
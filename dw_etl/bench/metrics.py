@@ -0,0 +1,76 @@
+# dw_etl/bench/metrics.py
+"""
+Medición de una ejecución: tiempo, consultas SQL, pico de memoria residente (RSS) y filas/s.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Resultado de una medición. `rss_pico` es el aumento máximo de memoria residente (bytes)
+# respecto del inicio de la medición
+Medicion = namedtuple('Medicion', 'filas segundos consultas rss_pico')
+
+INTERVALO_MUESTREO = 0.005 # segundos
+
+
+def current_rss():
+    """
+    Memoria residente actual del proceso en bytes (0 si el sistema no la informa).
+    """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class RssSampler:
+    """
+    Muestrea la RSS en un hilo mientras dura el bloque `with` y guarda el máximo.
+    (ru_maxrss no sirve aquí: es el máximo de toda la vida del proceso).
+    """
+
+    def __init__(self, intervalo=INTERVALO_MUESTREO):
+        self.intervalo = intervalo
+        self.inicial = 0
+        self.maximo = 0
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def __enter__(self):
+        self.inicial = self.maximo = current_rss()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._detener.set()
+        self._hilo.join()
+        self.maximo = max(self.maximo, current_rss())
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo):
+            self.maximo = max(self.maximo, current_rss())
+
+    @property
+    def pico(self):
+        return self.maximo - self.inicial
+
+
+def measure(fn):
+    """
+    Ejecuta `fn` (que devuelve la cantidad de filas procesadas) y devuelve una Medicion.
+    """
+    with CaptureQueriesContext(connection) as consultas, RssSampler() as rss:
+        inicio = time.perf_counter()
+        filas = fn()
+        segundos = time.perf_counter() - inicio
+    return Medicion(filas, segundos, len(consultas), rss.pico)
+
+
+def rows_per_second(medicion):
+    return medicion.filas / medicion.segundos if medicion.segundos else 0.0
@@ -0,0 +1,55 @@
+# dw_etl/bench/synthetic.py
+"""
+Generador de datos sintéticos para el esquema estrella (países × años × indicadores).
+"""
+from dw_etl.etl.fake_api import pais_sintetico, valor_sintetico
+from dw_etl.etl.loader import FactLoader
+from dw_etl.etl.pivot import COLUMNA_PIVOTE, refresh_pivot
+from dw_etl.etl.rollups import refresh_rollups
+from dw_etl.models import DimFuenteDatos, HechosEconomicos
+from dw_etl.versioning import bump_data_version
+
+
+def codigo_iso_sintetico(i):
+    # 'A00', 'A01', ..., 'Z99': hasta 2600 países distintos
+    return f'{chr(65 + i // 100)}{i % 100:02d}'
+
+
+def nombres_indicadores(cantidad):
+    reales = list(COLUMNA_PIVOTE)
+    return reales[:cantidad] + [f'Indicador {i}' for i in range(len(reales), cantidad)]
+
+
+def generate_warehouse(paises=30, anios=60, indicadores=4, start_year=1960, reset=True):
+    """
+    Llena las dimensiones, `HechosEconomicos`, la tabla pivoteada `HechosPaisAnio` y los
+    agregados `HechosGrupoAnio` con datos deterministas. Devuelve la cantidad de hechos cargados.
+    """
+    if reset:
+        HechosEconomicos.objects.all().delete()
+    fuente, _ = DimFuenteDatos.objects.get_or_create(nombre_fuente='Sintético')
+    nombres = nombres_indicadores(indicadores)
+    loader = FactLoader(fuente)
+    metadata = [pais_sintetico(codigo_iso_sintetico(i)) for i in range(paises)]
+    loader.ensure_dimensions(
+        [
+            {
+                'iso': fila['id'],
+                'name': f'País {i:04d}',
+                'region': fila['region']['value'].strip(),
+                'grupo_ingresos': fila['incomeLevel']['value'],
+            }
+            for i, fila in enumerate(metadata)
+        ],
+        {nombre: {'unidad': '%'} for nombre in nombres},
+    )
+    cargados = loader.load(
+        (iso, anio, nombre, valor_sintetico(iso, nombre, anio) or 0.0)
+        for iso in map(codigo_iso_sintetico, range(paises))
+        for anio in range(start_year, start_year + anios)
+        for nombre in nombres
+    )
+    refresh_pivot(None if reset else loader.touched)
+    refresh_rollups(None if reset else {anio for anio, _ in loader.touched})
+    bump_data_version()
+    return cargados
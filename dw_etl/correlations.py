@@ -0,0 +1,170 @@
+# dw_etl/correlations.py
+"""
+Matrices de correlación entre indicadores, por país y entre todos los países, con
+rezagos (el indicador de la fila en el año t contra el de la columna en t + rezago).
+
+Los datos se cargan una sola vez desde HechosPaisAnio en un arreglo denso
+(país × año × variable) con NaN donde no hay dato, y todas las matrices de todos los
+países y rezagos salen de operaciones vectorizadas de numpy sobre ese arreglo (sin
+consultas ni ciclos por par de indicadores). Cada par usa solo los años en que ambos
+valores existen.
+
+El resultado completo se guarda en la caché con la versión de los datos en la clave:
+la siguiente carga del ETL lo invalida.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .exports import CLAVE_JSON, ITERATOR_CHUNK_SIZE, ExportFilterError, _lista
+from .models import HechosPaisAnio
+from .versioning import versioned_key
+
+# Variables del arreglo: los indicadores de la tabla pivoteada (con sus nombres de la API)
+# y la variación interanual (%) del tipo de cambio, derivada en el mismo arreglo
+VARIABLES = [*CLAVE_JSON.values(), 'variacion_tipo_cambio']
+
+# Rezagos por defecto y máximo, en años
+DEFAULT_REZAGOS = 3
+MAX_REZAGOS = 10
+
+# Años con ambos valores necesarios para informar una correlación
+MIN_OBSERVACIONES = 5
+
+
+def load_cube(queryset=None):
+    """
+    Lee HechosPaisAnio en una consulta y devuelve `(paises, anios, cubo)`: la lista de
+    (codigo_iso, nombre) de cada país, los años del eje y el arreglo float64
+    país × año × variable.
+    """
+    import numpy as np
+    import pandas as pd
+
+    queryset = HechosPaisAnio.objects.all() if queryset is None else queryset
+    filas = queryset.order_by().values_list(
+        'codigo_iso', 'nombre_pais', 'anio', *(Cast(columna, FloatField()) for columna in CLAVE_JSON)
+    )
+    df = pd.DataFrame.from_records(filas.iterator(chunk_size=ITERATOR_CHUNK_SIZE), columns=['codigo_iso', 'pais', 'anio', *CLAVE_JSON])
+    if df.empty:
+        return [], [], np.empty((0, 0, len(VARIABLES)))
+
+    indice_pais, codigos = pd.factorize(df['codigo_iso'], sort=True)
+    nombres = df.groupby('codigo_iso')['pais'].first()
+    primer_anio, ultimo_anio = int(df['anio'].min()), int(df['anio'].max())
+    cubo = np.full((len(codigos), ultimo_anio - primer_anio + 1, len(VARIABLES)), np.nan)
+    cubo[indice_pais, df['anio'].to_numpy() - primer_anio, :len(CLAVE_JSON)] = df[list(CLAVE_JSON)].to_numpy(dtype='float64')
+
+    # Variación interanual del tipo de cambio, sobre el eje de años de todos los países a la vez
+    tipo_cambio = cubo[:, :, list(CLAVE_JSON).index('tipo_cambio')]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacion = (tipo_cambio[:, 1:] / tipo_cambio[:, :-1] - 1) * 100
+    cubo[:, 1:, -1] = np.where(np.isfinite(variacion), variacion, np.nan)
+
+    paises = [(codigo, nombres[codigo]) for codigo in codigos]
+    return paises, list(range(primer_anio, ultimo_anio + 1)), cubo
+
+
+def lagged_correlations(cubo, rezago):
+    """
+    Correlaciones de Pearson entre todas las variables con un rezago, en una pasada:
+    devuelve `(por_pais, global_)`, con forma (país, variable, variable) y
+    (variable, variable). NaN donde hay menos de MIN_OBSERVACIONES pares.
+    """
+    import numpy as np
+
+    anios = cubo.shape[1]
+    x = cubo[:, :anios - rezago, :]
+    y = cubo[:, rezago:, :]
+
+    def correlacion(x, y):
+        # x, y: (grupo, año, variable) -> (grupo, variable_x, variable_y)
+        xb, yb = x[:, :, :, None], y[:, :, None, :]
+        validos = ~np.isnan(xb) & ~np.isnan(yb)
+        n = validos.sum(axis=1)
+        xv, yv = np.where(validos, xb, 0.0), np.where(validos, yb, 0.0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media_x, media_y = xv.sum(axis=1) / n, yv.sum(axis=1) / n
+            dx = np.where(validos, xb - media_x[:, None], 0.0)
+            dy = np.where(validos, yb - media_y[:, None], 0.0)
+            r = (dx * dy).sum(axis=1) / np.sqrt((dx ** 2).sum(axis=1) * (dy ** 2).sum(axis=1))
+        r[(n < MIN_OBSERVACIONES) | ~np.isfinite(r)] = np.nan
+        return np.clip(r, -1.0, 1.0)
+
+    por_pais = correlacion(x, y)
+    # Entre países: todos los pares (país, año) juntos, ya desplazados dentro de cada país
+    global_ = correlacion(x.reshape(1, -1, x.shape[2]), y.reshape(1, -1, y.shape[2]))[0]
+    return por_pais, global_
+
+
+def _matriz(arreglo):
+    return [[None if valor != valor else round(float(valor), 4) for valor in fila] for fila in arreglo]
+
+
+def correlation_matrices(rezagos=DEFAULT_REZAGOS):
+    """
+    Matrices de todos los países y del conjunto para los rezagos 0..`rezagos`, desde la
+    caché si la versión de los datos no cambió.
+    """
+    clave = versioned_key('correlaciones', rezagos)
+    resultado = cache.get(clave)
+    if resultado is not None:
+        return resultado
+
+    paises, anios, cubo = load_cube()
+    por_rezago = {rezago: lagged_correlations(cubo, rezago) for rezago in range(min(rezagos, max(len(anios) - 1, 0)) + 1)}
+    resultado = {
+        'variables': VARIABLES,
+        'anios': [anios[0], anios[-1]] if anios else [],
+        'global': {rezago: _matriz(global_) for rezago, (_, global_) in por_rezago.items()},
+        'paises': [
+            {
+                'codigo_iso': codigo,
+                'pais': nombre,
+                'matrices': {rezago: _matriz(por_pais[i]) for rezago, (por_pais, _) in por_rezago.items()},
+            }
+            for i, (codigo, nombre) in enumerate(paises)
+        ],
+    }
+    cache.set(clave, resultado, settings.DASHBOARD_CACHE_TIMEOUT)
+    return resultado
+
+
+def correlation_report(params):
+    """
+    Resultado de la API de correlaciones para una QueryDict: `rezagos` (0-10, por
+    defecto 3) y `pais` (códigos ISO; sin filtro se incluyen todos los países).
+    """
+    valor = params.get('rezagos') or DEFAULT_REZAGOS
+    try:
+        rezagos = int(valor)
+    except ValueError:
+        raise ExportFilterError(f'El parámetro rezagos debe ser un entero, no {valor!r}.')
+    if not 0 <= rezagos <= MAX_REZAGOS:
+        raise ExportFilterError(f'El parámetro rezagos debe estar entre 0 y {MAX_REZAGOS}.')
+
+    resultado = correlation_matrices(rezagos)
+    paises = {iso.upper() for iso in _lista(params, 'pais')}
+    if paises:
+        resultado = {**resultado, 'paises': [p for p in resultado['paises'] if p['codigo_iso'] in paises]}
+    return resultado
+
+
+def pair_ranking(resultado, fila, columna, rezago=0, top=5):
+    """
+    Países con la correlación más negativa y más positiva entre dos variables, desde un
+    resultado de `correlation_matrices`. Devuelve `(negativas, positivas)`: hasta `top`
+    países con r < 0 y hasta `top` con r > 0, así que con pocos países ninguno aparece
+    en las dos listas.
+    """
+    i, j = VARIABLES.index(fila), VARIABLES.index(columna)
+    valores = [
+        {'codigo_iso': p['codigo_iso'], 'pais': p['pais'], 'correlacion': p['matrices'][rezago][i][j]}
+        for p in resultado['paises']
+        if rezago in p['matrices'] and p['matrices'][rezago][i][j] is not None
+    ]
+    valores.sort(key=lambda v: v['correlacion'])
+    negativas = [v for v in valores if v['correlacion'] < 0]
+    positivas = [v for v in reversed(valores) if v['correlacion'] > 0]
+    return negativas[:top], positivas[:top]
@@ -0,0 +1,254 @@
+# dw_etl/crisis.py
+"""
+Detector de episodios en que una fuerte devaluación coincide con una recesión.
+
+Se leen en una sola consulta el tipo de cambio y el crecimiento del PIB de todos los
+países y años (tabla HechosPaisAnio) y el cálculo es vectorizado con pandas/numpy
+sobre el panel completo, sin ciclos por país:
+
+- devaluación: alza interanual (%) del tipo de cambio (moneda local por USD) respecto
+  del año anterior del mismo país;
+- recesión: tramo de años seguidos con crecimiento negativo del PIB, de al menos
+  `anios_recesion` años;
+- episodio: una recesión con alguna devaluación mayor o igual a `umbral_devaluacion`
+  entre `margen_anios` años antes de su inicio y su último año.
+"""
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from .exports import ITERATOR_CHUNK_SIZE, ExportFilterError, _anio, _lista
+from .models import DimPais, EpisodioCrisis, HechosPaisAnio
+
+COLUMNAS = ['id_pais', 'anio', 'tipo_cambio', 'pib_crecimiento']
+
+BATCH_SIZE = 2000
+
+# Campos que definen un episodio guardado (para saber si una detección cambió la tabla)
+CAMPOS_EPISODIO = [
+    'id_pais_id', 'anio_inicio', 'anio_fin', 'duracion', 'crecimiento_minimo', 'devaluacion_maxima',
+    'anio_devaluacion', 'umbral_devaluacion', 'anios_recesion', 'margen_anios',
+]
+
+# Umbrales de una detección
+Umbrales = namedtuple('Umbrales', 'umbral_devaluacion anios_recesion margen_anios')
+
+
+def default_thresholds():
+    """
+    Umbrales configurados en settings (CRISIS_*).
+    """
+    return Umbrales(settings.CRISIS_UMBRAL_DEVALUACION, settings.CRISIS_ANIOS_RECESION, settings.CRISIS_MARGEN_ANIOS)
+
+
+def load_panel(queryset=None):
+    """
+    Panel (país, año) con tipo de cambio y crecimiento del PIB como float64.
+    """
+    import pandas as pd
+
+    queryset = HechosPaisAnio.objects.all() if queryset is None else queryset
+    # Los valores llegan como float desde la base de datos (sin pasar por Decimal)
+    filas = queryset.order_by().values_list(
+        'id_pais', 'anio', Cast('tipo_cambio', FloatField()), Cast('pib_crecimiento', FloatField())
+    )
+    panel = pd.DataFrame.from_records(filas.iterator(chunk_size=ITERATOR_CHUNK_SIZE), columns=COLUMNAS)
+    return panel.astype({'id_pais': 'int64', 'anio': 'int64', 'tipo_cambio': 'float64', 'pib_crecimiento': 'float64'})
+
+
+def detect_episodes(panel, umbrales):
+    """
+    Episodios de devaluación con recesión de un panel de `load_panel`. Devuelve un
+    DataFrame con una fila por episodio: id_pais, anio_inicio, anio_fin, duracion,
+    crecimiento_minimo, devaluacion_maxima y anio_devaluacion.
+    """
+    import numpy as np
+    import pandas as pd
+
+    panel = panel.sort_values(['id_pais', 'anio'], ignore_index=True)
+    pais = panel['id_pais'].to_numpy()
+    anio = panel['anio'].to_numpy()
+    tipo_cambio = panel['tipo_cambio'].to_numpy()
+    crecimiento = panel['pib_crecimiento'].to_numpy()
+
+    # consecutivo[i]: la fila i es el año siguiente a la fila i - 1 del mismo país
+    consecutivo = np.zeros(len(panel), dtype=bool)
+    consecutivo[1:] = (pais[1:] == pais[:-1]) & (anio[1:] == anio[:-1] + 1)
+
+    devaluacion = np.full(len(panel), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        devaluacion[1:] = (tipo_cambio[1:] / tipo_cambio[:-1] - 1) * 100
+    devaluacion[~consecutivo | ~np.isfinite(devaluacion)] = np.nan
+
+    # Devaluación máxima de cada año y de los `margen_anios` anteriores del mismo país
+    # (y el año en que ocurrió), desplazando los arreglos en vez de recorrer países
+    dev_ventana = devaluacion.copy()
+    anio_ventana = np.where(np.isnan(devaluacion), -1, anio)
+    contiguo = np.ones(len(panel), dtype=bool)
+    for k in range(1, umbrales.margen_anios + 1):
+        contiguo[k:] &= consecutivo[1:len(panel) - k + 1]
+        contiguo[:k] = False
+        anterior = np.full(len(panel), np.nan)
+        anterior[k:] = devaluacion[:-k]
+        anterior[~contiguo] = np.nan
+        mayor = anterior > np.nan_to_num(dev_ventana, nan=-np.inf)
+        dev_ventana = np.where(mayor, anterior, dev_ventana)
+        anio_ventana = np.where(mayor, anio - k, anio_ventana)
+
+    # Tramos de recesión: un tramo nuevo empieza en cada año negativo que no continúa otro
+    recesion = crecimiento < 0
+    continua = np.zeros(len(panel), dtype=bool)
+    continua[1:] = recesion[:-1] & consecutivo[1:]
+    tramo = np.cumsum(recesion & ~continua)
+
+    tramos = pd.DataFrame({
+        'tramo': tramo[recesion],
+        'id_pais': pais[recesion],
+        'anio': anio[recesion],
+        'crecimiento': crecimiento[recesion],
+        # Solo cuenta el margen previo al primer año del tramo; luego, la devaluación del año
+        'devaluacion': np.where((recesion & ~continua)[recesion], dev_ventana[recesion], devaluacion[recesion]),
+        'anio_devaluacion': np.where((recesion & ~continua)[recesion], anio_ventana[recesion], anio[recesion]),
+    })
+    if tramos.empty:
+        return pd.DataFrame(columns=[
+            'id_pais', 'anio_inicio', 'anio_fin', 'duracion', 'crecimiento_minimo', 'devaluacion_maxima', 'anio_devaluacion',
+        ])
+    # Fila de la mayor devaluación de cada tramo (NaN al final para que no gane)
+    mayor = tramos.sort_values(['tramo', 'devaluacion'], ascending=[True, False], na_position='last').drop_duplicates('tramo')
+    episodios = tramos.groupby('tramo').agg(
+        id_pais=('id_pais', 'first'),
+        anio_inicio=('anio', 'min'),
+        anio_fin=('anio', 'max'),
+        duracion=('anio', 'size'),
+        crecimiento_minimo=('crecimiento', 'min'),
+    ).join(mayor.set_index('tramo')[['devaluacion', 'anio_devaluacion']].rename(columns={'devaluacion': 'devaluacion_maxima'}))
+    episodios = episodios[
+        (episodios['duracion'] >= umbrales.anios_recesion) & (episodios['devaluacion_maxima'] >= umbrales.umbral_devaluacion)
+    ]
+    return episodios.reset_index(drop=True)
+
+
+def episode_rows(episodios, umbrales):
+    """
+    Filas de EpisodioCrisis (sin guardar) para un DataFrame de `detect_episodes`.
+    """
+    return [
+        EpisodioCrisis(
+            id_pais_id=int(fila.id_pais),
+            anio_inicio=int(fila.anio_inicio),
+            anio_fin=int(fila.anio_fin),
+            duracion=int(fila.duracion),
+            crecimiento_minimo=round(float(fila.crecimiento_minimo), 4),
+            devaluacion_maxima=round(float(fila.devaluacion_maxima), 4),
+            anio_devaluacion=int(fila.anio_devaluacion),
+            umbral_devaluacion=umbrales.umbral_devaluacion,
+            anios_recesion=umbrales.anios_recesion,
+            margen_anios=umbrales.margen_anios,
+        )
+        for fila in episodios.itertuples(index=False)
+    ]
+
+
+def run_detection(umbrales=None):
+    """
+    Detecta los episodios de todos los países y reemplaza la tabla EpisodioCrisis si el
+    resultado es distinto del guardado. Devuelve (cantidad de episodios, segundos,
+    si la tabla cambió).
+    """
+    umbrales = umbrales or default_thresholds()
+    inicio = time.perf_counter()
+    filas = episode_rows(detect_episodes(load_panel(), umbrales), umbrales)
+    nuevos = {_firma(getattr(fila, campo) for campo in CAMPOS_EPISODIO) for fila in filas}
+    with transaction.atomic():
+        guardados = {_firma(valores) for valores in EpisodioCrisis.objects.values_list(*CAMPOS_EPISODIO)}
+        cambio = nuevos != guardados
+        if cambio:
+            EpisodioCrisis.objects.all().delete()
+            EpisodioCrisis.objects.bulk_create(filas, batch_size=BATCH_SIZE)
+    return len(filas), time.perf_counter() - inicio, cambio
+
+
+def _firma(valores):
+    # Los decimales se comparan con los 4 decimales que guarda la tabla
+    return tuple(
+        Decimal(str(valor)).quantize(Decimal('0.0001')) if isinstance(valor, (float, Decimal)) else valor
+        for valor in valores
+    )
+
+
+def _umbrales(params):
+    """
+    Umbrales pedidos en una QueryDict (`umbral`, `anios`, `margen`), o None si no se pidió ninguno.
+    """
+    if not any(params.get(nombre) for nombre in ('umbral', 'anios', 'margen')):
+        return None
+    defecto = default_thresholds()
+    try:
+        umbrales = Umbrales(
+            float(params.get('umbral') or defecto.umbral_devaluacion),
+            int(params.get('anios') or defecto.anios_recesion),
+            int(params.get('margen') or defecto.margen_anios),
+        )
+    except ValueError:
+        raise ExportFilterError('Los parámetros umbral, anios y margen deben ser numéricos.')
+    if umbrales.anios_recesion < 1 or not 0 <= umbrales.margen_anios <= 10:
+        raise ExportFilterError('anios debe ser al menos 1 y margen debe estar entre 0 y 10.')
+    return umbrales
+
+
+def crisis_report(params):
+    """
+    Episodios para la API: los guardados en EpisodioCrisis o, si se piden otros umbrales
+    (`umbral`, `anios`, `margen`), calculados al vuelo sin guardarlos. Filtros opcionales:
+    `pais` (códigos ISO) y `desde`/`hasta` (años que toca el episodio).
+    """
+    paises = [iso.upper() for iso in _lista(params, 'pais')]
+    desde, hasta = _anio(params, 'desde'), _anio(params, 'hasta')
+    umbrales = _umbrales(params)
+
+    if umbrales is None:
+        umbrales = default_thresholds()
+        episodios = EpisodioCrisis.objects.all()
+        if paises:
+            episodios = episodios.filter(id_pais__codigo_iso__in=paises)
+        episodios = list(episodios.select_related('id_pais'))
+        if episodios:
+            # Umbrales con que se calcularon los episodios guardados
+            e = episodios[0]
+            umbrales = Umbrales(float(e.umbral_devaluacion), e.anios_recesion, e.margen_anios)
+    else:
+        panel = HechosPaisAnio.objects.all()
+        if paises:
+            panel = panel.filter(codigo_iso__in=paises)
+        episodios = episode_rows(detect_episodes(load_panel(panel), umbrales), umbrales)
+        # Países de los episodios en una sola consulta
+        por_id = DimPais.objects.in_bulk({e.id_pais_id for e in episodios})
+        for e in episodios:
+            e.id_pais = por_id[e.id_pais_id]
+
+    episodios = [
+        e for e in episodios
+        if (desde is None or e.anio_fin >= desde) and (hasta is None or e.anio_inicio <= hasta)
+    ]
+    return {
+        'umbrales': umbrales._asdict(),
+        'episodios': [
+            {
+                'codigo_iso': e.id_pais.codigo_iso,
+                'pais': e.id_pais.nombre_pais,
+                'anio_inicio': e.anio_inicio,
+                'anio_fin': e.anio_fin,
+                'duracion': e.duracion,
+                'crecimiento_minimo': float(e.crecimiento_minimo),
+                'devaluacion_maxima': float(e.devaluacion_maxima),
+                'anio_devaluacion': e.anio_devaluacion,
+            }
+            for e in sorted(episodios, key=lambda e: (e.anio_inicio, e.id_pais.nombre_pais))
+        ],
+    }
@@ -0,0 +1,2 @@
+# dw_etl/etl/__init__.py
+# Componentes reutilizables del proceso ETL (extracción desde World Bank API, etc.)
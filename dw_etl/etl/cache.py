@@ -0,0 +1,136 @@
+# dw_etl/etl/cache.py
+"""
+Caché local de respuestas HTTP del extractor (una tabla SQLite en disco).
+
+- La clave es la URL normalizada (esquema y host en minúsculas, parámetros ordenados).
+- El contenido se guarda comprimido con zlib.
+- Las entradas vencen según un TTL, y el tamaño total se acota desalojando las
+  entradas usadas hace más tiempo (LRU).
+- Sirve también como fuente única en modo "replay": reconstruir el DW solo con
+  respuestas ya guardadas, sin red.
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_TTL = 24 * 60 * 60 # segundos
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Forma canónica de una URL para usarla como clave de la caché.
+    """
+    partes = urlsplit(url)
+    esquema = partes.scheme.lower()
+    host = (partes.hostname or '').lower()
+    if partes.port and partes.port != _DEFAULT_PORTS.get(esquema):
+        host = f'{host}:{partes.port}'
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((esquema, host, partes.path.rstrip('/') or '/', query, ''))
+
+
+class ResponseCache:
+    """
+    Caché de respuestas JSON. Segura para usar desde los hilos de `FetchEngine`.
+
+        cache = ResponseCache('.etl_cache/worldbank.sqlite3', ttl=3600)
+        payload = cache.get(url)
+        if payload is None:
+            payload = descargar(url)
+            cache.set(url, payload)
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS respuestas ('
+            ' url TEXT PRIMARY KEY,'
+            ' contenido BLOB NOT NULL,'
+            ' bytes INTEGER NOT NULL,'
+            ' guardado REAL NOT NULL,'
+            ' accedido REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS respuestas_accedido ON respuestas (accedido)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, url, allow_stale=False):
+        """
+        Payload guardado para `url`, o None si no existe o venció (salvo `allow_stale`).
+        """
+        clave = normalize_url(url)
+        ahora = time.time()
+        with self._lock:
+            fila = self._conn.execute('SELECT contenido, guardado FROM respuestas WHERE url = ?', (clave,)).fetchone()
+            vigente = fila is not None and (allow_stale or self.ttl is None or ahora - fila[1] <= self.ttl)
+            if not vigente:
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE respuestas SET accedido = ? WHERE url = ?', (ahora, clave))
+            self.hits += 1
+        return json.loads(zlib.decompress(fila[0]))
+
+    def set(self, url, payload):
+        contenido = zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+        ahora = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO respuestas (url, contenido, bytes, guardado, accedido) VALUES (?, ?, ?, ?, ?)',
+                (normalize_url(url), contenido, len(contenido), ahora, ahora),
+            )
+            self._evict()
+
+    def _evict(self):
+        """
+        Desaloja las entradas menos usadas recientemente hasta quedar bajo `max_bytes`.
+        """
+        if self.max_bytes is None:
+            return
+        total = self._conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM respuestas').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        borrar = []
+        for url, bytes_ in self._conn.execute('SELECT url, bytes FROM respuestas ORDER BY accedido'):
+            if total <= self.max_bytes:
+                break
+            borrar.append((url,))
+            total -= bytes_
+        self._conn.executemany('DELETE FROM respuestas WHERE url = ?', borrar)
+
+    def purge_expired(self):
+        """
+        Borra las entradas vencidas. Devuelve cuántas se borraron.
+        """
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute('DELETE FROM respuestas WHERE guardado < ?', (time.time() - self.ttl,))
+            return cursor.rowcount
+
+    def stats(self):
+        with self._lock:
+            entradas, total = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM respuestas').fetchone()
+        return {'entradas': entradas, 'bytes': total, 'hits': self.hits, 'misses': self.misses}
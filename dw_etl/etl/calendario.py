@@ -0,0 +1,89 @@
+# dw_etl/etl/calendario.py
+"""
+Generación de la dimensión de fechas (DimFecha).
+
+Las fechas de un rango se construyen de forma vectorizada con `pandas.date_range` al
+grano pedido (año, trimestre, mes o día) y solo se insertan las que faltan, con un
+único `bulk_create(ignore_conflicts=True)`. Si no falta ninguna, el costo es una sola
+consulta.
+"""
+from datetime import date
+
+import pandas as pd
+
+from dw_etl.models import DimFecha
+
+# Frecuencia de pandas para cada grano: una fecha al inicio de cada período
+GRANOS = {
+    'anio': 'YS',
+    'trimestre': 'QS',
+    'mes': 'MS',
+    'dia': 'D',
+}
+
+
+def calendar_rows(fechas):
+    """
+    Filas de DimFecha (sin guardar) para un iterable de fechas, con los atributos
+    calculados por columnas sobre un índice de pandas.
+    """
+    indice = pd.DatetimeIndex(sorted(set(fechas)))
+    if indice.empty:
+        return []
+    columnas = zip(
+        indice.date,
+        indice.day,
+        indice.month,
+        indice.strftime('%B'),
+        indice.quarter,
+        indice.year,
+        indice.isocalendar().week,
+        indice.dayofweek >= 5,
+    )
+    return [
+        DimFecha(
+            fecha_completa=fecha,
+            dia=int(dia),
+            mes=int(mes),
+            nombre_mes=nombre_mes,
+            trimestre=int(trimestre),
+            anio=int(anio),
+            semana_del_anio=int(semana),
+            es_fin_de_semana=bool(fin_de_semana),
+        )
+        for fecha, dia, mes, nombre_mes, trimestre, anio, semana, fin_de_semana in columnas
+    ]
+
+
+def calendar_dates(start_year, end_year, grano='anio'):
+    """
+    Fechas de inicio de cada período del grano entre el 1 de enero de `start_year` y el
+    31 de diciembre de `end_year`.
+    """
+    if grano not in GRANOS:
+        raise ValueError(f"Grano de calendario inválido: {grano!r}. Opciones: {', '.join(GRANOS)}.")
+    return pd.date_range(date(start_year, 1, 1), date(end_year, 12, 31), freq=GRANOS[grano]).date
+
+
+def ensure_dates(fechas):
+    """
+    Inserta en DimFecha las fechas de `fechas` que aún no existen. Devuelve cuántas se crearon.
+    """
+    fechas = set(fechas)
+    if not fechas:
+        return 0
+    existentes = set(
+        DimFecha.objects.filter(fecha_completa__range=(min(fechas), max(fechas))).values_list('fecha_completa', flat=True)
+    )
+    faltantes = fechas - existentes
+    if faltantes:
+        DimFecha.objects.bulk_create(calendar_rows(faltantes), ignore_conflicts=True)
+    return len(faltantes)
+
+
+def ensure_calendar(start_year, end_year, grano='anio'):
+    """
+    Completa DimFecha con el calendario de `start_year` a `end_year` al grano pedido.
+    Devuelve cuántas fechas se crearon.
+    """
+    return ensure_dates(calendar_dates(start_year, end_year, grano))
@@ -0,0 +1,103 @@
+# dw_etl/etl/config.py
+"""
+Configuración del ETL: catálogo de países e indicadores del Banco Mundial y rango de años.
+"""
+import json
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from .worldbank import ANUAL, FORMATO_RANGO
+
+# Catálogo por defecto de países e indicadores (ver `load_catalog`)
+CATALOG_PATH = Path(__file__).with_name('catalogo.json')
+
+# Años históricos por defecto para los países sin 'historical_years' en el catálogo
+DEFAULT_HISTORICAL_YEARS = 10
+
+# Rango global de años para buscar datos en la API del Banco Mundial
+# La API del Banco Mundial suele tener datos desde 1960
+GLOBAL_MIN_YEAR_API = 1960
+
+# Países (lista de {'name', 'iso', 'historical_years'}) e indicadores
+# (nombre -> {'wb_code', 'unidad', 'descripcion'}) de un catálogo
+Catalogo = namedtuple('Catalogo', 'paises indicadores')
+
+
+class CatalogError(ValueError):
+    """
+    El archivo de catálogo no existe o no tiene el formato esperado.
+    """
+
+
+def load_catalog(path=None):
+    """
+    Lee el catálogo JSON de países e indicadores (por defecto, `CATALOG_PATH`):
+
+        {
+            "paises": [{"name": "Chile", "iso": "CHL", "historical_years": "all"}, ...],
+            "indicadores": {"Inflación": {"wb_code": "FP.CPI.TOTL.ZG", "unidad": "%"}, ...}
+        }
+
+    'historical_years' es 'all' o una cantidad de años; 'descripcion' es opcional, igual
+    que 'frecuencia' ('anual', 'trimestral' o 'mensual'; por defecto 'anual').
+    """
+    path = Path(path or CATALOG_PATH)
+    try:
+        datos = json.loads(path.read_text(encoding='utf-8'))
+        paises = [
+            {
+                'name': pais['name'],
+                'iso': pais['iso'].upper(),
+                'historical_years': pais.get('historical_years', DEFAULT_HISTORICAL_YEARS),
+            }
+            for pais in datos['paises']
+        ]
+        indicadores = {
+            nombre: {
+                'wb_code': info['wb_code'],
+                'unidad': info['unidad'],
+                'descripcion': info.get('descripcion') or f'Datos de {nombre} de World Bank API',
+                'frecuencia': info.get('frecuencia', ANUAL),
+            }
+            for nombre, info in datos['indicadores'].items()
+        }
+        for nombre, info in indicadores.items():
+            if info['frecuencia'] not in FORMATO_RANGO:
+                raise ValueError(f"frecuencia inválida para {nombre}: {info['frecuencia']!r}")
+    except OSError as e:
+        raise CatalogError(f'No se pudo leer el catálogo {path}: {e}')
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise CatalogError(f'Catálogo {path} inválido: {e!r}')
+    return Catalogo(paises, indicadores)
+
+
+def global_max_year():
+    """
+    Último año que se pide a la API (el año actual).
+    """
+    return datetime.now().year
+
+
+def start_year(historical_years, end_year):
+    """
+    Primer año a pedir según `historical_years` ('all' o cantidad de años hasta `end_year`).
+    """
+    if historical_years == 'all':
+        return GLOBAL_MIN_YEAR_API
+    return max(GLOBAL_MIN_YEAR_API, end_year - int(historical_years) + 1)
+
+
+def parse_years(valor, end_year):
+    """
+    Interpreta la opción `--years`: 'all', una cantidad de años hasta `end_year` o un
+    rango 'INICIO:FIN'. Devuelve `(start_year, end_year)`; lanza ValueError si no es válida.
+    """
+    if ':' in valor:
+        inicio, fin = (int(parte) for parte in valor.split(':', 1))
+        if inicio > fin:
+            raise ValueError(f'Rango de años inválido: {valor}.')
+        return max(GLOBAL_MIN_YEAR_API, inicio), fin
+    if valor != 'all' and int(valor) < 1:
+        raise ValueError(f'Cantidad de años inválida: {valor}.')
+    return start_year(valor, end_year), end_year
@@ -0,0 +1,168 @@
+# dw_etl/etl/fake_api.py
+"""
+Servidor HTTP local que imita la API del Banco Mundial (`/v2/country/<isos>/indicator/<codigo>`
+y la metadata de países, `/v2/country/<isos>`).
+Se usa en los tests y benchmarks del ETL para no depender de la red.
+"""
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def valor_sintetico(iso, wb_code, anio):
+    """
+    Valor determinista para (país, indicador, año), o None para simular años sin dato.
+    En series trimestrales o mensuales `anio` es el período de la API ('2020Q1', '2020M01').
+    """
+    digest = hashlib.md5(f'{iso}|{wb_code}|{anio}'.encode()).digest()
+    if digest[0] % 10 == 0:
+        return None
+    return round(int.from_bytes(digest[1:5], 'big') / 2**32 * 20 - 5, 4)
+
+
+REGIONES_SINTETICAS = ['Latin America & Caribbean ', 'Europe & Central Asia', 'East Asia & Pacific', 'Sub-Saharan Africa ']
+GRUPOS_INGRESOS_SINTETICOS = ['High income', 'Upper middle income', 'Lower middle income', 'Low income']
+
+
+def pais_sintetico(iso):
+    """
+    Fila determinista del recurso de países para un código ISO.
+    """
+    digest = hashlib.md5(iso.encode()).digest()
+    region = REGIONES_SINTETICAS[digest[0] % len(REGIONES_SINTETICAS)]
+    ingresos = GRUPOS_INGRESOS_SINTETICOS[digest[1] % len(GRUPOS_INGRESOS_SINTETICOS)]
+    return {
+        'id': iso, 'iso2Code': iso[:2], 'name': iso,
+        'region': {'id': region[:3].upper(), 'iso2code': '', 'value': region},
+        'incomeLevel': {'id': ingresos[:3].upper(), 'iso2code': '', 'value': ingresos},
+        'capitalCity': f'Capital de {iso}',
+    }
+
+
+class FakeWorldBankAPI:
+    """
+    Levanta el servidor en un hilo y expone `base_url` para pasarlo al extractor.
+
+        with FakeWorldBankAPI() as api:
+            call_command('populate_dw', api_url=api.base_url)
+            api.request_count
+    """
+
+    def __init__(self, min_year=1960, max_year=None, value_fn=valor_sintetico, fail_times=0, failing_codes=(), invalid_isos=()):
+        self.min_year = min_year
+        self.max_year = max_year
+        self.value_fn = value_fn
+        # Fallas simuladas: cada ruta responde 503 sus primeras `fail_times` veces,
+        # y los indicadores en `failing_codes` responden 503 siempre
+        self.fail_times = fail_times
+        self.failing_codes = set(failing_codes)
+        # Países que la API rechaza: falla toda llamada que incluya alguno de ellos
+        self.invalid_isos = set(invalid_isos)
+        self._failures_by_path = {}
+        self.request_count = 0
+        self.requested_paths = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v2/country'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, payload = api.handle(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, path):
+        with self._lock:
+            self.request_count += 1
+            self.requested_paths.append(path)
+            fallas = self._failures_by_path.get(path, 0)
+            if fallas < self.fail_times:
+                self._failures_by_path[path] = fallas + 1
+                return 503, {'error': 'Servicio no disponible (simulado)'}
+
+        url = urlsplit(path) # urlparse separaría los países tras el último ";" como parámetros
+        partes = url.path.strip('/').split('/')
+        # v2/country/<isos>: metadata de los países
+        if len(partes) == 3 and partes[1] == 'country':
+            filas = [pais_sintetico(iso) for iso in partes[2].split(';')]
+            meta = {'page': 1, 'pages': 1, 'per_page': len(filas), 'total': len(filas)}
+            return 200, [meta, filas]
+        # v2/country/<isos>/indicator/<codigo>
+        if len(partes) != 5 or partes[1] != 'country' or partes[3] != 'indicator':
+            return 404, [{'message': [{'id': '120', 'key': 'Invalid value', 'value': 'Ruta no soportada'}]}]
+        isos, wb_code = partes[2].split(';'), partes[4]
+        if wb_code in self.failing_codes:
+            return 503, {'error': 'Servicio no disponible (simulado)'}
+        if self.invalid_isos.intersection(isos):
+            return 200, [{'message': [{'id': '120', 'key': 'Invalid value', 'value': 'The provided parameter value is not valid'}]}]
+        query =  parse_qs(url.query)
+        desde, _, hasta = query.get('date', [f'{self.min_year}:{self.max_year or self.min_year}'])[0].partition(':')
+        # Frecuencia según el formato del período: '2020', '2020Q1' o '2020M01'
+        marca = desde[4:5].upper()
+        desde, hasta = int(desde[:4]), int((hasta or desde)[:4])
+        if self.max_year is not None:
+            hasta = min(hasta, self.max_year)
+        desde = max(desde, self.min_year)
+        per_page = int(query.get('per_page', ['50'])[0])
+        page = int(query.get('page', ['1'])[0])
+
+        # La API real devuelve los períodos de más reciente a más antiguo
+        if marca == 'M':
+            periodos = [f'{anio}M{mes:02d}' for anio in range(hasta, desde - 1, -1) for mes in range(12, 0, -1)]
+        elif marca == 'Q':
+            periodos = [f'{anio}Q{trimestre}' for anio in range(hasta, desde - 1, -1) for trimestre in range(4, 0, -1)]
+        else:
+            periodos = list(range(hasta, desde - 1, -1))
+        filas = [
+            {
+                'indicator': {'id': wb_code, 'value': wb_code},
+                'country': {'id': iso[:2], 'value': iso},
+                'countryiso3code': iso,
+                'date': str(periodo),
+                'value': self.value_fn(iso, wb_code, periodo),
+                'unit': '', 'obs_status': '', 'decimal': 1,
+            }
+            for iso in isos
+            for periodo in periodos
+        ]
+        total = len(filas)
+        pages = max(1, -(-total // per_page))
+        meta = {
+            'page': page, 'pages': pages, 'per_page': per_page, 'total': total,
+            'sourceid': '2', 'lastupdated': '2025-07-01',
+        }
+        return 200, [meta, filas[(page - 1) * per_page:page * per_page]]
@@ -0,0 +1,166 @@
+# dw_etl/etl/fetch.py
+"""
+Motor de descarga concurrente para el ETL.
+
+- Una sola `requests.Session` con pool de conexiones keep-alive (sin un handshake TLS por llamada).
+- Las solicitudes corren en un pool de hilos, con un límite de solicitudes simultáneas por host.
+- Los errores transitorios (red, 429, 5xx) se reintentan con backoff exponencial y jitter.
+- Las solicitudes que fallan definitivamente quedan registradas en `stats.failures`
+  en lugar de descartarse en silencio.
+- Opcionalmente, las respuestas pasan por una `ResponseCache` en disco; en modo
+  `replay` solo se usa la caché y nunca la red.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Códigos HTTP que vale la pena reintentar
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CacheMissError(requests.exceptions.RequestException):
+    """En modo replay, la URL pedida no está en la caché."""
+
+
+class FetchStats:
+    """
+    Contadores de una ejecución del motor. Seguro para usar desde varios hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.bytes_downloaded = 0 # Cuerpos de las respuestas HTTP (sin las de la caché)
+        self.failures = [] # Lista de (url, mensaje de error)
+
+    def add(self, requests=0, retries=0, cache_hits=0, bytes_downloaded=0, failure=None):
+        with self._lock:
+            self.requests += requests
+            self.retries += retries
+            self.cache_hits += cache_hits
+            self.bytes_downloaded += bytes_downloaded
+            if failure is not None:
+                self.failures.append(failure)
+
+    @property
+    def failed(self):
+        return len(self.failures)
+
+
+class FetchEngine:
+    """
+    Descarga JSON en paralelo reutilizando conexiones.
+
+        with FetchEngine(max_workers=8, max_per_host=4) as engine:
+            resultados = engine.map(engine.get_json, urls)
+    """
+
+    def __init__(self, max_workers=8, max_per_host=4, retries=4, backoff_base=0.5, backoff_max=30.0, timeout=30,
+                 cache=None, replay=False):
+        if replay and cache is None:
+            raise ValueError('El modo replay requiere una caché de respuestas.')
+        self.cache = cache
+        self.replay = replay
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.stats = FetchStats()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max(1, max_per_host), pool_maxsize=max(max_workers, max_per_host))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dw-fetch')
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._host_limits[host]
+
+    def _backoff(self, attempt, response=None):
+        """
+        Espera antes del siguiente intento: backoff exponencial con jitter completo,
+        respetando `Retry-After` si el servidor lo envía.
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = min(self.backoff_max, float(retry_after))
+        else:
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_json(self, url):
+        """
+        GET con reintentos. Lanza la última excepción si se agotan los intentos
+        (y deja registrada la falla en `stats`).
+        """
+        if self.cache is not None:
+            payload = self.cache.get(url, allow_stale=self.replay)
+            if payload is not None:
+                self.stats.add(cache_hits=1)
+                return payload
+            if self.replay:
+                error = CacheMissError(f'Sin respuesta en caché para {url}')
+                self.stats.add(failure=(url, str(error)))
+                raise error
+
+        limit = self._host_limit(url)
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with limit:
+                    self.stats.add(requests=1)
+                    response = self.session.get(url, timeout=self.timeout)
+                self.stats.add(bytes_downloaded=len(response.content))
+                response.raise_for_status()
+                payload = response.json()
+                if self.cache is not None:
+                    self.cache.set(url, payload)
+                return payload
+            except requests.exceptions.RequestException as e:
+                transitorio = response is None or response.status_code in RETRY_STATUSES
+                if not transitorio or attempt == self.retries:
+                    self.stats.add(failure=(url, str(e)))
+                    raise
+                self.stats.add(retries=1)
+                self._backoff(attempt, response)
+
+    def map(self, fn, items):
+        """
+        Aplica `fn` a cada elemento en el pool de hilos. Devuelve una lista de
+        (item, resultado, error) en el mismo orden; las excepciones no se propagan.
+        """
+        futures = [(item, self._executor.submit(fn, item)) for item in items]
+        resultados = []
+        for item, future in futures:
+            try:
+                resultados.append((item, future.result(), None))
+            except Exception as e:
+                resultados.append((item, None, e))
+        return resultados
@@ -0,0 +1,302 @@
+# dw_etl/etl/loader.py
+"""
+Carga por conjuntos de HechosEconomicos.
+
+Las claves de las dimensiones se resuelven una sola vez y quedan en mapas en memoria
+(fecha -> id, ISO -> id, indicador -> id). Los hechos se insertan o actualizan por lotes
+con `bulk_create(update_conflicts=True)`, un lote por transacción, en vez de un
+`update_or_create` (SELECT + INSERT/UPDATE + commit) por valor.
+
+Antes de escribir un lote se leen los valores actuales de sus hechos (una consulta por
+lote): los hechos sin cambios no se vuelven a escribir, y la carga informa cuántos
+hechos insertó, actualizó y dejó sin cambios.
+
+Las filas de dimensión que faltan se crean a demanda, con un `bulk_create` por
+dimensión: los países e indicadores del catálogo en `ensure_dimensions` y las fechas
+de los períodos que aparecen en cada lote de hechos.
+
+El período de un hecho es un año (se guarda en el 1 de enero) o, para series
+trimestrales y mensuales, la fecha de inicio del trimestre o mes.
+"""
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from dw_etl.etl.calendario import ensure_dates
+from dw_etl.models import DimFecha, DimIndicadorEconomico, DimPais, HechosEconomicos
+
+# Campos de DimPais que se completan con la metadata de la API
+CAMPOS_METADATA_PAIS = ['region', 'grupo_ingresos', 'capital']
+
+# Clave natural de un hecho (coincide con el unique_together del modelo)
+UNIQUE_FIELDS = ['id_fecha', 'id_pais', 'id_indicador']
+UPDATE_FIELDS = ['valor', 'id_fuente']
+
+BATCH_SIZE = 2000
+
+VALOR_DECIMALES = HechosEconomicos._meta.get_field('valor').decimal_places
+
+
+class FactLoader:
+    """
+    Carga hechos `(iso, periodo, indicador, valor)` contra una fuente de datos, donde
+    `periodo` es un año (int) o una fecha.
+
+        loader = FactLoader(fuente)
+        loader.load(filas)          # un lote por transacción
+        loader.load_series(filas)   # toda la serie en una transacción
+        loader.rows, loader.elapsed
+        loader.inserted, loader.updated, loader.unchanged
+    """
+
+    def __init__(self, fuente, batch_size=BATCH_SIZE):
+        self.fuente = fuente
+        self.batch_size = batch_size
+        self.rows = 0
+        self.elapsed = 0.0
+        self.skipped = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        # Claves (año, id_pais) de los hechos cargados, para refrescar HechosPaisAnio
+        self.touched = set()
+        self.refresh_keys()
+
+    def refresh_keys(self):
+        """
+        (Re)carga los mapas de claves de las dimensiones: tres consultas en total.
+        """
+        self.fechas = dict(DimFecha.objects.values_list('fecha_completa', 'id'))
+        self.paises = dict(DimPais.objects.values_list('codigo_iso', 'id'))
+        self.indicadores = dict(DimIndicadorEconomico.objects.values_list('nombre_indicador', 'id'))
+
+    def ensure_dimensions(self, paises=(), indicadores=None):
+        """
+        Crea en una sola pasada los países (`{'iso', 'name'}`, con 'region' y
+        'grupo_ingresos' opcionales) e indicadores
+        (`nombre -> {'unidad', 'descripcion'}`) que aún no existen, y actualiza los mapas.
+        Devuelve las filas de DimPais creadas.
+        """
+        nuevos_paises = [
+            DimPais(
+                codigo_iso=pais_data['iso'],
+                nombre_pais=pais_data['name'],
+                continente='N/A', # Estos campos podrían poblarse de otra fuente
+                region=pais_data.get('region', 'N/A'),
+                capital='N/A',
+                grupo_ingresos=pais_data.get('grupo_ingresos'),
+            )
+            for pais_data in paises if pais_data['iso'] not in self.paises
+        ]
+        nuevos_indicadores = [
+            DimIndicadorEconomico(
+                nombre_indicador=nombre,
+                descripcion_indicador=info.get('descripcion'),
+                unidad_medida=info['unidad'],
+                frecuencia=info.get('frecuencia', 'anual'),
+            )
+            for nombre, info in (indicadores or {}).items() if nombre not in self.indicadores
+        ]
+        # Los indicadores existentes toman la frecuencia del catálogo: un UPDATE por frecuencia
+        por_frecuencia = {}
+        for nombre, info in (indicadores or {}).items():
+            if nombre in self.indicadores:
+                por_frecuencia.setdefault(info.get('frecuencia', 'anual'), []).append(nombre)
+        for frecuencia, nombres in por_frecuencia.items():
+            DimIndicadorEconomico.objects.filter(nombre_indicador__in=nombres).exclude(frecuencia=frecuencia).update(frecuencia=frecuencia)
+        if nuevos_paises:
+            DimPais.objects.bulk_create(nuevos_paises, ignore_conflicts=True)
+            self.paises = dict(DimPais.objects.values_list('codigo_iso', 'id'))
+        if nuevos_indicadores:
+            DimIndicadorEconomico.objects.bulk_create(nuevos_indicadores, ignore_conflicts=True)
+            self.indicadores = dict(DimIndicadorEconomico.objects.values_list('nombre_indicador', 'id'))
+        return nuevos_paises
+
+    def countries_without_metadata(self, isos):
+        """
+        Códigos ISO de `isos` cuyos países aún no tienen región asignada.
+        """
+        return list(
+            DimPais.objects.filter(Q(region__isnull=True) | Q(region__in=['', 'N/A']), codigo_iso__in=isos)
+            .values_list('codigo_iso', flat=True)
+        )
+
+    def update_country_metadata(self, metadata):
+        """
+        Completa región, grupo de ingresos y capital de los países (`iso -> MetadataPais`)
+        con un solo `bulk_update`. Los datos que la API no informa no se sobrescriben.
+        Devuelve los países modificados.
+        """
+        modificados = []
+        for pais in DimPais.objects.filter(codigo_iso__in=metadata):
+            nuevos = {campo: valor for campo, valor in metadata[pais.codigo_iso]._asdict().items() if valor is not None}
+            if any(getattr(pais, campo) != valor for campo, valor in nuevos.items()):
+                for campo, valor in nuevos.items():
+                    setattr(pais, campo, valor)
+                modificados.append(pais)
+        DimPais.objects.bulk_update(modificados, CAMPOS_METADATA_PAIS, batch_size=self.batch_size)
+        return modificados
+
+    def ensure_fechas(self, fechas):
+        """
+        Crea en una sola pasada las filas de DimFecha de las fechas que faltan.
+        """
+        faltantes = set(fechas) - self.fechas.keys()
+        if not faltantes:
+            return
+        ensure_dates(faltantes)
+        self.fechas.update(DimFecha.objects.filter(fecha_completa__in=faltantes).values_list('fecha_completa', 'id'))
+
+    def build(self, iso, periodo, indicador, valor):
+        """
+        Construye (sin guardar) el hecho para un valor. Devuelve None si el país o
+        el indicador no existen en las dimensiones. La fecha se asigna al guardar el lote.
+        """
+        pais_id = self.paises.get(iso)
+        indicador_id = self.indicadores.get(indicador)
+        if pais_id is None or indicador_id is None:
+            return None
+        return HechosEconomicos(
+            anio=periodo.year if isinstance(periodo, date) else periodo,
+            id_pais_id=pais_id,
+            id_indicador_id=indicador_id,
+            id_fuente_id=self.fuente.id,
+            valor=valor,
+        )
+
+    def load(self, filas):
+        """
+        Inserta o actualiza los hechos de `filas` (iterable de `(iso, periodo, indicador, valor)`)
+        en lotes de `batch_size`, cada lote en su propia transacción. Los contadores y
+        `touched` suman cada lote al confirmarse su transacción. Devuelve la cantidad de
+        hechos cargados.
+        """
+        inicio = time.perf_counter()
+        cargados = 0
+        previas = set(self.fechas)
+        try:
+            for lote in self._lotes(filas):
+                # Las fechas se crean antes y fuera de la transacción que escribe los hechos
+                self.ensure_fechas(fecha for fecha, _ in lote)
+                conteo = _Conteo()
+                with transaction.atomic():
+                    cargados += self._upsert(lote, conteo)
+                self._sumar(conteo)
+        except Exception:
+            # Si la carga corre dentro de una transacción del llamador, su rollback también
+            # deshace las fechas creadas aquí: se quitan del mapa (se vuelven a buscar)
+            for fecha in self.fechas.keys() - previas:
+                del self.fechas[fecha]
+            raise
+        finally:
+            self.elapsed += time.perf_counter() - inicio
+        return cargados
+
+    def load_series(self, filas):
+        """
+        Carga los hechos de una serie en una sola transacción: si algo falla no queda
+        ningún hecho de la serie, ni en la base de datos ni en los contadores y `touched`.
+        Las fechas que faltan se crean antes, fuera de esa transacción, para que su
+        rollback no deje en el mapa ids de DimFecha que ya no existen.
+        """
+        inicio = time.perf_counter()
+        try:
+            lotes = list(self._lotes(filas))
+            self.ensure_fechas(fecha for lote in lotes for fecha, _ in lote)
+            conteo = _Conteo()
+            with transaction.atomic():
+                cargados = sum(self._upsert(lote, conteo) for lote in lotes)
+            self._sumar(conteo)
+        finally:
+            self.elapsed += time.perf_counter() - inicio
+        return cargados
+
+    def _lotes(self, filas):
+        # Pares (fecha, hecho) en lotes de `batch_size`
+        lote = []
+        for iso, periodo, indicador, valor in filas:
+            hecho = self.build(iso, periodo, indicador, valor)
+            if hecho is None:
+                self.skipped += 1
+                continue
+            lote.append((_fecha(periodo), hecho))
+            if len(lote) >= self.batch_size:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+
+    def _upsert(self, lote, conteo):
+        for fecha, hecho in lote:
+            hecho.id_fecha_id = self.fechas[fecha]
+            conteo.touched.add((hecho.anio, hecho.id_pais_id))
+        actuales = self._current_values([hecho for _, hecho in lote])
+        hechos = []
+        for _, hecho in lote:
+            clave = (hecho.id_fecha_id, hecho.id_pais_id, hecho.id_indicador_id)
+            if clave not in actuales:
+                conteo.inserted += 1
+            elif actuales[clave] == (_decimal(hecho.valor), hecho.id_fuente_id):
+                conteo.unchanged += 1
+                continue
+            else:
+                conteo.updated += 1
+            hechos.append(hecho)
+        if hechos:
+            HechosEconomicos.objects.bulk_create(
+                hechos,
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPDATE_FIELDS,
+            )
+        conteo.rows += len(lote)
+        return len(lote)
+
+    def _sumar(self, conteo):
+        self.rows += conteo.rows
+        self.inserted += conteo.inserted
+        self.updated += conteo.updated
+        self.unchanged += conteo.unchanged
+        self.touched |= conteo.touched
+
+    def _current_values(self, hechos):
+        """
+        `(id_fecha, id_pais, id_indicador) -> (valor, id_fuente)` de los hechos ya
+        guardados de un lote, en una consulta.
+        """
+        existentes = HechosEconomicos.objects.filter(
+            id_fecha__in={h.id_fecha_id for h in hechos},
+            id_pais__in={h.id_pais_id for h in hechos},
+            id_indicador__in={h.id_indicador_id for h in hechos},
+        ).values_list(*UNIQUE_FIELDS, *UPDATE_FIELDS)
+        return {(fecha, pais, indicador): (valor, fuente) for fecha, pais, indicador, valor, fuente in existentes}
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+class _Conteo:
+    """
+    Contadores de una transacción de carga; se suman a los del loader solo si se confirma.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.touched = set()
+
+
+def _fecha(periodo):
+    # Fecha de DimFecha de un período: el 1 de enero para los años
+    return periodo if isinstance(periodo, date) else date(periodo, 1, 1)
+
+
+def _decimal(valor):
+    # El valor como lo guarda el campo (6 decimales), para compararlo con el guardado
+    return None if valor is None else round(Decimal(str(valor)), VALOR_DECIMALES)
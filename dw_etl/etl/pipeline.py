@@ -0,0 +1,229 @@
+# dw_etl/etl/pipeline.py
+"""
+Pipeline del ETL en tres etapas conectadas por colas acotadas:
+
+    extracción (pool de `workers` hilos) -> transformación (un hilo) -> carga (hilo principal)
+
+- La extracción descarga lotes de países que comparten indicador y año inicial (una
+  llamada de rango por lote, hasta `countries_per_call` países). Si la llamada de un
+  lote falla, se reintenta cada país por separado.
+- La transformación separa cada lote por país, descarta las series sin cambios (modo
+  incremental) y prepara las filas de hechos.
+- La carga escribe cada serie país × indicador en su propia transacción y solo entonces
+  registra su marca de agua. Es la única etapa que usa la base de datos.
+
+`tiempos` acumula los segundos de trabajo de cada etapa (sin las esperas en las colas;
+la extracción suma el tiempo de todos sus hilos), para saber qué etapa limita una
+ejecución.
+
+Las colas acotadas frenan la extracción si la carga se atrasa, así que la memoria no
+crece con la cantidad de países. Un error en un lote o en una serie queda registrado y
+no detiene al resto.
+"""
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .worldbank import ANUAL, MAX_PAISES_POR_LLAMADA
+
+DEFAULT_WORKERS = 4
+QUEUE_SIZE = 16
+
+# Lote de extracción: una llamada de rango para varios países y un indicador
+Lote = namedtuple('Lote', 'indicador wb_code start_year end_year isos frecuencia', defaults=[ANUAL])
+# Resultado de la extracción de un lote (observaciones o error)
+Extraido = namedtuple('Extraido', 'lote observaciones lastupdated error')
+ETAPAS = ('extraccion', 'transformacion', 'carga')
+
+# Serie país × indicador lista para cargar
+SerieTransformada = namedtuple('SerieTransformada', 'iso indicador inicio serie filas lastupdated')
+
+_FIN = object()
+
+
+def plan_lotes(inicios, indicadores, end_year, marcas=None, incremental=False, countries_per_call=MAX_PAISES_POR_LLAMADA):
+    """
+    Agrupa las series en lotes de extracción. `inicios` es `iso -> año inicial` e
+    `indicadores` es `nombre -> {'wb_code', 'frecuencia'}` (la frecuencia es opcional y
+    por defecto anual). En modo incremental el año inicial de cada serie sale de su
+    marca de agua.
+    """
+    paises_por_tarea = {}
+    for iso, inicio in inicios.items():
+        for indicador in indicadores:
+            start_year = marcas.start_year(iso, indicador, inicio) if incremental else inicio
+            paises_por_tarea.setdefault((indicador, start_year), []).append(iso)
+    return [
+        Lote(
+            indicador,
+            indicadores[indicador]['wb_code'],
+            start_year,
+            end_year,
+            tuple(isos[i:i + countries_per_call]),
+            indicadores[indicador].get('frecuencia', ANUAL),
+        )
+        for (indicador, start_year), isos in paises_por_tarea.items()
+        for i in range(0, len(isos), countries_per_call)
+    ]
+
+
+class EtlPipeline:
+    """
+    Ejecuta los lotes de `plan_lotes` a través de las tres etapas.
+
+        pipeline = EtlPipeline(extractor, loader, marcas, inicios, workers=8)
+        pipeline.run(lotes)
+        pipeline.errores_extraccion, pipeline.errores_series, pipeline.tiempos
+    """
+
+    def __init__(self, extractor, loader, marcas, inicios, workers=DEFAULT_WORKERS, incremental=False, queue_size=QUEUE_SIZE):
+        self.extractor = extractor
+        self.loader = loader
+        self.marcas = marcas
+        self.inicios = inicios
+        self.workers = workers
+        self.incremental = incremental
+        self.queue_size = queue_size
+        self.series_cargadas = 0
+        self.series_sin_cambios = 0
+        self.errores_extraccion = {} # Lote -> excepción
+        self.errores_series = {} # (iso, indicador) -> excepción
+        self.tiempos = dict.fromkeys(ETAPAS, 0.0) # Etapa -> segundos de trabajo
+        self._tiempos_lock = threading.Lock()
+        self._detener = threading.Event()
+
+    def run(self, lotes):
+        extraidos = queue.Queue(self.queue_size)
+        transformadas = queue.Queue(self.queue_size)
+        hilos = [
+            threading.Thread(target=self._extract_stage, args=(lotes, extraidos), name='etl-extract', daemon=True),
+            threading.Thread(target=self._transform_stage, args=(extraidos, transformadas), name='etl-transform', daemon=True),
+        ]
+        for hilo in hilos:
+            hilo.start()
+        try:
+            self._load_stage(transformadas)
+        finally:
+            # Si la carga se interrumpe, las otras etapas dejan de producir
+            self._detener.set()
+            for hilo in hilos:
+                hilo.join()
+
+    def _medir(self, etapa, inicio):
+        with self._tiempos_lock:
+            self.tiempos[etapa] += time.perf_counter() - inicio
+
+    def _put(self, cola, item):
+        while not self._detener.is_set():
+            try:
+                cola.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _get(self, cola):
+        while not self._detener.is_set():
+            try:
+                return cola.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _FIN
+
+    # --- Extracción ---
+
+    def _extract_stage(self, lotes, salida):
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='etl-extract') as pool:
+                futuros = {lote: pool.submit(self._extraer_lote, lote, salida) for lote in lotes}
+            # Un error inesperado en un lote (fuera de los de la API) queda registrado como los demás
+            for lote, futuro in futuros.items():
+                try:
+                    futuro.result()
+                except Exception as e:
+                    self.errores_extraccion[lote] = e
+        finally:
+            self._put(salida, _FIN)
+
+    def _extraer_lote(self, lote, salida):
+        for extraido in self._extraer(lote):
+            self._put(salida, extraido)
+
+    def _extraer(self, lote):
+        """
+        Descarga un lote. Si la llamada conjunta falla (basta un código de país que la
+        API rechace), reintenta cada país por separado para que el error quede solo en
+        los países que fallan: devuelve un Extraido por país en ese caso.
+        """
+        if self._detener.is_set():
+            return []
+        inicio = time.perf_counter()
+        extraidos = self._descargar([lote])
+        if extraidos[0].error is not None and len(lote.isos) > 1 and not self._detener.is_set():
+            extraidos = self._descargar([lote._replace(isos=(iso,)) for iso in lote.isos])
+        self._medir('extraccion', inicio)
+        return extraidos
+
+    def _descargar(self, lotes):
+        tareas = {
+            (lote.indicador, lote.start_year, lote.isos): (
+                list(lote.isos), lote.wb_code, lote.start_year, lote.end_year, lote.frecuencia,
+            )
+            for lote in lotes
+        }
+        resultado, errores = self.extractor.fetch_many(tareas)
+        return [
+            Extraido(lote, resultado.get(clave), self.extractor.lastupdated.get(clave), errores.get(clave))
+            for lote, clave in zip(lotes, tareas)
+        ]
+
+    # --- Transformación ---
+
+    def _transform_stage(self, entrada, salida):
+        try:
+            while (extraido := self._get(entrada)) is not _FIN:
+                if extraido.error is not None:
+                    self.errores_extraccion[extraido.lote] = extraido.error
+                    continue
+                inicio = time.perf_counter()
+                series = list(self._transformar(extraido))
+                self._medir('transformacion', inicio)
+                for serie in series:
+                    self._put(salida, serie)
+        finally:
+            self._put(salida, _FIN)
+
+    def _transformar(self, extraido):
+        lote = extraido.lote
+        por_serie = {iso: [] for iso in lote.isos}
+        for obs in extraido.observaciones:
+            por_serie.setdefault(obs.iso, []).append(obs)
+        for iso, serie in por_serie.items():
+            inicio = self.inicios.get(iso, lote.start_year)
+            try:
+                if self.incremental and self.marcas.unchanged(iso, lote.indicador, serie, inicio):
+                    self.series_sin_cambios += 1
+                    continue
+                # El período es la fecha de la observación (series sub-anuales) o el año
+                filas = [(iso, obs.fecha or obs.anio, lote.indicador, obs.valor) for obs in serie if obs.valor is not None]
+            except Exception as e:
+                self.errores_series[(iso, lote.indicador)] = e
+                continue
+            yield SerieTransformada(iso, lote.indicador, inicio, serie, filas, extraido.lastupdated)
+
+    # --- Carga ---
+
+    def _load_stage(self, entrada):
+        while (serie := self._get(entrada)) is not _FIN:
+            inicio = time.perf_counter()
+            try:
+                self.loader.load_series(serie.filas)
+            except Exception as e:
+                # Una serie con datos inválidos se informa y no detiene al resto
+                self.errores_series[(serie.iso, serie.indicador)] = e
+                continue
+            finally:
+                self._medir('carga', inicio)
+            self.marcas.record(serie.iso, serie.indicador, serie.serie, serie.inicio, serie.lastupdated)
+            self.series_cargadas += 1
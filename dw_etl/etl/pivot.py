@@ -0,0 +1,73 @@
+# dw_etl/etl/pivot.py
+"""
+Mantenimiento de la tabla materializada HechosPaisAnio (una fila por año y país,
+una columna por indicador).
+
+Pivotear es agrupar los hechos por (año, país) y tomar, para cada columna, el valor del
+hecho de su indicador (un agregado filtrado por indicador). Las series trimestrales y
+mensuales tienen varios hechos por año: la columna guarda su promedio anual.
+"""
+from django.db import transaction
+from django.db.models import Avg, Q
+
+from dw_etl.models import HechosEconomicos, HechosPaisAnio
+
+# Columna de HechosPaisAnio de cada indicador
+COLUMNA_PIVOTE = {
+    'Inflación': 'inflacion',
+    'Crecimiento PIB': 'pib_crecimiento',
+    'Tipo de Cambio Dólar': 'tipo_cambio',
+    'IPC': 'ipc',
+}
+
+BATCH_SIZE = 2000
+
+
+def pivot_rows(hechos):
+    """
+    Filas de HechosPaisAnio (sin guardar) calculadas a partir de un queryset de hechos.
+    """
+    agregados = hechos.filter(id_indicador__nombre_indicador__in=COLUMNA_PIVOTE).values(
+        'anio', 'id_pais', 'id_pais__nombre_pais', 'id_pais__codigo_iso'
+    ).annotate(
+        **{columna: Avg('valor', filter=Q(id_indicador__nombre_indicador=indicador)) for indicador, columna in COLUMNA_PIVOTE.items()}
+    ).order_by()
+    for fila in agregados.iterator():
+        yield HechosPaisAnio(
+            anio=fila['anio'],
+            id_pais_id=fila['id_pais'],
+            nombre_pais=fila['id_pais__nombre_pais'],
+            codigo_iso=fila['id_pais__codigo_iso'],
+            **{columna: fila[columna] for columna in COLUMNA_PIVOTE.values()}
+        )
+
+
+def refresh_pivot(claves=None):
+    """
+    Recalcula HechosPaisAnio. `claves` es un iterable de (año, id_pais) modificados por
+    el ETL; si es None se reconstruye la tabla completa. Las filas cuyas claves ya no
+    tienen hechos desaparecen. Devuelve la cantidad de filas escritas.
+    """
+    escritas = 0
+    with transaction.atomic():
+        if claves is None:
+            HechosPaisAnio.objects.all().delete()
+            lote = []
+            for fila in pivot_rows(HechosEconomicos.objects.all()):
+                lote.append(fila)
+                if len(lote) >= BATCH_SIZE:
+                    escritas += len(HechosPaisAnio.objects.bulk_create(lote))
+                    lote = []
+            escritas += len(HechosPaisAnio.objects.bulk_create(lote))
+            return escritas
+
+        # Se agrupan las claves por país: un DELETE y un INSERT por país modificado
+        anios_por_pais = {}
+        for anio, pais_id in claves:
+            anios_por_pais.setdefault(pais_id, set()).add(anio)
+        for pais_id, anios in anios_por_pais.items():
+            HechosPaisAnio.objects.filter(id_pais_id=pais_id, anio__in=anios).delete()
+            filas = list(pivot_rows(HechosEconomicos.objects.filter(id_pais_id=pais_id, anio__in=anios)))
+            HechosPaisAnio.objects.bulk_create(filas, batch_size=BATCH_SIZE)
+            escritas += len(filas)
+    return escritas
@@ -0,0 +1,83 @@
+# dw_etl/etl/rollups.py
+"""
+Mantenimiento de la tabla de agregados HechosGrupoAnio (grupo de países × indicador × año).
+
+Para cada año se toma el valor anual de cada país e indicador (el promedio de los
+períodos en las series trimestrales y mensuales) y se resume por región, por grupo de
+ingresos y para el total de países: cantidad, mínimo, máximo, promedio y mediana, más
+los países del mínimo y del máximo.
+
+Un grupo reúne países distintos, así que el refresco incremental recalcula los años
+completos que tocó el ETL (no solo los países cargados).
+"""
+from statistics import fmean, median
+
+from django.db import transaction
+from django.db.models import Avg
+
+from dw_etl.models import HechosEconomicos, HechosGrupoAnio
+
+# Campo de DimPais de cada agrupación ('mundo' agrupa a todos los países)
+CAMPO_AGRUPACION = {
+    'region': 'id_pais__region',
+    'grupo_ingresos': 'id_pais__grupo_ingresos',
+}
+GRUPO_MUNDO = 'Todos los países'
+
+# Valores de metadata que no identifican un grupo
+SIN_GRUPO = {None, '', 'N/A'}
+
+BATCH_SIZE = 2000
+
+
+def rollup_rows(hechos):
+    """
+    Filas de HechosGrupoAnio (sin guardar) calculadas a partir de un queryset de hechos.
+    """
+    valores_anuales = hechos.values_list(
+        'anio', 'id_indicador', 'id_pais', *CAMPO_AGRUPACION.values()
+    ).annotate(valor_anual=Avg('valor')).filter(valor_anual__isnull=False).order_by()
+
+    # (agrupacion, grupo, indicador, año) -> [(valor, id_pais)]
+    grupos = {}
+    for anio, indicador_id, pais_id, *metadata, valor in valores_anuales.iterator():
+        claves = [('mundo', GRUPO_MUNDO)] + [
+            (agrupacion, grupo) for agrupacion, grupo in zip(CAMPO_AGRUPACION, metadata) if grupo not in SIN_GRUPO
+        ]
+        for agrupacion, grupo in claves:
+            grupos.setdefault((agrupacion, grupo, indicador_id, anio), []).append((valor, pais_id))
+
+    for (agrupacion, grupo, indicador_id, anio), valores in grupos.items():
+        minimo, maximo = min(valores), max(valores)
+        numeros = [valor for valor, _ in valores]
+        yield HechosGrupoAnio(
+            agrupacion=agrupacion,
+            grupo=grupo,
+            anio=anio,
+            id_indicador_id=indicador_id,
+            cantidad=len(valores),
+            minimo=minimo[0],
+            maximo=maximo[0],
+            promedio=fmean(numeros),
+            mediana=median(numeros),
+            id_pais_minimo_id=minimo[1],
+            id_pais_maximo_id=maximo[1],
+        )
+
+
+def refresh_rollups(anios=None):
+    """
+    Recalcula HechosGrupoAnio para los años dados (o la tabla completa si es None).
+    Devuelve la cantidad de filas escritas.
+    """
+    with transaction.atomic():
+        if anios is None:
+            HechosGrupoAnio.objects.all().delete()
+            hechos = HechosEconomicos.objects.all()
+        else:
+            anios = set(anios)
+            HechosGrupoAnio.objects.filter(anio__in=anios).delete()
+            hechos = HechosEconomicos.objects.filter(anio__in=anios)
+        filas = list(rollup_rows(hechos))
+        HechosGrupoAnio.objects.bulk_create(filas, batch_size=BATCH_SIZE)
+    return len(filas)
@@ -0,0 +1,101 @@
+# dw_etl/etl/telemetry.py
+"""
+Telemetría de las ejecuciones del ETL, guardada en la tabla EtlRun.
+
+    telemetria = RunTelemetry(parametros)
+    with telemetria.stage('pivote'):
+        refresh_pivot(loader.touched)
+    telemetria.finish(engine, pipeline, loader, errores)
+    run_summary(telemetria.ejecucion)
+
+La fila se crea al empezar (estado 'en_curso'), así que una ejecución interrumpida
+queda visible; `fail` la marca como fallida. Los tiempos son los de las etapas
+secuenciales del comando (`stage`) más los de trabajo de cada etapa del pipeline
+(extracción, transformación y carga, que corren en paralelo).
+"""
+import time
+from contextlib import contextmanager
+
+from django.utils import timezone
+
+from dw_etl.models import EtlRun
+
+# Campos de EtlRun que forman el resumen JSON
+CAMPOS_RESUMEN = [
+    'estado', 'duracion', 'parametros', 'tiempos', 'solicitudes', 'reintentos', 'bytes_descargados', 'respuestas_cache',
+    'hechos_insertados', 'hechos_actualizados', 'hechos_sin_cambios', 'errores', 'detalle_errores', 'hechos_por_segundo',
+]
+
+# Errores que se guardan con su mensaje (el total se cuenta siempre)
+MAX_DETALLE_ERRORES = 100
+
+
+class RunTelemetry:
+    """
+    Mide una ejecución del ETL y la registra en EtlRun.
+    """
+
+    def __init__(self, parametros):
+        self.ejecucion = EtlRun.objects.create(inicio=timezone.now(), parametros=parametros)
+        self.tiempos = {}
+        self._inicio = time.perf_counter()
+
+    @contextmanager
+    def stage(self, nombre):
+        """
+        Suma la duración del bloque a la etapa `nombre`.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.tiempos[nombre] = self.tiempos.get(nombre, 0.0) + time.perf_counter() - inicio
+
+    def finish(self, engine, pipeline, loader, errores=()):
+        """
+        Guarda los contadores del motor HTTP, del pipeline y del loader. `errores` son
+        los mensajes de las solicitudes y series que fallaron.
+        """
+        ejecucion = self.ejecucion
+        ejecucion.tiempos = {
+            etapa: round(segundos, 3) for etapa, segundos in {**pipeline.tiempos, **self.tiempos}.items()
+        }
+        ejecucion.solicitudes = engine.stats.requests
+        ejecucion.reintentos = engine.stats.retries
+        ejecucion.bytes_descargados = engine.stats.bytes_downloaded
+        ejecucion.respuestas_cache = engine.stats.cache_hits
+        ejecucion.hechos_insertados = loader.inserted
+        ejecucion.hechos_actualizados = loader.updated
+        ejecucion.hechos_sin_cambios = loader.unchanged
+        self._close('con_errores' if errores else 'exitoso', list(errores), loader.rows)
+        return ejecucion
+
+    def fail(self, error):
+        """
+        Marca la ejecución como fallida por una excepción que la interrumpió.
+        """
+        self.ejecucion.tiempos = {etapa: round(segundos, 3) for etapa, segundos in self.tiempos.items()}
+        self._close('fallido', [f'{type(error).__name__}: {error}'], 0)
+        return self.ejecucion
+
+    def _close(self, estado, errores, hechos):
+        ejecucion = self.ejecucion
+        ejecucion.fin = timezone.now()
+        ejecucion.estado = estado
+        ejecucion.duracion = round(time.perf_counter() - self._inicio, 3)
+        ejecucion.errores = len(errores)
+        ejecucion.detalle_errores = errores[:MAX_DETALLE_ERRORES]
+        ejecucion.hechos_por_segundo = round(hechos / ejecucion.duracion, 1) if ejecucion.duracion else 0.0
+        ejecucion.save()
+
+
+def run_summary(ejecucion):
+    """
+    Resumen JSON de una ejecución de EtlRun.
+    """
+    return {
+        'id': ejecucion.pk,
+        'inicio': ejecucion.inicio.isoformat(),
+        'fin': ejecucion.fin.isoformat() if ejecucion.fin else None,
+        **{campo: getattr(ejecucion, campo) for campo in CAMPOS_RESUMEN},
+    }
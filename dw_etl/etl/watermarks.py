@@ -0,0 +1,123 @@
+# dw_etl/etl/watermarks.py
+"""
+Marcas de agua por serie (país × indicador) para la carga incremental.
+
+Cada serie guarda el último año cargado, la fecha `lastupdated` de la API y un hash
+del contenido descargado. En modo incremental solo se piden los años nuevos más una
+ventana de revisión (el Banco Mundial revisa los años recientes), y las series cuyo
+hash no cambió no se vuelven a cargar.
+"""
+import hashlib
+
+from dw_etl.models import MarcaAguaSerie
+
+# Años recientes que se vuelven a pedir (y comparar) en cada corrida incremental, por posibles revisiones
+REVISION_YEARS = 5
+
+
+def _periodo(observacion):
+    # Las observaciones anuales se identifican por el año (como antes de soportar series
+    # trimestrales y mensuales, para no invalidar los hashes guardados)
+    if observacion.fecha is None or (observacion.fecha.month, observacion.fecha.day) == (1, 1):
+        return str(observacion.anio)
+    return observacion.fecha.isoformat()
+
+
+def content_hash(observaciones):
+    """
+    Hash SHA-256 estable de una serie: pares (período, valor) ordenados por período.
+    """
+    digest = hashlib.sha256()
+    for periodo, valor in sorted((_periodo(o), o.valor) for o in observaciones):
+        digest.update(f'{periodo}:{valor!r};'.encode())
+    return digest.hexdigest()
+
+
+class WatermarkStore:
+    """
+    Marcas de agua en memoria, cargadas con una consulta y guardadas con un upsert por lotes.
+    Las claves son `(iso, nombre_indicador)`.
+
+    El hash de cada serie se calcula solo sobre su ventana de revisión (los últimos
+    `revision_years` años hasta el último año con dato), de modo que una corrida
+    completa y una incremental producen el mismo hash si los datos no cambiaron.
+    """
+
+    def __init__(self, paises, indicadores, revision_years=REVISION_YEARS):
+        # paises: ISO -> id; indicadores: nombre -> id (los mismos mapas que usa FactLoader)
+        self.paises = paises
+        self.indicadores = indicadores
+        self.revision_years = revision_years
+        iso_por_id = {v: k for k, v in paises.items()}
+        nombre_por_id = {v: k for k, v in indicadores.items()}
+        self.marcas = {
+            (iso_por_id.get(m.id_pais_id), nombre_por_id.get(m.id_indicador_id)): m
+            for m in MarcaAguaSerie.objects.all()
+        }
+        self.pendientes = {}
+
+    def start_year(self, iso, indicador, default_start):
+        """
+        Primer año a pedir para la serie: los años posteriores al último cargado,
+        más la ventana de revisión. Sin marca se pide desde `default_start`.
+        """
+        marca = self.marcas.get((iso, indicador))
+        if marca is None or marca.ultimo_anio is None:
+            return default_start
+        return max(default_start, marca.ultimo_anio - self.revision_years + 1)
+
+    def _ventana(self, iso, indicador, serie, default_start):
+        """
+        Devuelve (ultimo_anio, desde_anio, hash) de la ventana de revisión de una serie descargada.
+        """
+        anterior = self.marcas.get((iso, indicador))
+        anios = [o.anio for o in serie if o.valor is not None]
+        if anterior is not None and anterior.ultimo_anio is not None:
+            anios.append(anterior.ultimo_anio)
+        ultimo_anio = max(anios) if anios else None
+        desde_anio = default_start if ultimo_anio is None else max(default_start, ultimo_anio - self.revision_years + 1)
+        return ultimo_anio, desde_anio, content_hash(o for o in serie if o.anio >= desde_anio)
+
+    def unchanged(self, iso, indicador, serie, default_start):
+        """
+        True si la ventana de revisión de la serie es idéntica a la de la última carga.
+        """
+        marca = self.marcas.get((iso, indicador))
+        if marca is None:
+            return False
+        _, desde_anio, hash_contenido = self._ventana(iso, indicador, serie, default_start)
+        return marca.desde_anio == desde_anio and marca.hash_contenido == hash_contenido
+
+    def record(self, iso, indicador, serie, default_start, lastupdated=None):
+        """
+        Registra (sin guardar todavía) la nueva marca de una serie descargada.
+        """
+        pais_id = self.paises.get(iso)
+        indicador_id = self.indicadores.get(indicador)
+        if pais_id is None or indicador_id is None:
+            return
+        ultimo_anio, desde_anio, hash_contenido = self._ventana(iso, indicador, serie, default_start)
+        self.pendientes[(iso, indicador)] = MarcaAguaSerie(
+            id_pais_id=pais_id,
+            id_indicador_id=indicador_id,
+            ultimo_anio=ultimo_anio,
+            desde_anio=desde_anio,
+            fecha_actualizacion_api=lastupdated,
+            hash_contenido=hash_contenido,
+        )
+
+    def save(self):
+        """
+        Guarda las marcas registradas en un solo upsert. Devuelve cuántas se guardaron.
+        """
+        marcas = list(self.pendientes.values())
+        if marcas:
+            MarcaAguaSerie.objects.bulk_create(
+                marcas,
+                update_conflicts=True,
+                unique_fields=['id_pais', 'id_indicador'],
+                update_fields=['ultimo_anio', 'desde_anio', 'fecha_actualizacion_api', 'hash_contenido', 'fecha_carga'],
+            )
+        self.marcas.update(self.pendientes)
+        self.pendientes = {}
+        return len(marcas)
@@ -0,0 +1,227 @@
+# dw_etl/etl/worldbank.py
+"""
+Extracción por rangos desde la API del Banco Mundial.
+
+En lugar de una llamada HTTP por país, indicador y año (`?date=2020`), se pide el
+rango completo de años (`date=1960:2025`) para varios países a la vez
+(`/country/CHL;ARG;BRA/indicator/...`), con `per_page` fijado y recorriendo todas
+las páginas que indique la metadata de la respuesta. Las llamadas se hacen en
+paralelo a través de `FetchEngine`.
+
+Las series trimestrales y mensuales usan los formatos de período de la API
+(`date=2020Q1:2024Q4`, `date=2020M01:2024M12`).
+
+La metadata de los países (región, grupo de ingresos, capital) sale del mismo recurso
+sin indicador (`/country/CHL;ARG`).
+"""
+from collections import namedtuple
+from datetime import date
+
+from .fetch import FetchEngine
+
+WORLD_BANK_API_BASE_URL = 'https://api.worldbank.org/v2/country'
+
+# Máximo de filas por página que acepta la API sin problemas
+PER_PAGE = 1000
+
+# Máximo de países por llamada (para no generar URLs demasiado largas)
+MAX_PAISES_POR_LLAMADA = 50
+
+# Una observación de la API: país (ISO alpha-3), año, valor (None si la API no tiene dato)
+# y fecha de inicio del período (el 1 de enero en las series anuales)
+Observacion = namedtuple('Observacion', ['iso', 'anio', 'valor', 'fecha'], defaults=[None])
+
+# Metadata de un país según la API (None donde la API no informa el dato)
+MetadataPais = namedtuple('MetadataPais', ['region', 'grupo_ingresos', 'capital'])
+
+ANUAL = 'anual'
+
+# Formato de los extremos del rango `date=` para cada frecuencia
+FORMATO_RANGO = {
+    'anual': ('{}', '{}'),
+    'trimestral': ('{}Q1', '{}Q4'),
+    'mensual': ('{}M01', '{}M12'),
+}
+
+
+class WorldBankAPIError(Exception):
+    """La API respondió, pero con un mensaje de error en lugar de datos."""
+
+
+def build_indicator_url(base_url, isos, wb_code, start_year, end_year, page=1, per_page=PER_PAGE, frecuencia=ANUAL):
+    """
+    Construye la URL para pedir un indicador de uno o varios países en un rango de años,
+    con todos los períodos de la frecuencia de la serie.
+    """
+    paises = ';'.join(isos)
+    desde, hasta = FORMATO_RANGO[frecuencia]
+    return (
+        f"{base_url}/{paises}/indicator/{wb_code}"
+        f"?date={desde.format(start_year)}:{hasta.format(end_year)}&format=json&per_page={per_page}&page={page}"
+    )
+
+
+def build_country_url(base_url, isos, per_page=PER_PAGE):
+    """
+    Construye la URL de la metadata de uno o varios países.
+    """
+    return f"{base_url}/{';'.join(isos)}?format=json&per_page={per_page}"
+
+
+def parse_periodo(texto):
+    """
+    Fecha de inicio de un período de la API: '2020' -> 2020-01-01, '2020Q3' -> 2020-07-01,
+    '2020M07' -> 2020-07-01.
+    """
+    anio, marca, resto = texto[:4], texto[4:5].upper(), texto[5:]
+    if not marca:
+        return date(int(anio), 1, 1)
+    if marca == 'Q':
+        return date(int(anio), (int(resto) - 1) * 3 + 1, 1)
+    if marca == 'M':
+        return date(int(anio), int(resto), 1)
+    raise ValueError(f'Período desconocido: {texto!r}')
+
+
+def parse_page(payload):
+    """
+    Separa una respuesta de la API en (metadata, filas).
+    La API responde `[metadata, filas]`, o `[{'message': [...]}]` si hubo un error.
+    """
+    if not isinstance(payload, list) or not payload:
+        raise WorldBankAPIError(f'Respuesta inesperada de la API: {payload!r}')
+    meta = payload[0] or {}
+    if 'message' in meta:
+        mensajes = '; '.join(m.get('value', '') for m in meta['message'])
+        raise WorldBankAPIError(mensajes)
+    filas = payload[1] if len(payload) > 1 and payload[1] else []
+    return meta, filas
+
+
+def parse_observacion(fila):
+    """
+    Convierte una fila de la API en una Observacion.
+    """
+    iso = fila.get('countryiso3code') or (fila.get('country') or {}).get('id')
+    valor = fila.get('value')
+    fecha = parse_periodo(fila['date'])
+    return Observacion(iso=iso, anio=fecha.year, valor=float(valor) if valor is not None else None, fecha=fecha)
+
+
+def parse_pais(fila):
+    """
+    Convierte una fila del recurso de países en `(iso, MetadataPais)`.
+    """
+    def texto(valor):
+        # La API usa '' para los datos que no aplican (y deja espacios al final de algunos nombres)
+        return (valor or '').strip() or None
+
+    return fila['id'], MetadataPais(
+        region=texto((fila.get('region') or {}).get('value')),
+        grupo_ingresos=texto((fila.get('incomeLevel') or {}).get('value')),
+        capital=texto(fila.get('capitalCity')),
+    )
+
+
+def parse_lastupdated(meta):
+    """
+    Fecha 'lastupdated' (YYYY-MM-DD) de la metadata de una respuesta, o None.
+    """
+    try:
+        return date.fromisoformat(meta.get('lastupdated', ''))
+    except (TypeError, ValueError):
+        return None
+
+
+class WorldBankExtractor:
+    """
+    Cliente de extracción por rangos sobre un `FetchEngine` (sesión compartida,
+    concurrencia y reintentos). Si no se entrega un motor, crea uno propio.
+    """
+
+    def __init__(self, base_url=WORLD_BANK_API_BASE_URL, per_page=PER_PAGE, engine=None):
+        self.base_url = base_url.rstrip('/')
+        self.per_page = per_page
+        self.engine = engine or FetchEngine()
+        # Fecha 'lastupdated' informada por la API para cada clave de `fetch_many`
+        self.lastupdated = {}
+
+    @property
+    def request_count(self):
+        return self.engine.stats.requests
+
+    def get_json(self, url):
+        return self.engine.get_json(url)
+
+    def _get_page(self, pagina):
+        lote, wb_code, start_year, end_year, frecuencia, page = pagina
+        url = build_indicator_url(self.base_url, lote, wb_code, start_year, end_year, page, self.per_page, frecuencia)
+        return parse_page(self.get_json(url))
+
+    def fetch_indicator(self, isos, wb_code, start_year, end_year, frecuencia=ANUAL):
+        """
+        Devuelve todas las observaciones de `wb_code` para los países `isos` entre
+        `start_year` y `end_year` (ambos incluidos), recorriendo todas las páginas.
+        """
+        resultado, errores = self.fetch_many({None: (isos, wb_code, start_year, end_year, frecuencia)})
+        if None in errores:
+            raise errores[None]
+        return resultado[None]
+
+    def fetch_countries(self, isos):
+        """
+        Descarga la metadata de los países `isos`, en paralelo por lotes de países.
+        Devuelve `(metadata_por_iso, errores)`; los lotes fallidos solo quedan en `errores`.
+        """
+        lotes = [isos[i:i + MAX_PAISES_POR_LLAMADA] for i in range(0, len(isos), MAX_PAISES_POR_LLAMADA)]
+        metadata = {}
+        errores = []
+        for _, respuesta, error in self.engine.map(
+            lambda lote: parse_page(self.get_json(build_country_url(self.base_url, lote, self.per_page))), lotes
+        ):
+            if error is None:
+                try:
+                    metadata.update(parse_pais(fila) for fila in respuesta[1])
+                except (KeyError, TypeError, AttributeError) as e:
+                    error = e
+            if error is not None:
+                errores.append(error)
+        return metadata, errores
+
+    def fetch_many(self, tareas):
+        """
+        Descarga en paralelo varias series. `tareas` es un dict
+        `clave -> (isos, wb_code, start_year, end_year[, frecuencia])` (anual si se omite).
+
+        Primero se piden en paralelo las primeras páginas de todas las tareas y luego,
+        también en paralelo, las páginas restantes que indique la metadata.
+        Devuelve `(observaciones_por_clave, errores_por_clave)`; una tarea con alguna
+        página fallida queda solo en `errores`.
+        """
+        # Una "página" es (lote_de_países, wb_code, start_year, end_year, frecuencia, número_de_página)
+        primeras = [
+            (clave, (isos[i:i + MAX_PAISES_POR_LLAMADA], wb_code, start_year, end_year, (frecuencia or [ANUAL])[0], 1))
+            for clave, (isos, wb_code, start_year, end_year, *frecuencia) in tareas.items()
+            for i in range(0, len(isos), MAX_PAISES_POR_LLAMADA)
+        ]
+        resultado = {clave: [] for clave in tareas}
+        errores = {}
+        restantes = []
+        for fase in (primeras, restantes):
+            for (clave, pagina), respuesta, error in self.engine.map(lambda t: self._get_page(t[1]), fase):
+                if error is None:
+                    meta, filas = respuesta
+                    try:
+                        resultado[clave].extend(parse_observacion(fila) for fila in filas)
+                    except (KeyError, TypeError, ValueError) as e:
+                        error = e
+                    if fase is primeras:
+                        self.lastupdated[clave] = parse_lastupdated(meta)
+                        pages = int(meta.get('pages') or 1)
+                        restantes.extend((clave, pagina[:5] + (p,)) for p in range(2, pages + 1))
+                if error is not None:
+                    errores.setdefault(clave, error)
+
+        for clave in errores:
+            resultado.pop(clave, None)
+        return resultado, errores
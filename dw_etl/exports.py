@@ -0,0 +1,431 @@
+# dw_etl/exports.py
+"""
+Generación de exportaciones del DW en streaming.
+
+Las filas (año, país) se leen de la tabla materializada HechosPaisAnio con un iterador
+de queryset ordenado, sin pivotear en Python ni construir antes una estructura con
+todo el DW en memoria. La exportación columnar en formato largo lee HechosEconomicos.
+
+Las funciones `a*` son las versiones async de la exportación JSON para las vistas
+servidas por ASGI: leen con `aiterator()` y emiten los bloques como generadores async.
+"""
+import csv
+import json
+import tempfile
+from gzip import GzipFile
+
+from django.db.models import Avg, FloatField, Q
+from django.db.models.functions import Cast
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from django.utils.text import StreamingBuffer
+from openpyxl.utils import get_column_letter
+
+from .etl.pivot import COLUMNA_PIVOTE
+from .models import HechosEconomicos, HechosPaisAnio
+
+# Columna de HechosPaisAnio de cada indicador
+CLAVE_POR_INDICADOR = COLUMNA_PIVOTE
+
+EXCEL_HEADERS = ["Año", "País", "Código ISO", "Inflación (%)", "Crecimiento PIB (%)", "Tipo Cambio (USD/Local)", "IPC (Índice)"]
+
+ITERATOR_CHUNK_SIZE = 2000
+
+# Clave de cada indicador en la exportación JSON (se mantiene el formato histórico)
+CLAVE_JSON = {
+    'inflacion': 'inflacion',
+    'pib_crecimiento': 'crecimiento_pib',
+    'tipo_cambio': 'tipo_cambio_usd_local',
+    'ipc': 'ipc',
+}
+
+# Columnas de la exportación CSV (las claves de la exportación JSON)
+CSV_HEADERS = ['anio', 'pais', 'codigo_iso', *CLAVE_JSON.values()]
+
+# Filas (año, país) por bloque emitido en las respuestas en streaming
+JSON_ROWS_PER_CHUNK = 500
+
+# Las exportaciones pequeñas quedan en memoria; las grandes se vuelcan a disco
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+class ExportFilterError(ValueError):
+    """Parámetros de filtro inválidos en una exportación."""
+
+
+def _lista(params, nombre):
+    """
+    Valores de un parámetro que puede venir repetido (`?pais=CHL&pais=ARG`) o
+    separado por comas (`?pais=CHL,ARG`).
+    """
+    return [v.strip() for valor in params.getlist(nombre) for v in valor.split(',') if v.strip()]
+
+
+def _anio(params, nombre):
+    valor = params.get(nombre)
+    if not valor:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ExportFilterError(f'El parámetro {nombre} debe ser un año, no {valor!r}.')
+
+
+def filter_hechos(params, queryset=None):
+    """
+    Aplica los filtros de exportación de una QueryDict: `pais` (códigos ISO),
+    `indicador` (nombres), `desde` y `hasta` (años, incluidos).
+    """
+    queryset = HechosEconomicos.objects.all() if queryset is None else queryset
+    paises = _lista(params, 'pais')
+    if paises:
+        queryset = queryset.filter(id_pais__codigo_iso__in=[p.upper() for p in paises])
+    indicadores = _lista(params, 'indicador')
+    if indicadores:
+        queryset = queryset.filter(id_indicador__nombre_indicador__in=indicadores)
+    desde, hasta = _anio(params, 'desde'), _anio(params, 'hasta')
+    if desde is not None:
+        queryset = queryset.filter(anio__gte=desde)
+    if hasta is not None:
+        queryset = queryset.filter(anio__lte=hasta)
+    return queryset
+
+
+def _indicadores_pivote(params):
+    """
+    Indicadores del parámetro `indicador`. HechosPaisAnio solo tiene columnas para los
+    de COLUMNA_PIVOTE: cualquier otro es un ExportFilterError.
+    """
+    indicadores = _lista(params, 'indicador')
+    sin_columna = [i for i in indicadores if i not in CLAVE_POR_INDICADOR]
+    if sin_columna:
+        raise ExportFilterError(
+            f'Indicadores sin columna en la tabla pivoteada: {", ".join(sin_columna)} '
+            f'(disponibles: {", ".join(CLAVE_POR_INDICADOR)}).'
+        )
+    return indicadores
+
+
+def filter_pivot(params, queryset=None):
+    """
+    Aplica a HechosPaisAnio los filtros de exportación (`pais`, `indicador`, `desde`, `hasta`).
+    Devuelve `(queryset, claves)`, donde `claves` son las columnas de indicador pedidas;
+    con filtro de indicador solo quedan las filas que tienen alguno de esos valores. Un
+    indicador sin columna en HechosPaisAnio es un ExportFilterError.
+    """
+    queryset = HechosPaisAnio.objects.all() if queryset is None else queryset
+    paises = _lista(params, 'pais')
+    if paises:
+        queryset = queryset.filter(codigo_iso__in=[p.upper() for p in paises])
+    desde, hasta = _anio(params, 'desde'), _anio(params, 'hasta')
+    if desde is not None:
+        queryset = queryset.filter(anio__gte=desde)
+    if hasta is not None:
+        queryset = queryset.filter(anio__lte=hasta)
+    claves = list(CLAVE_POR_INDICADOR.values())
+    indicadores = _indicadores_pivote(params)
+    if indicadores:
+        claves = [CLAVE_POR_INDICADOR[i] for i in indicadores]
+        alguno = Q(pk__in=[])
+        for clave in claves:
+            alguno |= Q(**{f'{clave}__isnull': False})
+        queryset = queryset.filter(alguno)
+    return queryset, claves
+
+
+def _wide_queryset(queryset):
+    queryset = HechosPaisAnio.objects.all() if queryset is None else queryset
+    return queryset.order_by('anio', 'nombre_pais')
+
+
+def _wide_row(claves, anio, pais, iso, valores):
+    fila = dict.fromkeys(CLAVE_POR_INDICADOR.values())
+    fila.update(zip(claves, valores), anio=anio, nombre_pais=pais, iso=iso)
+    return fila
+
+
+def iter_wide_rows(queryset=None, claves=None, chunk_size=ITERATOR_CHUNK_SIZE):
+    """
+    Genera una fila por (año, país) con una clave por indicador (None si no hay dato),
+    leyendo HechosPaisAnio en orden de año y país. Las columnas fuera de `claves` salen en None.
+    """
+    claves = list(CLAVE_POR_INDICADOR.values()) if claves is None else claves
+    filas = _wide_queryset(queryset).values_list('anio', 'nombre_pais', 'codigo_iso', *claves)
+    for anio, pais, iso, *valores in filas.iterator(chunk_size=chunk_size):
+        yield _wide_row(claves, anio, pais, iso, valores)
+
+
+async def aiter_wide_rows(queryset=None, claves=None, chunk_size=ITERATOR_CHUNK_SIZE):
+    """
+    `iter_wide_rows` con `aiterator()`. Usa `values()`: `values_list().aiterator()`
+    ejecuta la consulta en el event loop (su iterable no es un generador).
+    """
+    claves = list(CLAVE_POR_INDICADOR.values()) if claves is None else claves
+    filas = _wide_queryset(queryset).values('anio', 'nombre_pais', 'codigo_iso', *claves)
+    async for fila in filas.aiterator(chunk_size=chunk_size):
+        yield _wide_row(claves, fila['anio'], fila['nombre_pais'], fila['codigo_iso'], [fila[clave] for clave in claves])
+
+
+def write_excel(destino, queryset=None, claves=None):
+    """
+    Escribe la exportación Excel en `destino` (ruta o archivo binario) usando un libro
+    en modo write-only: las filas se vuelcan a disco a medida que se agregan, por lo
+    que la memoria no crece con el tamaño del DW. Las columnas fuera de `claves` salen en 'N/D'.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Datos Económicos Históricos")
+
+    # Definir estilos
+    header_font = Font(bold=True, color="FFFFFF")
+    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+    border_style = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+    center_aligned_text = Alignment(horizontal="center", vertical="center")
+
+    # En modo write-only los anchos deben definirse antes de escribir filas
+    for col_num in range(1, len(EXCEL_HEADERS) + 1):
+        sheet.column_dimensions[get_column_letter(col_num)].width = 20
+
+    encabezados = []
+    for header_title in EXCEL_HEADERS:
+        cell = WriteOnlyCell(sheet, value=header_title)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = border_style
+        cell.alignment = center_aligned_text
+        encabezados.append(cell)
+    sheet.append(encabezados)
+
+    filas = 0
+    for data in iter_wide_rows(queryset, claves):
+        sheet.append([
+            data['anio'],
+            data['nombre_pais'],
+            data['iso'],
+            data['inflacion'] if data['inflacion'] is not None else 'N/D',
+            data['pib_crecimiento'] if data['pib_crecimiento'] is not None else 'N/D',
+            data['tipo_cambio'] if data['tipo_cambio'] is not None else 'N/D',
+            data['ipc'] if data['ipc'] is not None else 'N/D',
+        ])
+        filas += 1
+
+    workbook.save(destino)
+    return filas
+
+
+def _json_row(data):
+    fila = {'anio': data['anio'], 'pais': data['nombre_pais'], 'codigo_iso': data['iso']}
+    for clave, clave_json in CLAVE_JSON.items():
+        fila[clave_json] = float(data[clave]) if data[clave] is not None else None
+    return fila
+
+
+def iter_json_rows(queryset=None, claves=None):
+    """
+    Filas pivoteadas con el formato de la exportación JSON (valores como float).
+    """
+    for data in iter_wide_rows(queryset, claves):
+        yield _json_row(data)
+
+
+async def aiter_json_rows(queryset=None, claves=None):
+    async for data in aiter_wide_rows(queryset, claves):
+        yield _json_row(data)
+
+
+def _bloques(filas, tamano):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+async def _abloques(filas, tamano):
+    bloque = []
+    async for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= tamano:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def _json(fila):
+    return json.dumps(fila, ensure_ascii=False, separators=(',', ':'))
+
+
+def stream_json_array(filas, rows_per_chunk=JSON_ROWS_PER_CHUNK):
+    """
+    Emite un arreglo JSON compacto por bloques de filas: '[', filas separadas por ',' y ']'.
+    """
+    yield '['
+    separador = ''
+    for bloque in _bloques(filas, rows_per_chunk):
+        yield separador + ','.join(_json(fila) for fila in bloque)
+        separador = ','
+    yield ']'
+
+
+async def astream_json_array(filas, rows_per_chunk=JSON_ROWS_PER_CHUNK):
+    yield '['
+    separador = ''
+    async for bloque in _abloques(filas, rows_per_chunk):
+        yield separador + ','.join(_json(fila) for fila in bloque)
+        separador = ','
+    yield ']'
+
+
+def stream_ndjson(filas, rows_per_chunk=JSON_ROWS_PER_CHUNK):
+    """
+    Emite una fila JSON por línea (NDJSON), por bloques de filas.
+    """
+    for bloque in _bloques(filas, rows_per_chunk):
+        yield ''.join(_json(fila) + '\n' for fila in bloque)
+
+
+async def astream_ndjson(filas, rows_per_chunk=JSON_ROWS_PER_CHUNK):
+    async for bloque in _abloques(filas, rows_per_chunk):
+        yield ''.join(_json(fila) + '\n' for fila in bloque)
+
+
+def write_json(destino, queryset=None, claves=None, formato='json'):
+    """
+    Escribe la exportación JSON ('json', un arreglo, o 'ndjson') en `destino`, un
+    archivo de texto, con los mismos bloques que la respuesta en streaming.
+    """
+    filas = iter_json_rows(queryset, claves)
+    for bloque in stream_ndjson(filas) if formato == 'ndjson' else stream_json_array(filas):
+        destino.write(bloque)
+
+
+def write_csv(destino, queryset=None, claves=None):
+    """
+    Escribe la exportación CSV en `destino`, un archivo de texto abierto con
+    `newline=''`: las columnas de la exportación JSON, con los valores faltantes vacíos.
+    Devuelve la cantidad de filas escritas.
+    """
+    writer = csv.writer(destino)
+    writer.writerow(CSV_HEADERS)
+    filas = 0
+    for fila in iter_json_rows(queryset, claves):
+        writer.writerow(['' if valor is None else valor for valor in fila.values()])
+        filas += 1
+    return filas
+
+
+async def acompress_sequence(bloques):
+    """
+    `django.utils.text.compress_sequence` para un iterable async de bytes.
+    """
+    buf = StreamingBuffer()
+    with GzipFile(mode='wb', compresslevel=6, fileobj=buf, mtime=0) as zfile:
+        yield buf.read()
+        async for bloque in bloques:
+            zfile.write(bloque)
+            datos = buf.read()
+            if datos:
+                yield datos
+    yield buf.read()
+
+
+# --- Exportación columnar (Parquet / Arrow IPC) ---
+
+FORMATOS_COLUMNARES = ('parquet', 'arrow')
+LAYOUTS_COLUMNARES = ('wide', 'long')
+COLUMNAS_PARTICION = ('anio', 'codigo_iso')
+
+
+class ColumnarUnavailable(ImportError):
+    """pyarrow no está instalado."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ColumnarUnavailable('La exportación Parquet/Arrow requiere pyarrow (pip install pyarrow).') from e
+    return pyarrow
+
+
+def facts_dataframe(queryset=None, layout='wide', claves=None):
+    """
+    Hechos como DataFrame con columnas tipadas (año entero, valores float64 con NaN
+    donde no hay dato, textos como categorías).
+
+    - long: una fila por (año, país, indicador) con su valor, desde un queryset de
+      HechosEconomicos. Las series trimestrales y mensuales se promedian por año.
+    - wide: una fila por (año, país) y una columna numérica por indicador (solo las de
+      `claves`, si se indican), desde un queryset de HechosPaisAnio.
+    """
+    import pandas as pd
+
+    if layout == 'long':
+        queryset = HechosEconomicos.objects.all() if queryset is None else queryset
+        filas = queryset.order_by(
+            'anio', 'id_pais__nombre_pais', 'id_indicador__nombre_indicador'
+        ).values_list(
+            'anio', 'id_pais__nombre_pais', 'id_pais__codigo_iso', 'id_indicador__nombre_indicador',
+        ).annotate(valor_anual=Avg(Cast('valor', FloatField())))
+        columnas = ['anio', 'pais', 'codigo_iso', 'indicador', 'valor']
+        categorias = ['pais', 'codigo_iso', 'indicador']
+    else:
+        queryset = HechosPaisAnio.objects.all() if queryset is None else queryset
+        claves = list(CLAVE_JSON) if claves is None else claves
+        filas = queryset.order_by('anio', 'nombre_pais').values_list(
+            'anio', 'nombre_pais', 'codigo_iso',
+            *(Cast(clave, FloatField()) for clave in claves),
+        )
+        columnas = ['anio', 'pais', 'codigo_iso', *(CLAVE_JSON[clave] for clave in claves)]
+        categorias = ['pais', 'codigo_iso']
+
+    df = pd.DataFrame.from_records(filas.iterator(chunk_size=ITERATOR_CHUNK_SIZE), columns=columnas)
+    tipos = {columna: 'float64' for columna in columnas if columna not in categorias}
+    tipos.update({columna: 'category' for columna in categorias}, anio='int32')
+    return df.astype(tipos)
+
+
+def write_columnar(destino, formato='parquet', layout='wide', queryset=None, partition_by=None, claves=None):
+    """
+    Escribe los hechos en Parquet o Arrow IPC (en el formato ancho, solo las columnas de
+    indicador de `claves`, si se indican). Con `partition_by` ('anio' o 'codigo_iso')
+    `destino` es un directorio y se escribe un dataset particionado estilo Hive
+    (`anio=2020/...`). Devuelve la cantidad de filas escritas.
+    """
+    pa = _pyarrow()
+    if formato not in FORMATOS_COLUMNARES:
+        raise ValueError(f'Formato no soportado: {formato}')
+    if partition_by is not None and partition_by not in COLUMNAS_PARTICION:
+        raise ValueError(f'Columna de partición no soportada: {partition_by}')
+
+    tabla = pa.Table.from_pandas(facts_dataframe(queryset, layout, claves), preserve_index=False)
+    if partition_by is not None:
+        pa.dataset.write_dataset(
+            tabla, str(destino),
+            format='parquet' if formato == 'parquet' else 'ipc',
+            partitioning=[partition_by], partitioning_flavor='hive',
+            existing_data_behavior='delete_matching',
+        )
+    elif formato == 'parquet':
+        pa.parquet.write_table(tabla, destino, compression='zstd')
+    else:
+        with pa.ipc.new_file(destino, tabla.schema) as writer:
+            writer.write_table(tabla)
+    return tabla.num_rows
+
+
+def build_columnar_file(formato='parquet', layout='wide', queryset=None, claves=None):
+    """
+    Genera la exportación columnar en un archivo temporal listo para un `FileResponse`.
+    """
+    archivo = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE, suffix=f'.{formato}')
+    write_columnar(archivo, formato, layout, queryset, claves=claves)
+    archivo.seek(0)
+    return archivo
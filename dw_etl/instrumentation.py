@@ -0,0 +1,280 @@
+# dw_etl/instrumentation.py
+"""
+Instrumentación de las vistas: consultas SQL, tiempo en la base de datos, tiempo de
+serialización, tamaño y duración de cada solicitud.
+
+- `instrument()` mide un bloque cualquiera (una vista, un comando, un test).
+- `serialization()` marca el tramo en que una vista arma el cuerpo de la respuesta
+  (JSON, HTML renderizado).
+- `InstrumentationMiddleware` mide cada solicitud: agrega las cabeceras `X-DB-Queries`,
+  `X-Response-Bytes` y `Server-Timing`, escribe una línea de log JSON (logger
+  `dw_etl.instrumentation`) y acumula los totales por vista que publica `/metrics/`.
+
+En las respuestas en streaming las cabeceras solo cubren la vista; la medición sigue
+mientras se envía el contenido (las consultas por bloques y la serialización ocurren
+ahí) y el log y las métricas se registran al terminar el envío.
+
+El tiempo en la base de datos es el de ejecutar cada consulta (no incluye las lecturas
+posteriores de un cursor por bloques).
+
+Las consultas se cuentan con un `execute_wrapper` instalado en cada conexión, que suma
+en las mediciones activas del contexto (una ContextVar). Así también se cuentan las
+consultas de las vistas async, que el ORM ejecuta en otros hilos con `sync_to_async`
+(que copia el contexto). El middleware funciona en modo síncrono (WSGI) y async (ASGI).
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Mediciones activas (pueden anidarse: el middleware y un test, por ejemplo)
+_activas = ContextVar('dw_etl_mediciones', default=())
+
+
+class RequestMetrics:
+    """
+    Totales de un bloque medido. Los tiempos están en segundos.
+    """
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_bd = 0.0
+        self.tiempo_serializacion = 0.0
+        self.bytes = 0
+        self.inicio = time.perf_counter()
+        self.duracion = 0.0
+
+    def as_dict(self):
+        return {
+            'consultas': self.consultas,
+            'tiempo_bd_ms': round(self.tiempo_bd * 1000, 2),
+            'tiempo_serializacion_ms': round(self.tiempo_serializacion * 1000, 2),
+            'bytes': self.bytes,
+            'duracion_ms': round(self.duracion * 1000, 2),
+        }
+
+
+def _contar(execute, sql, params, many, context):
+    activas = _activas.get()
+    if not activas:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        for metricas in activas:
+            metricas.consultas += 1
+            metricas.tiempo_bd += duracion
+
+
+def _instalar(conexion):
+    if _contar not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(_contar)
+
+
+connection_created.connect(
+    lambda sender, connection, **kwargs: _instalar(connection), weak=False, dispatch_uid='dw_etl_instrumentation',
+)
+
+
+@contextmanager
+def instrument(metricas=None):
+    """
+    Mide las consultas y el tiempo en la base de datos del bloque. Devuelve el
+    RequestMetrics (nuevo, o el recibido para seguir acumulando en él).
+    """
+    metricas = metricas or RequestMetrics()
+    # La conexión del hilo actual puede ser anterior a la señal connection_created
+    _instalar(connection)
+    anteriores = _activas.get()
+    _activas.set(anteriores + (metricas,))
+    inicio = time.perf_counter()
+    try:
+        yield metricas
+    finally:
+        metricas.duracion += time.perf_counter() - inicio
+        _activas.set(anteriores)
+
+
+@contextmanager
+def serialization():
+    """
+    Suma la duración del bloque al tiempo de serialización de las mediciones activas.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        for metricas in _activas.get():
+            metricas.tiempo_serializacion += duracion
+
+
+def query_budget(vista):
+    """
+    Máximo de consultas configurado para una vista (VIEW_QUERY_BUDGETS), o None.
+    """
+    return getattr(settings, 'VIEW_QUERY_BUDGETS', {}).get(vista)
+
+
+class MetricsRegistry:
+    """
+    Totales por vista desde que arrancó el proceso (cada proceso del servidor tiene los suyos).
+    """
+    CAMPOS = ('solicitudes', 'errores', 'sobre_presupuesto', 'consultas', 'tiempo_bd', 'tiempo_serializacion', 'bytes', 'duracion')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = {}
+
+    def record(self, vista, metricas, status, sobre_presupuesto=False):
+        with self._lock:
+            totales = self._vistas.setdefault(vista, dict.fromkeys(self.CAMPOS, 0) | {'consultas_max': 0, 'duracion_max': 0.0})
+            totales['solicitudes'] += 1
+            totales['errores'] += status >= 500
+            totales['sobre_presupuesto'] += sobre_presupuesto
+            totales['consultas'] += metricas.consultas
+            totales['tiempo_bd'] += metricas.tiempo_bd
+            totales['tiempo_serializacion'] += metricas.tiempo_serializacion
+            totales['bytes'] += metricas.bytes
+            totales['duracion'] += metricas.duracion
+            totales['consultas_max'] = max(totales['consultas_max'], metricas.consultas)
+            totales['duracion_max'] = max(totales['duracion_max'], metricas.duracion)
+
+    def snapshot(self):
+        with self._lock:
+            return {vista: dict(totales) for vista, totales in self._vistas.items()}
+
+    def reset(self):
+        with self._lock:
+            self._vistas.clear()
+
+
+registry = MetricsRegistry()
+
+# Métricas publicadas en /metrics/ (formato de texto de Prometheus): campo -> (nombre, tipo, ayuda)
+METRICAS_PROMETHEUS = {
+    'solicitudes': ('dw_http_requests_total', 'counter', 'Solicitudes atendidas.'),
+    'errores': ('dw_http_errors_total', 'counter', 'Respuestas con estado 5xx.'),
+    'sobre_presupuesto': ('dw_http_over_query_budget_total', 'counter', 'Solicitudes sobre el presupuesto de consultas.'),
+    'consultas': ('dw_db_queries_total', 'counter', 'Consultas SQL ejecutadas.'),
+    'consultas_max': ('dw_db_queries_max', 'gauge', 'Máximo de consultas SQL de una solicitud.'),
+    'tiempo_bd': ('dw_db_seconds_total', 'counter', 'Segundos ejecutando consultas SQL.'),
+    'tiempo_serializacion': ('dw_serialization_seconds_total', 'counter', 'Segundos armando el cuerpo de las respuestas.'),
+    'bytes': ('dw_http_response_bytes_total', 'counter', 'Bytes enviados en el cuerpo de las respuestas.'),
+    'duracion': ('dw_http_request_seconds_total', 'counter', 'Segundos atendiendo solicitudes.'),
+    'duracion_max': ('dw_http_request_seconds_max', 'gauge', 'Duración máxima de una solicitud.'),
+}
+
+
+def prometheus_text(totales):
+    """
+    Totales de `MetricsRegistry.snapshot()` en el formato de texto de Prometheus.
+    """
+    lineas = []
+    for campo, (nombre, tipo, ayuda) in METRICAS_PROMETHEUS.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+        for vista, valores in sorted(totales.items()):
+            lineas.append(f'{nombre}{{view="{vista}"}} {valores[campo]:g}')
+    return '\n'.join(lineas) + '\n'
+
+
+class InstrumentationMiddleware:
+    """
+    Mide cada solicitud (ver el docstring del módulo). Va primero en MIDDLEWARE para
+    que la medición cubra al resto de los middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with instrument() as metricas:
+            response = self.get_response(request)
+        return self._process(request, response, metricas)
+
+    async def __acall__(self, request):
+        with instrument() as metricas:
+            response = await self.get_response(request)
+        return self._process(request, response, metricas)
+
+    def _process(self, request, response, metricas):
+        vista = request.resolver_match.view_name if request.resolver_match else 'sin_ruta'
+
+        response['X-DB-Queries'] = metricas.consultas
+        response['Server-Timing'] = (
+            f'db;dur={metricas.tiempo_bd * 1000:.1f}, '
+            f'ser;dur={metricas.tiempo_serializacion * 1000:.1f}, '
+            f'total;dur={metricas.duracion * 1000:.1f}'
+        )
+        presupuesto = query_budget(vista)
+        if presupuesto is not None:
+            response['X-Query-Budget'] = presupuesto
+
+        if response.streaming:
+            stream = self._astream if response.is_async else self._stream
+            response.streaming_content = stream(response.streaming_content, metricas, vista, request, response.status_code)
+        else:
+            metricas.bytes = len(response.content)
+            response['X-Response-Bytes'] = metricas.bytes
+            self._finish(metricas, vista, request, response.status_code)
+        return response
+
+    def _stream(self, contenido, metricas, vista, request, status):
+        """
+        Reenvía el contenido midiendo bytes, consultas y tiempo. Lo que no es tiempo de
+        base de datos durante el envío se cuenta como serialización.
+        """
+        tiempo_bd = metricas.tiempo_bd
+        inicio = time.perf_counter()
+        try:
+            with instrument(metricas):
+                for bloque in contenido:
+                    metricas.bytes += len(bloque)
+                    yield bloque
+        finally:
+            metricas.tiempo_serializacion += time.perf_counter() - inicio - (metricas.tiempo_bd - tiempo_bd)
+            self._finish(metricas, vista, request, status)
+
+    async def _astream(self, contenido, metricas, vista, request, status):
+        """
+        `_stream` para el contenido async. El tiempo de envío incluye las esperas al
+        cliente, en las que el event loop atiende otras solicitudes.
+        """
+        tiempo_bd = metricas.tiempo_bd
+        inicio = time.perf_counter()
+        try:
+            with instrument(metricas):
+                async for bloque in contenido:
+                    metricas.bytes += len(bloque)
+                    yield bloque
+        finally:
+            metricas.tiempo_serializacion += time.perf_counter() - inicio - (metricas.tiempo_bd - tiempo_bd)
+            self._finish(metricas, vista, request, status)
+
+    def _finish(self, metricas, vista, request, status):
+        presupuesto = query_budget(vista)
+        sobre_presupuesto = presupuesto is not None and metricas.consultas > presupuesto
+        registry.record(vista, metricas, status, sobre_presupuesto)
+        registro = {'vista': vista, 'metodo': request.method, 'ruta': request.path, 'estado': status, **metricas.as_dict()}
+        if sobre_presupuesto:
+            registro['presupuesto_consultas'] = presupuesto
+            logger.warning(json.dumps(registro, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(registro, ensure_ascii=False))
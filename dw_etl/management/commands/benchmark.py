@@ -0,0 +1,273 @@
+# dw_etl/management/commands/benchmark.py
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+
+from dw_etl.bench.baseline import DEFAULT_TOLERANCE, compare, load_baseline, save_baseline
+from dw_etl.bench.concurrency import run_concurrent
+from dw_etl.bench.db import isolated_database
+from dw_etl.bench.metrics import measure, rows_per_second
+from dw_etl.bench.synthetic import codigo_iso_sintetico, generate_warehouse, nombres_indicadores
+from dw_etl.crisis import run_detection
+from dw_etl.etl.config import global_max_year
+from dw_etl.etl.fake_api import FakeWorldBankAPI
+from dw_etl.exports import write_columnar
+from dw_etl.models import DimIndicadorEconomico, DimPais, HechosEconomicos, HechosPaisAnio
+from dw_etl.views import dashboard_view, export_economic_data_excel, export_economic_data_json
+
+TARGETS = ['etl', 'dashboard', 'excel', 'json', 'parquet', 'consultas', 'crisis', 'concurrencia', 'artefactos']
+
+# Caché en memoria durante los benchmarks: no se toca la caché en disco del dashboard
+CACHE_BENCHMARK = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide tiempo, consultas, memoria (RSS) y filas/s del ETL, el dashboard y las exportaciones sobre '
+        'datos sintéticos, en una base de datos aislada, y compara contra una línea base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', default=['excel'], choices=TARGETS, help='Qué medir.')
+        parser.add_argument(
+            '--paises', type=int, nargs='+', default=[25, 50, 100, 200],
+            help='Cantidades de países a generar (una medición por cantidad).'
+        )
+        parser.add_argument('--anios', type=int, default=60, help='Años por país.')
+        parser.add_argument('--indicadores', type=int, default=4, help='Indicadores por país (los 4 reales y luego sintéticos).')
+        parser.add_argument('--clientes', type=int, default=50, help='Clientes simultáneos del objetivo concurrencia.')
+        parser.add_argument(
+            '--demora', type=float, default=0.1,
+            help='Segundos que cada cliente del objetivo concurrencia tarda en recibir cada bloque (cliente lento).'
+        )
+        parser.add_argument('--url', default='/export/json/', help='URL que descargan los clientes del objetivo concurrencia.')
+        parser.add_argument(
+            '--save-baseline', nargs='?', const=settings.BENCHMARK_BASELINE_PATH, metavar='ARCHIVO',
+            help='Guarda los resultados como línea base (por defecto, BENCHMARK_BASELINE_PATH).'
+        )
+        parser.add_argument(
+            '--compare', nargs='?', const=settings.BENCHMARK_BASELINE_PATH, metavar='ARCHIVO',
+            help='Compara contra la línea base y termina con error si hay regresiones.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+            help='Aumento relativo de tiempo y memoria tolerado al comparar (0.25 = 25%%).'
+        )
+
+    def handle(self, *args, **options):
+        base = None
+        if options['compare']:
+            if not Path(options['compare']).is_file():
+                raise CommandError(
+                    f'No existe la línea base {options["compare"]}: generarla primero con --save-baseline '
+                    '(en la misma máquina, con los mismos objetivos y volúmenes).'
+                )
+            try:
+                base = load_baseline(options['compare'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f'No se pudo leer la línea base {options["compare"]}: {e}')
+
+        resultados = {}
+        # Las exportaciones pre-generadas (y la versión de los datos) van a un directorio temporal
+        # y no se encargan en segundo plano, para medir siempre la generación en la solicitud
+        # (salvo en el objetivo artefactos)
+        with tempfile.TemporaryDirectory() as artefactos, override_settings(
+            CACHES=CACHE_BENCHMARK, EXPORT_ARTIFACTS_DIR=artefactos, EXPORT_WORKERS=0,
+            DATA_VERSION_PATH=Path(artefactos) / 'version_datos',
+        ), isolated_database():
+            for target in options['targets']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'Benchmark: {target}'))
+                self.stdout.write(
+                    f'{"hechos":>10} {"filas":>10} {"tiempo (s)":>12} {"consultas":>10} {"filas/s":>12} {"pico RSS (MB)":>15}'
+                )
+                for paises in options['paises']:
+                    if target == 'etl':
+                        # El ETL parte de un DW vacío y lo llena desde la API simulada
+                        DimPais.objects.all().delete()
+                        medicion = self.bench_etl(paises, options['anios'], options['indicadores'])
+                        hechos = HechosEconomicos.objects.count()
+                    else:
+                        hechos = generate_warehouse(paises=paises, anios=options['anios'], indicadores=options['indicadores'])
+                        medicion = getattr(self, f'bench_{target}')(**options) if target == 'concurrencia' else getattr(self, f'bench_{target}')()
+                    resultados.setdefault(target, {})[paises] = medicion
+                    self.stdout.write(
+                        f'{hechos:>10} {medicion.filas:>10} {medicion.segundos:>12.2f} {medicion.consultas:>10} '
+                        f'{rows_per_second(medicion):>12,.0f} {medicion.rss_pico / 2**20:>15.2f}'
+                    )
+                    for linea in getattr(self, 'detalle', []):
+                        self.stdout.write(self.style.HTTP_INFO(linea))
+                    self.detalle = []
+                # Planes de ejecución con el volumen más grande medido
+                for nombre, plan in getattr(self, 'planes', []):
+                    self.stdout.write(self.style.HTTP_INFO(nombre))
+                    self.stdout.write(plan)
+                self.planes = []
+
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], resultados)
+            self.stdout.write(self.style.SUCCESS(f'Línea base guardada en {options["save_baseline"]}.'))
+        if base is not None:
+            sin_base = [
+                f'{objetivo} ({paises} países)'
+                for objetivo, por_paises in resultados.items() for paises in por_paises
+                if str(paises) not in base.get(objetivo, {})
+            ]
+            if sin_base:
+                self.stdout.write(self.style.WARNING(f'Sin medición en la línea base: {", ".join(sin_base)}.'))
+            if len(sin_base) == sum(len(por_paises) for por_paises in resultados.values()):
+                raise CommandError(f'La línea base {options["compare"]} no tiene ninguna de estas mediciones.')
+            regresiones = compare(resultados, base, options['tolerance'])
+            if regresiones:
+                for regresion in regresiones:
+                    self.stdout.write(self.style.ERROR(regresion))
+                raise CommandError(f'{len(regresiones)} regresiones respecto de la línea base.')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones respecto de la línea base.'))
+
+    def bench_etl(self, paises, anios, indicadores):
+        """
+        populate_dw contra la API simulada, con un catálogo sintético (sin las exportaciones
+        pre-generadas, que mide el objetivo artefactos).
+        """
+        end_year = global_max_year()
+        start_year = end_year - anios + 1
+        catalogo = {
+            'paises': [
+                {'name': f'País {i:04d}', 'iso': codigo_iso_sintetico(i), 'historical_years': anios} for i in range(paises)
+            ],
+            'indicadores': {
+                nombre: {'wb_code': f'SYN.{i}', 'unidad': '%'} for i, nombre in enumerate(nombres_indicadores(indicadores))
+            },
+        }
+        with tempfile.TemporaryDirectory() as tmp, FakeWorldBankAPI(min_year=start_year, max_year=end_year) as api:
+            ruta = Path(tmp) / 'catalogo.json'
+            ruta.write_text(json.dumps(catalogo), encoding='utf-8')
+
+            def cargar():
+                call_command(
+                    'populate_dw', api_url=api.base_url, catalog=str(ruta), retries=0, skip_exports=True, stdout=StringIO(),
+                )
+                return HechosEconomicos.objects.count()
+            return measure(cargar)
+
+    def bench_dashboard(self):
+        """
+        dashboard_view sin caché (la primera visita después de una carga).
+        """
+        cache.clear()
+        request = RequestFactory().get('/dashboard/')
+        paises = DimPais.objects.count()
+        return measure(lambda: dashboard_view(request) and paises)
+
+    def bench_excel(self):
+        # Las vistas de exportación son async; con una solicitud WSGI usan el camino síncrono
+        request = RequestFactory().get('/export/excel/')
+        filas = HechosPaisAnio.objects.count()
+
+        def exportar():
+            response = async_to_sync(export_economic_data_excel)(request)
+            for _ in response.streaming_content:
+                pass
+            response.close()
+            return filas
+        return measure(exportar)
+
+    def bench_json(self):
+        request = RequestFactory().get('/export/json/')
+        filas = HechosPaisAnio.objects.count()
+
+        def exportar():
+            for _ in async_to_sync(export_economic_data_json)(request).streaming_content:
+                pass
+            return filas
+        return measure(exportar)
+
+    def bench_artefactos(self):
+        """
+        Descarga del Excel pre-generado (como después de populate_dw), comparada con la
+        primera solicitud, que lo genera.
+        """
+        request = RequestFactory().get('/export/excel/')
+        filas = HechosPaisAnio.objects.count()
+
+        def descargar():
+            response = async_to_sync(export_economic_data_excel)(request)
+            for _ in response.streaming_content:
+                pass
+            response.close()
+            return filas
+
+        generacion = measure(descargar)
+        medicion = measure(descargar)
+        self.detalle = [
+            f'Generado en la solicitud: {generacion.segundos * 1000:.1f} ms ({generacion.consultas} consultas); '
+            f'pre-generado: {medicion.segundos * 1000:.1f} ms ({medicion.consultas} consultas).'
+        ]
+        return medicion
+
+    def bench_parquet(self):
+        with tempfile.TemporaryFile() as destino:
+            return measure(lambda: write_columnar(destino, 'parquet', 'wide'))
+
+    def bench_consultas(self):
+        """
+        Ejecuta las consultas de acceso típicas sobre HechosEconomicos y guarda su plan
+        de ejecución (EXPLAIN) para mostrarlo al final.
+        """
+        pais = DimPais.objects.order_by('id').first()
+        indicador = DimIndicadorEconomico.objects.order_by('id').first()
+        ultimo_anio = HechosEconomicos.objects.order_by('-anio').values_list('anio', flat=True).first()
+        consultas = {
+            'Serie país × indicador ordenada por año': HechosEconomicos.objects.filter(
+                id_pais=pais, id_indicador=indicador
+            ).order_by('anio'),
+            'Hechos de un año': HechosEconomicos.objects.filter(anio=ultimo_anio),
+            'Exportación larga por rango de años': HechosEconomicos.objects.filter(
+                anio__gte=ultimo_anio - 4, anio__lte=ultimo_anio
+            ).order_by('anio', 'id_pais__nombre_pais', 'id_indicador__nombre_indicador'),
+            'Refresco de HechosPaisAnio (un país, años modificados)': HechosEconomicos.objects.filter(
+                id_pais=pais, anio__in=range(ultimo_anio - 4, ultimo_anio + 1)
+            ),
+        }
+
+        def ejecutar():
+            return sum(len(list(queryset.values_list('id', flat=True).iterator())) for queryset in consultas.values())
+
+        resultado = measure(ejecutar)
+        self.planes = [(nombre, queryset.explain()) for nombre, queryset in consultas.items()]
+        return resultado
+
+    def bench_crisis(self):
+        """
+        Detección de episodios de devaluación con recesión sobre todos los países y años.
+        """
+        return measure(lambda: run_detection()[0])
+
+    def bench_concurrencia(self, clientes, demora, url, **options):
+        """
+        `clientes` descargas simultáneas de `url` por la aplicación ASGI, con clientes lentos.
+        """
+        ruta, _, query = url.partition('?')
+        filas = HechosPaisAnio.objects.count()
+        resultado = None
+
+        def descargar():
+            nonlocal resultado
+            resultado = run_concurrent(ruta, clientes, query, demora)
+            return filas * clientes
+
+        medicion = measure(descargar)
+        en_serie = resultado.segundos_un_cliente * clientes
+        self.detalle = [
+            f'{clientes} clientes en {resultado.segundos:.2f} s; uno solo tarda {resultado.segundos_un_cliente:.2f} s '
+            f'(en serie serían {en_serie:.2f} s: {en_serie / resultado.segundos:.1f}x). '
+            f'{resultado.bytes / 2**20:.1f} MB enviados, {resultado.errores} errores, hasta {resultado.hilos_max} hilos.'
+        ]
+        return medicion
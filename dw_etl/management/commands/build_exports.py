@@ -0,0 +1,52 @@
+# dw_etl/management/commands/build_exports.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from dw_etl.artifacts import FORMATOS_ARTEFACTO, artifact_filters, prebuild_artifacts
+from dw_etl.exports import ExportFilterError
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera las exportaciones pre-generadas de la versión actual de los datos (por defecto, las de '
+        'EXPORT_PREBUILD) y borra las de versiones anteriores.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', action='append', choices=list(FORMATOS_ARTEFACTO),
+            help='Formato a generar (repetible). Con --format o filtros se generan esos formatos con esos filtros.'
+        )
+        parser.add_argument('--pais', action='append', default=[], help='Código ISO (repetible o separado por comas).')
+        parser.add_argument('--indicador', action='append', default=[], help='Nombre de indicador (repetible).')
+        parser.add_argument('--desde', help='Primer año incluido.')
+        parser.add_argument('--hasta', help='Último año incluido.')
+        parser.add_argument('--workers', type=int, default=1, help='Exportaciones que se generan en paralelo (hilos).')
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        params.setlist('pais', options['pais'])
+        params.setlist('indicador', options['indicador'])
+        for nombre in ('desde', 'hasta'):
+            if options[nombre]:
+                params[nombre] = options[nombre]
+        try:
+            filtros = artifact_filters(params)
+        except ExportFilterError as e:
+            raise CommandError(str(e))
+
+        pedidos = None
+        if options['format'] or filtros:
+            pedidos = [(formato, filtros) for formato in options['format'] or FORMATOS_ARTEFACTO]
+
+        inicio = time.perf_counter()
+        rutas = prebuild_artifacts(pedidos, workers=options['workers'])
+        segundos = time.perf_counter() - inicio
+        for ruta in rutas:
+            self.stdout.write(f'{ruta.name}: {ruta.stat().st_size / 2**20:.2f} MB')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(rutas)} exportaciones en {settings.EXPORT_ARTIFACTS_DIR} ({segundos:.2f} s).'
+        ))
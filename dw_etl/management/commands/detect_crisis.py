@@ -0,0 +1,32 @@
+# dw_etl/management/commands/detect_crisis.py
+from django.core.management.base import BaseCommand
+
+from dw_etl.crisis import Umbrales, default_thresholds, run_detection
+from dw_etl.versioning import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Detecta los episodios en que una fuerte devaluación coincide con una recesión, para todos los países, y los guarda en EpisodioCrisis.'
+
+    def add_arguments(self, parser):
+        umbrales = default_thresholds()
+        parser.add_argument(
+            '--umbral-devaluacion', type=float, default=umbrales.umbral_devaluacion,
+            help='Alza interanual mínima del tipo de cambio (%%) para considerar una devaluación fuerte.'
+        )
+        parser.add_argument(
+            '--anios-recesion', type=int, default=umbrales.anios_recesion,
+            help='Años seguidos de crecimiento negativo del PIB que definen una recesión.'
+        )
+        parser.add_argument(
+            '--margen-anios', type=int, default=umbrales.margen_anios,
+            help='Años antes del inicio de la recesión en que una devaluación todavía cuenta.'
+        )
+
+    def handle(self, *args, **options):
+        umbrales = Umbrales(options['umbral_devaluacion'], options['anios_recesion'], options['margen_anios'])
+        episodios, segundos, cambio = run_detection(umbrales)
+        if cambio:
+            # Invalidar lo cacheado con los episodios anteriores (dashboard, API, exportaciones)
+            bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'{episodios} episodios de devaluación con recesión detectados en {segundos:.3f} s.'))
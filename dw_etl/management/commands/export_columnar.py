@@ -0,0 +1,45 @@
+# dw_etl/management/commands/export_columnar.py
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from dw_etl.exports import (
+    COLUMNAS_PARTICION, FORMATOS_COLUMNARES, LAYOUTS_COLUMNARES, ColumnarUnavailable, ExportFilterError, filter_hechos,
+    filter_pivot, write_columnar,
+)
+
+
+class Command(BaseCommand):
+    help = 'Exporta los hechos económicos a Parquet o Arrow IPC (opcionalmente particionados por año o país) para herramientas de BI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Archivo de salida, o directorio si se usa --partition-by.')
+        parser.add_argument('--format', choices=FORMATOS_COLUMNARES, default='parquet')
+        parser.add_argument('--layout', choices=LAYOUTS_COLUMNARES, default='wide', help='wide: una columna por indicador; long: una fila por hecho.')
+        parser.add_argument('--partition-by', choices=COLUMNAS_PARTICION, help='Escribe un dataset particionado por esta columna.')
+        parser.add_argument('--pais', action='append', default=[], help='Código ISO (repetible o separado por comas).')
+        parser.add_argument('--indicador', action='append', default=[], help='Nombre de indicador (repetible).')
+        parser.add_argument('--desde', help='Primer año incluido.')
+        parser.add_argument('--hasta', help='Último año incluido.')
+
+    def handle(self, *args, **options):
+        filtros = QueryDict(mutable=True)
+        filtros.setlist('pais', options['pais'])
+        filtros.setlist('indicador', options['indicador'])
+        for nombre in ('desde', 'hasta'):
+            if options[nombre]:
+                filtros[nombre] = options[nombre]
+
+        try:
+            # El formato largo sale de los hechos; el ancho, de la tabla pivoteada
+            claves = None
+            if options['layout'] == 'long':
+                queryset = filter_hechos(filtros)
+            else:
+                queryset, claves = filter_pivot(filtros)
+            filas = write_columnar(
+                options['output'], options['format'], options['layout'],
+                queryset=queryset, partition_by=options['partition_by'], claves=claves,
+            )
+        except (ColumnarUnavailable, ExportFilterError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f'{filas} filas exportadas a {options["output"]} ({options["format"]}, {options["layout"]}).'))
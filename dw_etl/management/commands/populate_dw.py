@@ -1,91 +1,178 @@
 # dw_etl/management/commands/populate_dw.py
-import requests
-from datetime import datetime, date
+import cProfile
+import json
+import pstats
+from contextlib import nullcontext
+from datetime import date
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
 
-from dw_etl.models import DimFecha, DimPais, DimIndicadorEconomico, DimFuenteDatos, HechosEconomicos
+from dw_etl.artifacts import prebuild_artifacts
+from dw_etl.crisis import run_detection
+from dw_etl.models import DimFuenteDatos
+from dw_etl.etl.cache import ResponseCache
+from dw_etl.etl.fetch import FetchEngine
+from dw_etl.etl.calendario import GRANOS, ensure_calendar
+from dw_etl.etl.config import (
+    DEFAULT_HISTORICAL_YEARS, GLOBAL_MIN_YEAR_API, CatalogError, global_max_year, load_catalog, parse_years, start_year,
+)
+from dw_etl.etl.loader import BATCH_SIZE, FactLoader
+from dw_etl.etl.pipeline import DEFAULT_WORKERS, EtlPipeline, plan_lotes
+from dw_etl.etl.pivot import COLUMNA_PIVOTE, refresh_pivot
+from dw_etl.etl.rollups import refresh_rollups
+from dw_etl.etl.telemetry import RunTelemetry, run_summary
+from dw_etl.etl.watermarks import REVISION_YEARS, WatermarkStore
+from dw_etl.etl.worldbank import MAX_PAISES_POR_LLAMADA, WORLD_BANK_API_BASE_URL, WorldBankExtractor
+from dw_etl.versioning import bump_data_version, data_version
+
+# Opciones comunes de los comandos de Django que no se guardan en EtlRun.parametros
+OPCIONES_BASE = {'verbosity', 'settings', 'pythonpath', 'traceback', 'no_color', 'force_color', 'skip_checks'}
+
+# Opciones numéricas que deben ser al menos 1
+OPCIONES_POSITIVAS = ('concurrency', 'max_per_host', 'batch_size', 'workers', 'countries_per_call')
+
+# Funciones que se muestran del perfil de --profile
+LINEAS_PERFIL = 25
 
 class Command(BaseCommand):
     help = 'Extrae datos económicos históricos de World Bank API según las especificaciones de país.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--api-url', default=WORLD_BANK_API_BASE_URL,
+            help='URL base de la API del Banco Mundial (por ejemplo, un servidor local para pruebas).'
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='Solicitudes HTTP en paralelo (hilos).')
+        parser.add_argument('--max-per-host', type=int, default=4, help='Máximo de solicitudes simultáneas por host.')
+        parser.add_argument('--retries', type=int, default=4, help='Reintentos por solicitud ante errores transitorios.')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Pide solo los años nuevos y la ventana de revisión de cada serie, y omite las series sin cambios.'
+        )
+        parser.add_argument(
+            '--revision-years', type=int, default=REVISION_YEARS,
+            help='Años recientes que se vuelven a pedir en modo incremental por posibles revisiones.'
+        )
+        parser.add_argument(
+            '--cache', action='store_true',
+            help='Guarda y reutiliza las respuestas de la API en la caché local (ETL_HTTP_CACHE_PATH).'
+        )
+        parser.add_argument(
+            '--replay', action='store_true',
+            help='Reconstruye el DW solo con respuestas de la caché local, sin acceder a la red.'
+        )
+        parser.add_argument('--cache-path', help='Archivo SQLite de la caché de respuestas.')
+        parser.add_argument('--cache-ttl', type=int, help='Segundos de vigencia de una respuesta en caché.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Hechos por lote (y por transacción) en la carga.')
+        parser.add_argument('--catalog', help='Archivo JSON con el catálogo de países e indicadores (por defecto, dw_etl/etl/catalogo.json).')
+        parser.add_argument(
+            '--calendar', choices=list(GRANOS),
+            help='Completa DimFecha con el calendario de todo el rango histórico a este grano (por defecto solo se crean las fechas con datos).'
+        )
+        parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Lotes de países que se extraen en paralelo.')
+        parser.add_argument(
+            '--countries', nargs='+', metavar='ISO',
+            help='Códigos ISO de los países a procesar (por defecto, los del catálogo).'
+        )
+        parser.add_argument(
+            '--indicators', nargs='+', metavar='INDICADOR',
+            help='Indicadores del catálogo a procesar (por defecto, todos).'
+        )
+        parser.add_argument(
+            '--years',
+            help="Años a pedir para todos los países: 'all', los últimos N años o un rango INICIO:FIN."
+        )
+        parser.add_argument(
+            '--countries-per-call', type=int, default=MAX_PAISES_POR_LLAMADA,
+            help='Máximo de países por llamada a la API (1 aísla por completo la extracción de cada país).'
+        )
+        parser.add_argument(
+            '--refresh-metadata', action='store_true',
+            help='Vuelve a pedir la región y el grupo de ingresos de todos los países seleccionados (por defecto, solo de los que no los tienen).'
+        )
+        parser.add_argument(
+            '--skip-exports', action='store_true',
+            help='No genera al terminar las exportaciones pre-generadas (EXPORT_PREBUILD).'
+        )
+        parser.add_argument(
+            '--summary-json', metavar='ARCHIVO',
+            help="Escribe el resumen JSON de la ejecución (el registro de EtlRun) en ARCHIVO, o en la salida con '-'."
+        )
+        parser.add_argument(
+            '--profile', nargs='?', const='populate_dw.prof', metavar='ARCHIVO',
+            help='Ejecuta con cProfile, guarda el perfil en ARCHIVO (por defecto populate_dw.prof) y muestra las funciones '
+                 'más costosas. Cubre el hilo principal (carga y post-proceso); la extracción se ve en los tiempos por etapa.'
+        )
+
     def handle(self, *args, **options):
+        for nombre in OPCIONES_POSITIVAS:
+            if options[nombre] < 1:
+                raise CommandError(f'--{nombre.replace("_", "-")} debe ser al menos 1, no {options[nombre]}.')
+        parametros = {
+            nombre: valor for nombre, valor in options.items()
+            if nombre not in OPCIONES_BASE and isinstance(valor, (str, int, float, bool, list, type(None)))
+        }
+        telemetria = RunTelemetry(parametros)
+        perfil = cProfile.Profile() if options['profile'] else None
+        try:
+            if perfil is not None:
+                perfil.enable()
+            self.run_etl(options, telemetria)
+        except BaseException as e:
+            telemetria.fail(e)
+            raise
+        finally:
+            if perfil is not None:
+                perfil.disable()
+                perfil.dump_stats(options['profile'])
+                self.stdout.write(self.style.HTTP_INFO(f'Perfil guardado en {options["profile"]}.'))
+                pstats.Stats(perfil, stream=self.stdout).sort_stats('cumulative').print_stats(LINEAS_PERFIL)
+            if options['summary_json']:
+                resumen = json.dumps(run_summary(telemetria.ejecucion), ensure_ascii=False, indent=2)
+                if options['summary_json'] == '-':
+                    self.stdout.write(resumen)
+                else:
+                    with open(options['summary_json'], 'w', encoding='utf-8') as archivo:
+                        archivo.write(resumen)
+
+    def run_etl(self, options, telemetria):
         self.stdout.write(self.style.SUCCESS('Iniciando proceso ETL con World Bank API para datos históricos...'))
 
-        WORLD_BANK_API_BASE_URL = 'https://api.worldbank.org/v2/country'
-
-        # Países de interés (usando códigos ISO 3166-1 alpha-3)
-        # 'historical_years': 'all' para toda la data histórica disponible de la API
-        # 'historical_years': N para los últimos N años
-        PAISES_INTERES = [
-            {'name': 'Chile', 'iso': 'CHL', 'historical_years': 'all'},
-            {'name': 'Argentina', 'iso': 'ARG', 'historical_years': 10},
-            {'name': 'Brasil', 'iso': 'BRA', 'historical_years': 10},
-            {'name': 'México', 'iso': 'MEX', 'historical_years': 10},
-            {'name': 'Colombia', 'iso': 'COL', 'historical_years': 10},
-            {'name': 'Perú', 'iso': 'PER', 'historical_years': 10},
-            {'name': 'Estados Unidos', 'iso': 'USA', 'historical_years': 10},
-            {'name': 'Canadá', 'iso': 'CAN', 'historical_years': 10},
-            {'name': 'Alemania', 'iso': 'DEU', 'historical_years': 10},
-            {'name': 'España', 'iso': 'ESP', 'historical_years': 10},
-            {'name': 'Japón', 'iso': 'JPN', 'historical_years': 10},
-            {'name': 'China', 'iso': 'CHN', 'historical_years': 10},
-            {'name': 'Reino Unido', 'iso': 'GBR', 'historical_years': 10},
-            {'name': 'Australia', 'iso': 'AUS', 'historical_years': 10},
-            {'name': 'India', 'iso': 'IND', 'historical_years': 10},
-            {'name': 'Sudáfrica', 'iso': 'ZAF', 'historical_years': 10},
-            {'name': 'Francia', 'iso': 'FRA', 'historical_years': 10},
-            {'name': 'Italia', 'iso': 'ITA', 'historical_years': 10},
-            {'name': 'Rusia', 'iso': 'RUS', 'historical_years': 10},
-            {'name': 'Suiza', 'iso': 'CHE', 'historical_years': 10},
-            {'name': 'Suecia', 'iso': 'SWE', 'historical_years': 10},
-            {'name': 'Noruega', 'iso': 'NOR', 'historical_years': 10},
-            {'name': 'Dinamarca', 'iso': 'DNK', 'historical_years': 10},
-            {'name': 'Finlandia', 'iso': 'FIN', 'historical_years': 10},
-            {'name': 'Países Bajos', 'iso': 'NLD', 'historical_years': 10},
-            {'name': 'Bélgica', 'iso': 'BEL', 'historical_years': 10},
-            {'name': 'Portugal', 'iso': 'PRT', 'historical_years': 10},
-            {'name': 'Grecia', 'iso': 'GRC', 'historical_years': 10},
-            {'name': 'Turquía', 'iso': 'TUR', 'historical_years': 10},
-            {'name': 'Arabia Saudita', 'iso': 'SAU', 'historical_years': 10},
-        ]
-
-        # Rango global de años para buscar datos en la API del Banco Mundial
-        # La API del Banco Mundial suele tener datos desde 1960
-        GLOBAL_MIN_YEAR_API = 1960
-        GLOBAL_MAX_YEAR_API = datetime.now().year # Año actual
-
-        # Definición de los indicadores y sus códigos en World Bank API
-        INDICADORES = {
-            'Inflación': {
-                'wb_code': 'FP.CPI.TOTL.ZG', # Índice de Precios al Consumidor (IPC), crecimiento anual %
-                'unidad': '%'
-            },
-            'Crecimiento PIB': {
-                'wb_code': 'NY.GDP.MKTP.KD.ZG', # Crecimiento anual del PIB (%)
-                'unidad': '%'
-            },
-            'Tipo de Cambio Dólar': {
-                'wb_code': 'PA.NUS.FCRF', # Tasa de cambio oficial (moneda local por USD)
-                'unidad': 'Moneda Local/USD'
-            },
-            'IPC': { # Si lo quieres como índice base, no como crecimiento anual
-                'wb_code': 'FP.CPI.TOTL', # Índice de Precios al Consumidor (base 2010=100)
-                'unidad': 'Índice'
-            }
-        }
+        try:
+            catalogo = load_catalog(options['catalog'])
+        except CatalogError as e:
+            raise CommandError(str(e))
 
-        # Inicializar dimensiones que no dependen de la API
-        for nombre, info in INDICADORES.items():
-            indicador, created = DimIndicadorEconomico.objects.get_or_create(
-                nombre_indicador=nombre,
-                defaults={
-                    'descripcion_indicador': f'Datos de {nombre} de World Bank API',
-                    'unidad_medida': info['unidad']
-                }
-            )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Indicador {nombre} creado.'))
+        # Selección de países, indicadores y años
+        end_year = global_max_year()
+        paises = catalogo.paises
+        if options['countries']:
+            configurados = {pais_data['iso']: pais_data for pais_data in catalogo.paises}
+            paises = [
+                configurados.get(iso, {'name': iso, 'iso': iso, 'historical_years': DEFAULT_HISTORICAL_YEARS})
+                for iso in dict.fromkeys(iso.upper() for iso in options['countries'])
+            ]
+        desconocidos = set(options['indicators'] or ()) - catalogo.indicadores.keys()
+        if desconocidos:
+            raise CommandError(f'Indicadores que no están en el catálogo: {", ".join(sorted(desconocidos))}.')
+        indicadores = {nombre: catalogo.indicadores[nombre] for nombre in options['indicators'] or catalogo.indicadores}
+        sin_columna = [nombre for nombre in indicadores if nombre not in COLUMNA_PIVOTE]
+        if sin_columna:
+            self.stdout.write(self.style.WARNING(
+                f'Indicadores sin columna en HechosPaisAnio: {", ".join(sin_columna)}. Se cargan en HechosEconomicos '
+                'y HechosGrupoAnio, pero no aparecen en el dashboard, las exportaciones, la API de series ni las correlaciones.'
+            ))
+        rango = None
+        if options['years']:
+            try:
+                rango = parse_years(options['years'], end_year)
+            except ValueError as e:
+                raise CommandError(f'--years: {e}')
+            end_year = rango[1]
+        inicios = {
+            pais_data['iso']: rango[0] if rango else start_year(pais_data['historical_years'], end_year)
+            for pais_data in paises
+        }
 
         fuente, created = DimFuenteDatos.objects.get_or_create(
             nombre_fuente='World Bank API',
@@ -97,102 +184,128 @@ class Command(BaseCommand):
         if created:
             self.stdout.write(self.style.SUCCESS('Fuente de datos World Bank API creada.'))
 
-        # Iterar sobre todos los años posibles para poblar DimFecha (para todo el rango histórico)
-        self.stdout.write(self.style.HTTP_INFO('Poblando DimFecha para el rango histórico...'))
-        for year in range(GLOBAL_MIN_YEAR_API, GLOBAL_MAX_YEAR_API + 1):
-            fecha_obj = date(year, 1, 1)
-            DimFecha.objects.get_or_create(
-                fecha_completa=fecha_obj,
-                defaults={
-                    'dia': fecha_obj.day,
-                    'mes': fecha_obj.month,
-                    'nombre_mes': fecha_obj.strftime('%B'),
-                    'trimestre': (fecha_obj.month - 1) // 3 + 1,
-                    'anio': fecha_obj.year,
-                    'semana_del_anio': fecha_obj.isocalendar()[1],
-                    'es_fin_de_semana': fecha_obj.weekday() >= 5
-                }
-            )
-        self.stdout.write(self.style.HTTP_INFO('DimFecha poblada.'))
+        if options['calendar']:
+            creadas = ensure_calendar(GLOBAL_MIN_YEAR_API, end_year, options['calendar'])
+            self.stdout.write(self.style.HTTP_INFO(f'DimFecha: {creadas} fechas creadas (grano {options["calendar"]}).'))
+
+        # Países e indicadores seleccionados que aún no existen: un bulk_create por dimensión.
+        # Las fechas se crean durante la carga, solo para los años con datos.
+        loader = FactLoader(fuente, batch_size=options['batch_size'])
+        nuevos = loader.ensure_dimensions(paises, indicadores)
+        if nuevos:
+            self.stdout.write(self.style.SUCCESS(f'Países creados: {", ".join(p.nombre_pais for p in nuevos)}.'))
+
+        marcas = WatermarkStore(loader.paises, loader.indicadores, options['revision_years'])
+        incremental = options['incremental']
 
+        # Lotes de extracción: países que comparten indicador y año inicial, en una sola
+        # llamada de rango. En modo incremental el año inicial sale de la marca de agua.
+        lotes = plan_lotes(
+            inicios, indicadores, end_year,
+            marcas=marcas, incremental=incremental, countries_per_call=options['countries_per_call'],
+        )
 
-        # Iterar sobre países para extraer datos históricos
-        for pais_data in PAISES_INTERES:
-            pais_iso = pais_data['iso']
-            pais_nombre = pais_data['name']
-            historical_years_setting = pais_data['historical_years']
+        cache = None
+        if options['cache'] or options['replay']:
+            cache = ResponseCache(
+                options['cache_path'] or settings.ETL_HTTP_CACHE_PATH,
+                ttl=options['cache_ttl'] if options['cache_ttl'] is not None else settings.ETL_HTTP_CACHE_TTL,
+                max_bytes=settings.ETL_HTTP_CACHE_MAX_BYTES,
+            )
+        engine = FetchEngine(
+            max_workers=options['concurrency'],
+            max_per_host=options['max_per_host'],
+            retries=options['retries'],
+            cache=cache,
+            replay=options['replay'],
+        )
+        # Extracción -> transformación -> carga, en paralelo por lotes de países. La caché
+        # se cierra al salir, también si la ejecución se interrumpe con un error
+        with cache or nullcontext(), engine:
+            extractor = WorldBankExtractor(base_url=options['api_url'], engine=engine)
 
-            self.stdout.write(self.style.MIGRATE_HEADING(f'Procesando datos para {pais_nombre} ({pais_iso})...'))
+            # Metadata de los países (región, grupo de ingresos) para los agregados por grupo
+            isos = list(inicios)
+            sin_metadata = isos if options['refresh_metadata'] else loader.countries_without_metadata(isos)
+            actualizados = []
+            errores = []
+            if sin_metadata:
+                with telemetria.stage('metadata'):
+                    metadata, errores_metadata = extractor.fetch_countries(sin_metadata)
+                    actualizados = loader.update_country_metadata(metadata)
+                self.stdout.write(self.style.HTTP_INFO(f'Metadata de países actualizada: {len(actualizados)} países.'))
+                for error in errores_metadata:
+                    errores.append(f'No se pudo obtener la metadata de países: {error}')
+                    self.stdout.write(self.style.WARNING(errores[-1]))
 
-            dim_pais, created = DimPais.objects.get_or_create(
-                codigo_iso=pais_iso,
-                defaults={
-                    'nombre_pais': pais_nombre,
-                    'continente': 'N/A', # Estos campos podrían poblarse de otra fuente
-                    'region': 'N/A',
-                    'capital': 'N/A'
-                }
+            pipeline = EtlPipeline(
+                extractor, loader, marcas, inicios, workers=options['workers'], incremental=incremental,
             )
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'País {pais_nombre} creado.'))
-
-            # Determinar el rango de años para este país
-            if historical_years_setting == 'all':
-                start_year_for_country = GLOBAL_MIN_YEAR_API
-            else: # Asumimos un número de años
-                start_year_for_country = max(GLOBAL_MIN_YEAR_API, GLOBAL_MAX_YEAR_API - historical_years_setting + 1)
-            
-            # Iterar sobre los años relevantes para este país, desde el más reciente hacia atrás
-            for year_to_fetch in range(GLOBAL_MAX_YEAR_API, start_year_for_country - 1, -1):
-                # Obtener la DimFecha para el año actual de la iteración
-                dim_fecha_actual, _ = DimFecha.objects.get_or_create(fecha_completa=date(year_to_fetch, 1, 1))
-
-                for indicador_nombre, indicador_info in INDICADORES.items():
-                    dim_indicador = DimIndicadorEconomico.objects.get(nombre_indicador=indicador_nombre)
-                    value_found = None
-
-                    try:
-                        url = f"{WORLD_BANK_API_BASE_URL}/{pais_iso}/indicator/{indicador_info['wb_code']}?date={year_to_fetch}&format=json"
-                        response = requests.get(url)
-                        response.raise_for_status()
-                        data = response.json()
-
-                        if data and len(data) > 1 and data[1] and data[1]:
-                            value_entry = data[1][0]
-                            if value_entry and value_entry.get('value') is not None:
-                                value_found = value_entry['value']
-                                # self.stdout.write(self.style.SUCCESS(f'  -> Dato de {indicador_nombre} para {pais_nombre} encontrado en {year_to_fetch}.'))
-                        
-                        if value_found is not None:
-                            try:
-                                with transaction.atomic():
-                                    hecho, created = HechosEconomicos.objects.update_or_create(
-                                        id_fecha=dim_fecha_actual, # Usar la DimFecha del año real del dato
-                                        id_pais=dim_pais,
-                                        id_indicador=dim_indicador,
-                                        id_fuente=fuente,
-                                        defaults={
-                                            'porcentaje_inflacion': float(value_found) if indicador_nombre == 'Inflación' else None,
-                                            'variacion_pib_anual': float(value_found) if indicador_nombre == 'Crecimiento PIB' else None,
-                                            'tipo_cambio_usd_local_promedio_cierre': float(value_found) if indicador_nombre == 'Tipo de Cambio Dólar' else None,
-                                            'ipc_o_devaluacion': float(value_found) if indicador_nombre == 'IPC' else None,
-                                        }
-                                    )
-                                    if created:
-                                        self.stdout.write(self.style.SUCCESS(f'Hecho insertado: {pais_nombre} - {indicador_nombre} - Año: {year_to_fetch}'))
-                                    # else:
-                                    #     self.stdout.write(self.style.NOTICE(f'Hecho actualizado: {pais_nombre} - {indicador_nombre} - Año: {year_to_fetch}'))
-
-                            except Exception as e:
-                                self.stdout.write(self.style.ERROR(f'Error al guardar el hecho para {pais_nombre} - {indicador_nombre} - Año: {year_to_fetch}: {e}'))
-                        # else:
-                        #     self.stdout.write(self.style.WARNING(f'No se encontró dato para {indicador_nombre} en {pais_nombre} para el año {year_to_fetch}.'))
-
-                    except requests.exceptions.RequestException as e:
-                        # self.stdout.write(self.style.WARNING(f'Error de red o HTTP para {pais_nombre} - {indicador_nombre} - {year_to_fetch}: {e}'))
-                        pass # Ignorar para no llenar la consola de advertencias si un año no tiene datos
-
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f'Error inesperado para {pais_nombre} - {indicador_nombre} - {year_to_fetch}: {e}'))
-
-        self.stdout.write(self.style.SUCCESS('Proceso ETL completado exitosamente con World Bank API.'))
+            with telemetria.stage('pipeline'):
+                pipeline.run(lotes)
+        marcas.save()
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'Extracción completada: {engine.stats.requests} solicitudes HTTP ({engine.stats.retries} reintentos), '
+            f'{engine.stats.cache_hits} respuestas desde caché, {engine.stats.bytes_downloaded / 2**20:.1f} MB descargados.'
+        ))
+        # Las series que no se pudieron descargar o cargar quedan como huecos visibles en el resumen
+        for lote, error in pipeline.errores_extraccion.items():
+            errores.append(f'Sin datos de {lote.indicador} ({lote.start_year}-{lote.end_year}) para {", ".join(lote.isos)}: {error}')
+            self.stdout.write(self.style.ERROR(errores[-1]))
+        for (iso, indicador_nombre), error in pipeline.errores_series.items():
+            errores.append(f'Error al procesar {indicador_nombre} de {iso}: {error!r}')
+            self.stdout.write(self.style.ERROR(errores[-1]))
+        if incremental:
+            self.stdout.write(self.style.HTTP_INFO(f'Series sin cambios omitidas: {pipeline.series_sin_cambios}.'))
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'Carga completada: {loader.rows} hechos en {loader.elapsed:.2f} s ({loader.rows_per_second:,.0f} hechos/s): '
+            f'{loader.inserted} insertados, {loader.updated} actualizados, {loader.unchanged} sin cambios.'
+        ))
+        if loader.skipped:
+            self.stdout.write(self.style.WARNING(f'{loader.skipped} valores omitidos por país o indicador desconocido.'))
+
+        # Refrescar la tabla pivoteada solo para los (año, país) modificados
+        with telemetria.stage('pivote'):
+            filas_pivote = refresh_pivot(loader.touched)
+        self.stdout.write(self.style.HTTP_INFO(f'Tabla HechosPaisAnio actualizada: {filas_pivote} filas (año, país).'))
+        # Agregados por grupo: los años cargados, o todos si cambió la región o el grupo de algún país
+        with telemetria.stage('agregados'):
+            filas_grupos = refresh_rollups(None if actualizados else {anio for anio, _ in loader.touched})
+        self.stdout.write(self.style.HTTP_INFO(f'Tabla HechosGrupoAnio actualizada: {filas_grupos} filas (grupo, indicador, año).'))
+        # Episodios de devaluación con recesión, con los umbrales de settings
+        with telemetria.stage('crisis'):
+            episodios, segundos, cambio_crisis = run_detection()
+        self.stdout.write(self.style.HTTP_INFO(f'Episodios de devaluación con recesión: {episodios} ({segundos:.3f} s).'))
+        if loader.inserted or loader.updated or actualizados or cambio_crisis:
+            # Invalidar lo cacheado con los datos anteriores (dashboard)
+            bump_data_version()
+            # Exportaciones de la nueva versión de los datos, listas para servirse como archivos
+            if not options['skip_exports']:
+                with telemetria.stage('exportaciones'):
+                    artefactos = prebuild_artifacts()
+                self.stdout.write(self.style.HTTP_INFO(
+                    f'Exportaciones pre-generadas: {len(artefactos)} archivos en {settings.EXPORT_ARTIFACTS_DIR}.'
+                ))
+        else:
+            # Sin cambios, la caché y las exportaciones de la versión actual siguen valiendo
+            self.stdout.write(self.style.HTTP_INFO(f'Sin cambios en los datos: se mantiene la versión {data_version()}.'))
+
+        fechas_api = [f for f in extractor.lastupdated.values() if f is not None]
+        if fechas_api:
+            fuente.fecha_ultima_actualizacion = max(fechas_api)
+            fuente.save(update_fields=['fecha_ultima_actualizacion'])
+
+        ejecucion = telemetria.finish(engine, pipeline, loader, errores)
+        tiempos = ', '.join(f'{etapa} {segundos:.2f} s' for etapa, segundos in ejecucion.tiempos.items())
+        self.stdout.write(self.style.HTTP_INFO(f'Ejecución {ejecucion.pk} registrada en EtlRun ({ejecucion.duracion:.2f} s): {tiempos}.'))
+
+        if engine.stats.failed or pipeline.errores_extraccion or pipeline.errores_series:
+            self.stdout.write(self.style.WARNING(
+                f'Proceso ETL completado con {engine.stats.failed} solicitudes fallidas '
+                f'({sum(len(lote.isos) for lote in pipeline.errores_extraccion)} series sin datos) y '
+                f'{len(pipeline.errores_series)} series con errores.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Proceso ETL completado exitosamente con World Bank API.'))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaAguaSerie',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_anio', models.IntegerField(blank=True, null=True)),
+                ('desde_anio', models.IntegerField()),
+                ('fecha_actualizacion_api', models.DateField(blank=True, null=True)),
+                ('hash_contenido', models.CharField(max_length=64)),
+                ('fecha_carga', models.DateTimeField(auto_now=True)),
+                ('id_indicador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dw_etl.dimindicadoreconomico')),
+                ('id_pais', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dw_etl.dimpais')),
+            ],
+            options={
+                'unique_together': {('id_pais', 'id_indicador')},
+            },
+        ),
+    ]
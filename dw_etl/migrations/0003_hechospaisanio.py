@@ -0,0 +1,61 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def poblar_pivote(apps, schema_editor):
+    # Construye HechosPaisAnio a partir de los hechos ya cargados
+    HechosEconomicos = apps.get_model('dw_etl', 'HechosEconomicos')
+    HechosPaisAnio = apps.get_model('dw_etl', 'HechosPaisAnio')
+    agregados = HechosEconomicos.objects.values(
+        'id_fecha__anio', 'id_pais', 'id_pais__nombre_pais', 'id_pais__codigo_iso'
+    ).annotate(
+        inflacion=Max('porcentaje_inflacion'),
+        pib_crecimiento=Max('variacion_pib_anual'),
+        tipo_cambio=Max('tipo_cambio_usd_local_promedio_cierre'),
+        ipc=Max('ipc_o_devaluacion'),
+    ).order_by()
+    HechosPaisAnio.objects.bulk_create([
+        HechosPaisAnio(
+            anio=fila['id_fecha__anio'],
+            id_pais_id=fila['id_pais'],
+            nombre_pais=fila['id_pais__nombre_pais'],
+            codigo_iso=fila['id_pais__codigo_iso'],
+            inflacion=fila['inflacion'],
+            pib_crecimiento=fila['pib_crecimiento'],
+            tipo_cambio=fila['tipo_cambio'],
+            ipc=fila['ipc'],
+        )
+        for fila in agregados
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0002_marcaaguaserie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HechosPaisAnio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('nombre_pais', models.CharField(max_length=100)),
+                ('codigo_iso', models.CharField(max_length=3)),
+                ('inflacion', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('pib_crecimiento', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('tipo_cambio', models.DecimalField(blank=True, decimal_places=6, max_digits=15, null=True)),
+                ('ipc', models.DecimalField(blank=True, decimal_places=4, max_digits=10, null=True)),
+                ('id_pais', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dw_etl.dimpais')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['anio', 'nombre_pais'], name='pivot_anio_pais_idx'), models.Index(fields=['codigo_iso', 'anio'], name='pivot_iso_anio_idx')],
+                'unique_together': {('anio', 'id_pais')},
+            },
+        ),
+        migrations.RunPython(poblar_pivote, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copiar_anio(apps, schema_editor):
+    # Copia el año de DimFecha en los hechos existentes (un solo UPDATE)
+    DimFecha = apps.get_model('dw_etl', 'DimFecha')
+    HechosEconomicos = apps.get_model('dw_etl', 'HechosEconomicos')
+    HechosEconomicos.objects.update(
+        anio=Subquery(DimFecha.objects.filter(pk=OuterRef('id_fecha')).values('anio')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0003_hechospaisanio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hechoseconomicos',
+            name='anio',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.RunPython(copiar_anio, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='hechoseconomicos',
+            name='anio',
+            field=models.IntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='hechoseconomicos',
+            index=models.Index(fields=['id_pais', 'id_indicador', 'anio'], name='hechos_serie_anio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hechoseconomicos',
+            index=models.Index(fields=['anio', 'id_pais', 'id_indicador'], name='hechos_anio_pais_ind_idx'),
+        ),
+    ]
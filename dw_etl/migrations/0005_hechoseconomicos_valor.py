@@ -0,0 +1,59 @@
+# Generated by Django 5.2.3 on 2026-10-18 21:30
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+# Columna anterior de cada indicador
+COLUMNA_POR_INDICADOR = {
+    'Inflación': 'porcentaje_inflacion',
+    'Crecimiento PIB': 'variacion_pib_anual',
+    'Tipo de Cambio Dólar': 'tipo_cambio_usd_local_promedio_cierre',
+    'IPC': 'ipc_o_devaluacion',
+}
+
+
+def unificar_valor(apps, schema_editor):
+    # Cada hecho tenía a lo más una columna de valor con dato
+    HechosEconomicos = apps.get_model('dw_etl', 'HechosEconomicos')
+    HechosEconomicos.objects.update(
+        valor=Coalesce(*COLUMNA_POR_INDICADOR.values(), output_field=models.DecimalField(max_digits=20, decimal_places=6))
+    )
+
+
+def separar_valor(apps, schema_editor):
+    HechosEconomicos = apps.get_model('dw_etl', 'HechosEconomicos')
+    for indicador, columna in COLUMNA_POR_INDICADOR.items():
+        HechosEconomicos.objects.filter(id_indicador__nombre_indicador=indicador).update(**{columna: F('valor')})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0004_hechoseconomicos_anio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hechoseconomicos',
+            name='valor',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=20, null=True),
+        ),
+        migrations.RunPython(unificar_valor, separar_valor),
+        migrations.RemoveField(
+            model_name='hechoseconomicos',
+            name='ipc_o_devaluacion',
+        ),
+        migrations.RemoveField(
+            model_name='hechoseconomicos',
+            name='porcentaje_inflacion',
+        ),
+        migrations.RemoveField(
+            model_name='hechoseconomicos',
+            name='tipo_cambio_usd_local_promedio_cierre',
+        ),
+        migrations.RemoveField(
+            model_name='hechoseconomicos',
+            name='variacion_pib_anual',
+        ),
+    ]
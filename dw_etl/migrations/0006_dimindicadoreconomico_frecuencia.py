@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0005_hechoseconomicos_valor'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dimindicadoreconomico',
+            name='frecuencia',
+            field=models.CharField(choices=[('anual', 'Anual'), ('trimestral', 'Trimestral'), ('mensual', 'Mensual')], default='anual', max_length=10),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0006_dimindicadoreconomico_frecuencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dimpais',
+            name='grupo_ingresos',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.CreateModel(
+            name='HechosGrupoAnio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agrupacion', models.CharField(choices=[('region', 'Región'), ('grupo_ingresos', 'Grupo de ingresos'), ('mundo', 'Todos los países')], max_length=20)),
+                ('grupo', models.CharField(max_length=100)),
+                ('anio', models.IntegerField()),
+                ('cantidad', models.IntegerField()),
+                ('minimo', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('maximo', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('promedio', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('mediana', models.DecimalField(decimal_places=6, max_digits=20)),
+                ('id_indicador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dw_etl.dimindicadoreconomico')),
+                ('id_pais_maximo', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dw_etl.dimpais')),
+                ('id_pais_minimo', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='dw_etl.dimpais')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['anio', 'agrupacion', 'id_indicador'], name='grupo_anio_agrup_ind_idx')],
+                'unique_together': {('agrupacion', 'grupo', 'id_indicador', 'anio')},
+            },
+        ),
+    ]
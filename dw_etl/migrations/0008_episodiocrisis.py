@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0007_dimpais_grupo_ingresos_hechosgrupoanio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EpisodioCrisis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio_inicio', models.IntegerField()),
+                ('anio_fin', models.IntegerField()),
+                ('duracion', models.IntegerField()),
+                ('crecimiento_minimo', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('devaluacion_maxima', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('anio_devaluacion', models.IntegerField()),
+                ('umbral_devaluacion', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('anios_recesion', models.IntegerField()),
+                ('margen_anios', models.IntegerField()),
+                ('id_pais', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dw_etl.dimpais')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['anio_inicio', 'id_pais'], name='crisis_anio_pais_idx')],
+                'unique_together': {('id_pais', 'anio_inicio')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dw_etl', '0008_episodiocrisis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtlRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField()),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('exitoso', 'Exitoso'), ('con_errores', 'Con errores'), ('fallido', 'Fallido')], default='en_curso', max_length=20)),
+                ('duracion', models.FloatField(default=0)),
+                ('parametros', models.JSONField(default=dict)),
+                ('tiempos', models.JSONField(default=dict)),
+                ('solicitudes', models.IntegerField(default=0)),
+                ('reintentos', models.IntegerField(default=0)),
+                ('bytes_descargados', models.BigIntegerField(default=0)),
+                ('respuestas_cache', models.IntegerField(default=0)),
+                ('hechos_insertados', models.IntegerField(default=0)),
+                ('hechos_actualizados', models.IntegerField(default=0)),
+                ('hechos_sin_cambios', models.IntegerField(default=0)),
+                ('errores', models.IntegerField(default=0)),
+                ('detalle_errores', models.JSONField(default=list)),
+                ('hechos_por_segundo', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inicio'], name='etlrun_inicio_idx')],
+            },
+        ),
+    ]
@@ -19,17 +19,26 @@ class DimPais(models.Model):
     nombre_pais = models.CharField(max_length=100, unique=True)
     codigo_iso = models.CharField(max_length=3, unique=True) # ISO 3166-1 alpha-3
     continente = models.CharField(max_length=50, blank=True, null=True)
-    region = models.CharField(max_length=100, blank=True, null=True)
+    region = models.CharField(max_length=100, blank=True, null=True) # Región del Banco Mundial
     capital = models.CharField(max_length=100, blank=True, null=True)
+    grupo_ingresos = models.CharField(max_length=50, blank=True, null=True) # Nivel de ingresos del Banco Mundial
 
     def __str__(self):
         return self.nombre_pais
 
 class DimIndicadorEconomico(models.Model):
+    # Frecuencia de publicación de la serie: define el grano de DimFecha de sus hechos
+    FRECUENCIAS = [
+        ('anual', 'Anual'),
+        ('trimestral', 'Trimestral'),
+        ('mensual', 'Mensual'),
+    ]
+
     # ID_Indicador será auto-incremento por defecto en Django
     nombre_indicador = models.CharField(max_length=100, unique=True)
     descripcion_indicador = models.TextField(blank=True, null=True)
     unidad_medida = models.CharField(max_length=50)
+    frecuencia = models.CharField(max_length=10, choices=FRECUENCIAS, default='anual')
 
     def __str__(self):
         return self.nombre_indicador
@@ -50,16 +59,149 @@ class HechosEconomicos(models.Model):
     id_pais = models.ForeignKey(DimPais, on_delete=models.CASCADE)
     id_indicador = models.ForeignKey(DimIndicadorEconomico, on_delete=models.CASCADE)
     id_fuente = models.ForeignKey(DimFuenteDatos, on_delete=models.CASCADE)
-    porcentaje_inflacion = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
-    variacion_pib_anual = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
-    tipo_cambio_usd_local_promedio_cierre = models.DecimalField(max_digits=15, decimal_places=6, null=True, blank=True)
-    ipc_o_devaluacion = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
-    # anio_dato_real se elimina, ya que el año está en id_fecha.
+    # Valor del indicador id_indicador (una sola columna para todos los indicadores)
+    valor = models.DecimalField(max_digits=20, decimal_places=6, null=True, blank=True)
+    # Año del dato copiado desde id_fecha, para filtrar y ordenar por año sin join con DimFecha
+    anio = models.IntegerField()
 
     class Meta:
         # Asegura que no haya duplicados para la misma combinación de fecha, país, indicador
-        # Ahora, id_fecha será el año real del dato
+        # Ahora, id_fecha será el año real del dato (este índice sirve también a los filtros por id_fecha)
         unique_together = ('id_fecha', 'id_pais', 'id_indicador')
+        indexes = [
+            # Historia de una serie (país × indicador) ordenada por año
+            models.Index(fields=['id_pais', 'id_indicador', 'anio'], name='hechos_serie_anio_idx'),
+            # Rangos y orden por año (exportaciones, refresco de HechosPaisAnio)
+            models.Index(fields=['anio', 'id_pais', 'id_indicador'], name='hechos_anio_pais_ind_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hecho Económico: {self.id_pais.nombre_pais} - {self.id_indicador.nombre_indicador} - {self.anio}"
+
+class MarcaAguaSerie(models.Model):
+    # Marca de agua (high-water mark) de una serie país × indicador, usada por la carga incremental
+    id_pais = models.ForeignKey(DimPais, on_delete=models.CASCADE)
+    id_indicador = models.ForeignKey(DimIndicadorEconomico, on_delete=models.CASCADE)
+    ultimo_anio = models.IntegerField(blank=True, null=True) # Último año con dato cargado
+    desde_anio = models.IntegerField() # Inicio de la ventana de años sobre la que se calculó el hash
+    fecha_actualizacion_api = models.DateField(blank=True, null=True) # Campo 'lastupdated' de la API
+    hash_contenido = models.CharField(max_length=64)
+    fecha_carga = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('id_pais', 'id_indicador')
+
+    def __str__(self):
+        return f"Marca de agua: {self.id_pais_id} - {self.id_indicador_id} - {self.ultimo_anio}"
+
+class HechosPaisAnio(models.Model):
+    # Tabla materializada (pivoteada) de HechosEconomicos: una fila por (año, país) y una
+    # columna por indicador. La mantiene el ETL (dw_etl/etl/pivot.py); el dashboard y las
+    # exportaciones la leen directamente en lugar de pivotear en cada solicitud.
+    anio = models.IntegerField()
+    id_pais = models.ForeignKey(DimPais, on_delete=models.CASCADE)
+    nombre_pais = models.CharField(max_length=100) # Copia de DimPais para ordenar y exportar sin JOIN
+    codigo_iso = models.CharField(max_length=3)
+    inflacion = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    pib_crecimiento = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+    tipo_cambio = models.DecimalField(max_digits=15, decimal_places=6, null=True, blank=True)
+    ipc = models.DecimalField(max_digits=10, decimal_places=4, null=True, blank=True)
+
+    class Meta:
+        unique_together = ('anio', 'id_pais')
+        indexes = [
+            models.Index(fields=['anio', 'nombre_pais'], name='pivot_anio_pais_idx'),
+            models.Index(fields=['codigo_iso', 'anio'], name='pivot_iso_anio_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre_pais} - {self.anio}"
+
+class HechosGrupoAnio(models.Model):
+    # Agregados precalculados por grupo de países (región, grupo de ingresos o el total),
+    # indicador y año. Los mantiene el ETL (dw_etl/etl/rollups.py) a partir del valor anual
+    # de cada país; el dashboard y las comparaciones los leen sin recorrer los hechos.
+    AGRUPACIONES = [
+        ('region', 'Región'),
+        ('grupo_ingresos', 'Grupo de ingresos'),
+        ('mundo', 'Todos los países'),
+    ]
+
+    agrupacion = models.CharField(max_length=20, choices=AGRUPACIONES)
+    grupo = models.CharField(max_length=100)
+    anio = models.IntegerField()
+    id_indicador = models.ForeignKey(DimIndicadorEconomico, on_delete=models.CASCADE)
+    cantidad = models.IntegerField() # Países con dato
+    minimo = models.DecimalField(max_digits=20, decimal_places=6)
+    maximo = models.DecimalField(max_digits=20, decimal_places=6)
+    promedio = models.DecimalField(max_digits=20, decimal_places=6)
+    mediana = models.DecimalField(max_digits=20, decimal_places=6)
+    id_pais_minimo = models.ForeignKey(DimPais, on_delete=models.SET_NULL, null=True, related_name='+')
+    id_pais_maximo = models.ForeignKey(DimPais, on_delete=models.SET_NULL, null=True, related_name='+')
+
+    class Meta:
+        unique_together = ('agrupacion', 'grupo', 'id_indicador', 'anio')
+        indexes = [
+            models.Index(fields=['anio', 'agrupacion', 'id_indicador'], name='grupo_anio_agrup_ind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.grupo} - {self.id_indicador_id} - {self.anio}"
+
+class EpisodioCrisis(models.Model):
+    # Episodio en que una fuerte devaluación coincide con una recesión: años seguidos de
+    # crecimiento negativo del PIB con un alza del tipo de cambio sobre el umbral. Lo
+    # calcula el detector (dw_etl/crisis.py) con los umbrales indicados en cada fila.
+    id_pais = models.ForeignKey(DimPais, on_delete=models.CASCADE)
+    anio_inicio = models.IntegerField() # Primer año de la recesión
+    anio_fin = models.IntegerField() # Último año de la recesión
+    duracion = models.IntegerField() # Años de recesión
+    crecimiento_minimo = models.DecimalField(max_digits=10, decimal_places=4) # Peor crecimiento del PIB (%)
+    devaluacion_maxima = models.DecimalField(max_digits=20, decimal_places=4) # Mayor alza del tipo de cambio (%)
+    anio_devaluacion = models.IntegerField() # Año de la mayor devaluación
+    umbral_devaluacion = models.DecimalField(max_digits=10, decimal_places=4)
+    anios_recesion = models.IntegerField()
+    margen_anios = models.IntegerField()
+
+    class Meta:
+        unique_together = ('id_pais', 'anio_inicio')
+        indexes = [
+            models.Index(fields=['anio_inicio', 'id_pais'], name='crisis_anio_pais_idx'),
+        ]
+
+    def __str__(self):
+        return f"Crisis: {self.id_pais_id} {self.anio_inicio}-{self.anio_fin}"
+
+class EtlRun(models.Model):
+    # Registro de una ejecución de populate_dw: tiempos por etapa, contadores de la
+    # extracción y de la carga, errores y rendimiento (dw_etl/etl/telemetry.py)
+    ESTADOS = [
+        ('en_curso', 'En curso'),
+        ('exitoso', 'Exitoso'),
+        ('con_errores', 'Con errores'),
+        ('fallido', 'Fallido'),
+    ]
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField(null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='en_curso')
+    duracion = models.FloatField(default=0) # Segundos
+    parametros = models.JSONField(default=dict) # Opciones del comando
+    tiempos = models.JSONField(default=dict) # Etapa -> segundos
+    solicitudes = models.IntegerField(default=0) # Solicitudes HTTP (con reintentos)
+    reintentos = models.IntegerField(default=0)
+    bytes_descargados = models.BigIntegerField(default=0)
+    respuestas_cache = models.IntegerField(default=0)
+    hechos_insertados = models.IntegerField(default=0)
+    hechos_actualizados = models.IntegerField(default=0)
+    hechos_sin_cambios = models.IntegerField(default=0)
+    errores = models.IntegerField(default=0)
+    detalle_errores = models.JSONField(default=list) # Mensajes de los errores
+    hechos_por_segundo = models.FloatField(default=0) # Hechos procesados / duración total
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inicio'], name='etlrun_inicio_idx'),
+        ]
 
     def __str__(self):
-        return f"Hecho Económico: {self.id_pais.nombre_pais} - {self.id_indicador.nombre_indicador} - {self.id_fecha.anio}"
+        return f"Ejecución ETL {self.inicio:%Y-%m-%d %H:%M} ({self.estado})"
@@ -0,0 +1,58 @@
+# dw_etl/series.py
+"""
+Series de tiempo alineadas (países × indicadores × años) para la API del dashboard.
+"""
+from .exports import CLAVE_JSON, ITERATOR_CHUNK_SIZE, filter_pivot
+
+
+def _series_queryset(params):
+    queryset, claves = filter_pivot(params)
+    return queryset.order_by('codigo_iso', 'anio'), ['anio', 'codigo_iso', 'nombre_pais', *claves], claves
+
+
+def aligned_series(params):
+    """
+    Lee HechosPaisAnio con los filtros de exportación (`pais`, `indicador`, `desde`,
+    `hasta`) en una sola consulta y alinea las series sobre un eje común de años.
+
+    Cada serie trae una lista de valores del mismo largo que `anios`, con None donde no
+    hay dato. Los valores se acumulan en un diccionario por año, así que la alineación
+    es lineal en la cantidad de filas.
+    """
+    queryset, campos, claves = _series_queryset(params)
+    return _align(queryset.values_list(*campos).iterator(chunk_size=ITERATOR_CHUNK_SIZE), claves)
+
+
+async def aaligned_series(params):
+    """
+    `aligned_series` para las vistas async: lee las filas con `aiterator()` (sobre
+    `values()`, porque `values_list().aiterator()` consulta en el event loop).
+    """
+    queryset, campos, claves = _series_queryset(params)
+    filas = queryset.values(*campos).aiterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    return _align([tuple(fila[campo] for campo in campos) async for fila in filas], claves)
+
+
+def _align(filas, claves):
+    anios = set()
+    nombres = {}
+    por_serie = {} # (iso, clave) -> {anio: valor}
+    for anio, iso, nombre, *valores in filas:
+        anios.add(anio)
+        nombres[iso] = nombre
+        for clave, valor in zip(claves, valores):
+            por_serie.setdefault((iso, clave), {})[anio] = float(valor) if valor is not None else None
+
+    eje = sorted(anios)
+    return {
+        'anios': eje,
+        'series': [
+            {
+                'codigo_iso': iso,
+                'pais': nombres[iso],
+                'indicador': CLAVE_JSON[clave],
+                'valores': [serie.get(anio) for anio in eje],
+            }
+            for (iso, clave), serie in por_serie.items()
+        ],
+    }
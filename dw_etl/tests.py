@@ -1,3 +1,1049 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+import threading
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from statistics import median
+from unittest import mock
+
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, transaction
+from django.core.cache import cache
+from django.http import FileResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from openpyxl import load_workbook
+from django.test.utils import CaptureQueriesContext
+
+from .artifacts import ArtifactBuilder, artifact_path, build_artifact
+from .bench.baseline import compare, load_baseline, save_baseline
+from .bench.metrics import Medicion
+from .bench.concurrency import run_concurrent
+from .bench.synthetic import generate_warehouse
+from .correlations import VARIABLES, pair_ranking
+from .crisis import run_detection
+from .etl.cache import ResponseCache, normalize_url
+from .etl.calendario import ensure_calendar
+from .etl.config import global_max_year
+from .etl.fake_api import FakeWorldBankAPI, pais_sintetico, valor_sintetico
+from .etl.fetch import FetchEngine
+from .etl.loader import FactLoader
+from .etl.pipeline import EtlPipeline
+from .etl.pivot import refresh_pivot
+from .etl.worldbank import WorldBankExtractor
+from .exports import iter_json_rows
+from .instrumentation import instrument, query_budget, registry
+from .models import (
+    DimFecha, DimFuenteDatos, DimIndicadorEconomico, DimPais, EpisodioCrisis, EtlRun, HechosEconomicos, HechosGrupoAnio,
+    HechosPaisAnio, MarcaAguaSerie,
+)
+from .versioning import bump_data_version, data_version
+
+# Caché en memoria para los tests (la de settings se guarda en disco)
+CACHE_LOCAL = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Las exportaciones pre-generadas y la versión de los datos de los tests van a un
+# directorio temporal, y las exportaciones no se generan en segundo plano (salvo en los
+# tests que lo piden)
+_artefactos = tempfile.TemporaryDirectory()
+_settings_artefactos = override_settings(
+    EXPORT_ARTIFACTS_DIR=Path(_artefactos.name) / 'exportaciones', EXPORT_WORKERS=0,
+    DATA_VERSION_PATH=Path(_artefactos.name) / 'version_datos',
+)
+
+
+def limpiar_cache():
+    """
+    Vacía la caché y descarta la versión de los datos: cada test parte sin nada cacheado
+    ni exportaciones pre-generadas.
+    """
+    cache.clear()
+    Path(settings.DATA_VERSION_PATH).unlink(missing_ok=True)
+
+
+def setUpModule():
+    _settings_artefactos.enable()
+
+
+def tearDownModule():
+    _settings_artefactos.disable()
+    _artefactos.cleanup()
+
+
+class WorldBankExtractorTests(TestCase):
+    def test_fetch_indicator_recorre_todas_las_paginas(self):
+        with FakeWorldBankAPI() as api:
+            extractor = WorldBankExtractor(base_url=api.base_url, per_page=25)
+            observaciones = extractor.fetch_indicator(['CHL', 'ARG'], 'FP.CPI.TOTL.ZG', 1990, 2019)
+
+        self.assertEqual(len(observaciones), 60)
+        self.assertEqual(extractor.request_count, 3)
+        self.assertEqual({(o.iso, o.anio) for o in observaciones}, {(iso, a) for iso in ('CHL', 'ARG') for a in range(1990, 2020)})
+        chl_2000 = next(o for o in observaciones if o.iso == 'CHL' and o.anio == 2000)
+        self.assertEqual(chl_2000.valor, valor_sintetico('CHL', 'FP.CPI.TOTL.ZG', 2000))
+
+
+    def test_reintenta_errores_transitorios_y_reporta_fallas(self):
+        with FakeWorldBankAPI(fail_times=2, failing_codes={'PA.NUS.FCRF'}) as api:
+            with FetchEngine(max_workers=4, retries=3, backoff_base=0) as engine:
+                extractor = WorldBankExtractor(base_url=api.base_url, engine=engine)
+                resultados, errores = extractor.fetch_many({
+                    'inflacion': (['CHL'], 'FP.CPI.TOTL.ZG', 2000, 2010),
+                    'tipo_cambio': (['CHL'], 'PA.NUS.FCRF', 2000, 2010),
+                })
+
+        self.assertEqual(len(resultados['inflacion']), 11)
+        self.assertEqual(list(errores), ['tipo_cambio'])
+        self.assertEqual(engine.stats.failed, 1)
+        self.assertEqual(engine.stats.retries, 2 + 3)
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'cache.sqlite3'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_normaliza_url(self):
+        self.assertEqual(
+            normalize_url('HTTPS://Api.WorldBank.org:443/v2/country/CHL/?page=1&date=2000:2010'),
+            normalize_url('https://api.worldbank.org/v2/country/CHL?date=2000:2010&page=1'),
+        )
+
+    def test_ttl_y_desalojo_lru(self):
+        cache = ResponseCache(self.path, ttl=0, max_bytes=None)
+        cache.set('http://x/a', [1, 2, 3])
+        self.assertIsNone(cache.get('http://x/a'))
+        self.assertEqual(cache.get('http://x/a', allow_stale=True), [1, 2, 3])
+        cache.close()
+
+        cache = ResponseCache(self.path, ttl=None, max_bytes=300)
+        for nombre in 'abc':
+            cache.set(f'http://x/{nombre}', [os.urandom(100).hex()]) # ~140 bytes comprimido
+            cache.get('http://x/a')
+        self.assertIsNotNone(cache.get('http://x/a'))
+        self.assertIsNone(cache.get('http://x/b'))
+        self.assertIsNotNone(cache.get('http://x/c'))
+        self.assertLessEqual(cache.stats()['bytes'], 300)
+        cache.close()
+
+
+class FactLoaderTests(TestCase):
+    def setUp(self):
+        self.fuente = DimFuenteDatos.objects.create(nombre_fuente='World Bank API')
+        DimPais.objects.bulk_create([DimPais(codigo_iso=f'P{i:02d}', nombre_pais=f'País {i}') for i in range(60)])
+        for nombre in ('Inflación', 'Crecimiento PIB', 'Tipo de Cambio Dólar', 'IPC'):
+            DimIndicadorEconomico.objects.create(nombre_indicador=nombre, unidad_medida='%')
+
+    def filas(self, delta=0.0):
+        indicadores = ('Inflación', 'Crecimiento PIB', 'Tipo de Cambio Dólar', 'IPC')
+        return [
+            (f'P{i:02d}', anio, indicador, anio / 100 + i + delta)
+            for i in range(60) for anio in range(1960, 2060) for indicador in indicadores
+        ]
+
+    def test_carga_por_lotes_e_inserta_o_actualiza(self):
+        loader = FactLoader(self.fuente)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(loader.load(self.filas()), 24000)
+        self.assertEqual(HechosEconomicos.objects.count(), 24000)
+        # Sin consultas por fila: solo la creación de DimFecha y los INSERT por lote
+        self.assertLess(len(consultas), 24000 / 20)
+
+        FactLoader(self.fuente).load(self.filas(delta=1.0))
+        self.assertEqual(HechosEconomicos.objects.count(), 24000)
+        hecho = HechosEconomicos.objects.get(id_pais__codigo_iso='P03', id_fecha__anio=2000, id_indicador__nombre_indicador='Crecimiento PIB')
+        self.assertAlmostEqual(float(hecho.valor), 24.0)
+        self.assertEqual(hecho.anio, hecho.id_fecha.anio)
+        self.assertGreater(loader.rows_per_second, 0)
+
+    def test_omite_paises_desconocidos(self):
+        loader = FactLoader(self.fuente)
+        loader.load([('XXX', 2000, 'Inflación', 1.0), ('P01', 2000, 'Inflación', 2.0)])
+        self.assertEqual(loader.rows, 1)
+        self.assertEqual(loader.skipped, 1)
+
+    def test_rollback_del_llamador_no_deja_fechas_inexistentes(self):
+        loader = FactLoader(self.fuente)
+        with self.assertRaises(DatabaseError), transaction.atomic():
+            with mock.patch.object(FactLoader, '_current_values', side_effect=DatabaseError('falla simulada')):
+                loader.load([('P01', 2000, 'Inflación', 1.0)])
+        self.assertFalse(DimFecha.objects.exists())
+        self.assertEqual(loader.fechas, {})
+        # La siguiente carga vuelve a crear la fecha
+        self.assertEqual(loader.load([('P02', 2000, 'Inflación', 2.0)]), 1)
+        self.assertEqual(HechosEconomicos.objects.get().id_fecha.anio, 2000)
+
+    def test_refresh_pivot_solo_claves_modificadas(self):
+        FactLoader(self.fuente).load([f for f in self.filas() if f[1] < 1965])
+        self.assertEqual(refresh_pivot(), 60 * 5)
+        fila = HechosPaisAnio.objects.get(codigo_iso='P03', anio=1962)
+        self.assertAlmostEqual(float(fila.inflacion), 22.62)
+        self.assertAlmostEqual(float(fila.ipc), 22.62)
+
+        loader = FactLoader(self.fuente)
+        loader.load([('P03', 1962, 'Inflación', 1.5), ('P03', 1965, 'IPC', 7.0)])
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(refresh_pivot(loader.touched), 2)
+        self.assertLess(len(consultas), 10)
+        self.assertEqual(HechosPaisAnio.objects.count(), 60 * 5 + 1)
+        fila = HechosPaisAnio.objects.get(codigo_iso='P03', anio=1962)
+        self.assertAlmostEqual(float(fila.inflacion), 1.5)
+        self.assertAlmostEqual(float(fila.pib_crecimiento), 22.62)
+        nueva = HechosPaisAnio.objects.get(codigo_iso='P03', anio=1965)
+        self.assertIsNone(nueva.inflacion)
+        self.assertAlmostEqual(float(nueva.ipc), 7.0)
+
+
+class CalendarioTests(TestCase):
+    def test_genera_solo_las_fechas_faltantes(self):
+        self.assertEqual(ensure_calendar(2000, 2001, 'mes'), 24)
+        self.assertEqual(ensure_calendar(2000, 2002, 'trimestre'), 12 - 8)
+        with self.assertNumQueries(1):
+            self.assertEqual(ensure_calendar(2000, 2001, 'mes'), 0)
+        self.assertEqual(DimFecha.objects.count(), 28)
+
+    def test_atributos_de_cada_fecha(self):
+        ensure_calendar(2020, 2021, 'dia')
+        self.assertEqual(DimFecha.objects.count(), 366 + 365)
+        for fecha in DimFecha.objects.filter(fecha_completa__in=[date(2020, 12, 31), date(2021, 1, 2)]):
+            d = fecha.fecha_completa
+            self.assertEqual(
+                (fecha.anio, fecha.mes, fecha.dia, fecha.trimestre, fecha.semana_del_anio, fecha.es_fin_de_semana, fecha.nombre_mes),
+                (d.year, d.month, d.day, (d.month - 1) // 3 + 1, d.isocalendar()[1], d.weekday() >= 5, d.strftime('%B')),
+            )
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class PopulateDwTests(TestCase):
+    def test_populate_dw_pide_rangos_por_indicador(self):
+        with FakeWorldBankAPI() as api:
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+
+        # 4 indicadores x 2 grupos de países (Chile con toda la historia, el resto con 10 años),
+        # más la metadata de los 30 países en una sola llamada
+        self.assertEqual(api.request_count, 8 + 1)
+        self.assertEqual(DimPais.objects.count(), 30)
+        self.assertTrue(HechosEconomicos.objects.filter(id_pais__codigo_iso='CHL', id_fecha__anio=1960).exists())
+        self.assertFalse(HechosEconomicos.objects.filter(id_pais__codigo_iso='ARG', id_fecha__anio=1960).exists())
+
+        anio = next(a for a in range(2000, 2020) if valor_sintetico('CHL', 'FP.CPI.TOTL.ZG', a) is not None)
+        hecho = HechosEconomicos.objects.get(id_pais__codigo_iso='CHL', id_fecha__anio=anio, id_indicador__nombre_indicador='Inflación')
+        self.assertAlmostEqual(float(hecho.valor), valor_sintetico('CHL', 'FP.CPI.TOTL.ZG', anio), places=4)
+
+    def test_populate_dw_informa_series_fallidas(self):
+        salida = StringIO()
+        with FakeWorldBankAPI(failing_codes={'FP.CPI.TOTL'}) as api:
+            call_command('populate_dw', api_url=api.base_url, retries=0, stdout=salida)
+
+        # Fallan las 2 llamadas de lote (Chile solo y los otros 29) y la de cada uno de los 29
+        self.assertIn('31 solicitudes fallidas (30 series sin datos)', salida.getvalue())
+        self.assertFalse(HechosEconomicos.objects.filter(id_indicador__nombre_indicador='IPC').exists())
+        self.assertTrue(HechosEconomicos.objects.filter(id_indicador__nombre_indicador='Inflación').exists())
+
+    def test_pais_rechazado_no_deja_sin_datos_a_su_lote(self):
+        salida = StringIO()
+        with FakeWorldBankAPI(invalid_isos={'ARG'}) as api:
+            call_command('populate_dw', api_url=api.base_url, retries=0, years='5', stdout=salida)
+
+        self.assertFalse(HechosEconomicos.objects.filter(id_pais__codigo_iso='ARG').exists())
+        self.assertEqual(
+            HechosEconomicos.objects.exclude(id_pais__codigo_iso='ARG').values('id_pais').distinct().count(), 29
+        )
+        self.assertIn('Sin datos de Inflación', salida.getvalue())
+        self.assertIn('para ARG:', salida.getvalue())
+        self.assertIn('(4 series sin datos)', salida.getvalue())
+
+    def test_error_inesperado_en_un_lote_queda_registrado(self):
+        extraer = EtlPipeline._extraer
+
+        def falla_ipc(pipeline, lote):
+            if lote.indicador == 'IPC':
+                raise RuntimeError('falla inesperada')
+            return extraer(pipeline, lote)
+
+        salida = StringIO()
+        with FakeWorldBankAPI() as api, mock.patch.object(EtlPipeline, '_extraer', falla_ipc):
+            call_command('populate_dw', api_url=api.base_url, years='3', stdout=salida)
+
+        self.assertIn('Sin datos de IPC', salida.getvalue())
+        self.assertIn('falla inesperada', salida.getvalue())
+        self.assertNotIn('completado exitosamente', salida.getvalue())
+        ejecucion = EtlRun.objects.get()
+        self.assertEqual(ejecucion.estado, 'con_errores')
+        self.assertFalse(HechosEconomicos.objects.filter(id_indicador__nombre_indicador='IPC').exists())
+        self.assertTrue(HechosEconomicos.objects.filter(id_indicador__nombre_indicador='Inflación').exists())
+
+    def test_opciones_numericas_menores_que_uno(self):
+        for nombre in ('workers', 'countries_per_call', 'batch_size', 'concurrency'):
+            with self.subTest(opcion=nombre), self.assertRaisesMessage(CommandError, 'debe ser al menos 1'):
+                call_command('populate_dw', **{nombre: 0}, stdout=StringIO())
+        self.assertFalse(EtlRun.objects.exists())
+
+    def test_sin_cambios_no_invalida_la_version_ni_regenera_exportaciones(self):
+        with FakeWorldBankAPI(min_year=2015) as api:
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+            salida = StringIO()
+            with mock.patch('dw_etl.management.commands.populate_dw.bump_data_version') as bump:
+                call_command('populate_dw', api_url=api.base_url, stdout=salida)
+
+        bump.assert_not_called()
+        self.assertIn('Sin cambios en los datos', salida.getvalue())
+        self.assertNotIn('Exportaciones pre-generadas', salida.getvalue())
+
+    def test_modo_incremental_solo_carga_series_modificadas(self):
+        with FakeWorldBankAPI() as api:
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+        self.assertEqual(MarcaAguaSerie.objects.count(), 30 * 4)
+        marca = MarcaAguaSerie.objects.get(id_pais__codigo_iso='CHL', id_indicador__nombre_indicador='Inflación')
+        self.assertIsNotNone(marca.ultimo_anio)
+        self.assertEqual(DimFuenteDatos.objects.get().fecha_ultima_actualizacion.isoformat(), '2025-07-01')
+
+        salida = StringIO()
+        with FakeWorldBankAPI() as api:
+            call_command('populate_dw', api_url=api.base_url, incremental=True, stdout=salida)
+        self.assertIn('Series sin cambios omitidas: 120', salida.getvalue())
+        self.assertIn('Carga completada: 0 hechos', salida.getvalue())
+        # Solo se piden los años de la ventana de revisión
+        self.assertFalse(any('date=1960:' in p for p in api.requested_paths))
+
+        def revisado(iso, wb_code, anio):
+            if (iso, wb_code, anio) == ('CHL', 'FP.CPI.TOTL.ZG', marca.ultimo_anio):
+                return 99.0
+            return valor_sintetico(iso, wb_code, anio)
+
+        salida = StringIO()
+        with FakeWorldBankAPI(value_fn=revisado) as api:
+            call_command('populate_dw', api_url=api.base_url, incremental=True, stdout=salida)
+        self.assertIn('Series sin cambios omitidas: 119', salida.getvalue())
+        hecho = HechosEconomicos.objects.get(id_pais__codigo_iso='CHL', id_fecha__anio=marca.ultimo_anio, id_indicador__nombre_indicador='Inflación')
+        self.assertEqual(float(hecho.valor), 99.0)
+
+    def test_seleccion_de_paises_indicadores_y_anios(self):
+        with FakeWorldBankAPI() as api:
+            call_command(
+                'populate_dw', api_url=api.base_url, countries=['chl', 'ARG'], indicators=['Inflación'],
+                years='2010:2014', workers=2, countries_per_call=1, stdout=StringIO(),
+            )
+
+        self.assertEqual(api.request_count, 2 + 1)
+        self.assertTrue(all('date=2010:2014' in p for p in api.requested_paths if '/indicator/' in p))
+        hechos = HechosEconomicos.objects.all()
+        self.assertEqual(set(hechos.values_list('id_pais__codigo_iso', flat=True)), {'CHL', 'ARG'})
+        self.assertEqual(set(hechos.values_list('id_indicador__nombre_indicador', flat=True)), {'Inflación'})
+        self.assertEqual((min(hechos.values_list('anio', flat=True)), max(hechos.values_list('anio', flat=True))), (2010, 2014))
+
+    def test_error_en_un_pais_no_afecta_a_los_demas(self):
+        # La falla ocurre dentro de la carga real, después de crear las fechas de la serie
+        leer_actuales = FactLoader._current_values
+
+        def current_values(loader, hechos):
+            if loader.paises['ARG'] in {hecho.id_pais_id for hecho in hechos}:
+                raise DatabaseError('falla simulada')
+            return leer_actuales(loader, hechos)
+
+        salida = StringIO()
+        with FakeWorldBankAPI() as api, mock.patch.object(FactLoader, '_current_values', current_values):
+            call_command(
+                'populate_dw', api_url=api.base_url, countries=['ARG', 'CHL', 'BRA'], indicators=['Inflación'], years='5',
+                countries_per_call=1, workers=1, stdout=salida,
+            )
+
+        self.assertIn('Error al procesar Inflación de ARG', salida.getvalue())
+        self.assertIn('1 series con errores', salida.getvalue())
+        self.assertFalse(HechosEconomicos.objects.filter(id_pais__codigo_iso='ARG').exists())
+        self.assertEqual(MarcaAguaSerie.objects.count(), 2)
+        self.assertEqual(set(HechosEconomicos.objects.values_list('id_pais__codigo_iso', flat=True)), {'CHL', 'BRA'})
+        self.assertEqual(DimFecha.objects.count(), 5)
+        self.assertFalse(MarcaAguaSerie.objects.filter(id_pais__codigo_iso='ARG').exists())
+        # Los contadores y las claves refrescadas son solo los de las series confirmadas
+        ejecucion = EtlRun.objects.get()
+        self.assertEqual(ejecucion.hechos_insertados, HechosEconomicos.objects.count())
+        self.assertIn(f'Carga completada: {HechosEconomicos.objects.count()} hechos', salida.getvalue())
+        self.assertEqual(set(HechosPaisAnio.objects.values_list('codigo_iso', flat=True)), {'CHL', 'BRA'})
+
+    def test_catalogo_configurable_y_dimensiones_a_demanda(self):
+        catalogo = {
+            'paises': [{'name': 'Uruguay', 'iso': 'ury', 'historical_years': 3}],
+            'indicadores': {'Desempleo': {'wb_code': 'SL.UEM.TOTL.ZS', 'unidad': '%'}},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / 'catalogo.json'
+            ruta.write_text(json.dumps(catalogo), encoding='utf-8')
+            salida = StringIO()
+            with FakeWorldBankAPI() as api:
+                call_command('populate_dw', api_url=api.base_url, catalog=str(ruta), stdout=salida)
+
+        self.assertIn('Indicadores sin columna en HechosPaisAnio: Desempleo.', salida.getvalue())
+        self.assertEqual(list(DimPais.objects.values_list('codigo_iso', flat=True)), ['URY'])
+        self.assertEqual(list(DimIndicadorEconomico.objects.values_list('nombre_indicador', flat=True)), ['Desempleo'])
+        hechos = HechosEconomicos.objects.all()
+        self.assertTrue(hechos.exists())
+        self.assertTrue(all(h.valor is not None for h in hechos))
+        # DimFecha solo tiene los años con datos
+        self.assertEqual(DimFecha.objects.count(), len(set(hechos.values_list('anio', flat=True))))
+
+    def test_indicador_mensual_con_promedio_anual_en_el_pivote(self):
+        catalogo = {
+            'paises': [{'name': 'Chile', 'iso': 'CHL', 'historical_years': 2}],
+            'indicadores': {'IPC': {'wb_code': 'FP.CPI.TOTL', 'unidad': 'Índice', 'frecuencia': 'mensual'}},
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / 'catalogo.json'
+            ruta.write_text(json.dumps(catalogo), encoding='utf-8')
+            # El valor de cada mes es su número ('2025M07' -> 7)
+            with FakeWorldBankAPI(value_fn=lambda iso, wb_code, periodo: float(str(periodo)[-2:])) as api:
+                call_command('populate_dw', api_url=api.base_url, catalog=str(ruta), stdout=StringIO())
+
+        self.assertEqual(DimIndicadorEconomico.objects.get().frecuencia, 'mensual')
+        self.assertEqual(HechosEconomicos.objects.count(), 24)
+        self.assertEqual(DimFecha.objects.filter(dia=1).values('mes').distinct().count(), 12)
+        julio = HechosEconomicos.objects.get(id_fecha__mes=7, anio=global_max_year())
+        self.assertEqual(julio.valor, 7)
+        # El pivote anual guarda el promedio de los meses
+        self.assertEqual(set(HechosPaisAnio.objects.values_list('ipc', flat=True)), {Decimal('6.5')})
+
+    def test_metadata_de_paises_y_agregados_por_grupo(self):
+        with FakeWorldBankAPI(min_year=2015) as api:
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+        chile = DimPais.objects.get(codigo_iso='CHL')
+        esperado = pais_sintetico('CHL')
+        self.assertEqual((chile.region, chile.grupo_ingresos), (esperado['region']['value'].strip(), esperado['incomeLevel']['value']))
+
+        anio = 2020
+        inflacion = {
+            fila.codigo_iso: fila.inflacion
+            for fila in HechosPaisAnio.objects.filter(anio=anio, inflacion__isnull=False).select_related('id_pais')
+        }
+        total = HechosGrupoAnio.objects.get(agrupacion='mundo', anio=anio, id_indicador__nombre_indicador='Inflación')
+        self.assertEqual(total.cantidad, len(inflacion))
+        self.assertAlmostEqual(float(total.minimo), float(min(inflacion.values())), places=4)
+        self.assertEqual(total.id_pais_minimo.codigo_iso, min(inflacion, key=inflacion.get))
+        regiones = HechosGrupoAnio.objects.filter(agrupacion='region', anio=anio, id_indicador__nombre_indicador='Inflación')
+        self.assertEqual(sum(r.cantidad for r in regiones), len(inflacion))
+        region = regiones.get(grupo=chile.region)
+        valores = sorted(float(v) for iso, v in inflacion.items() if DimPais.objects.get(codigo_iso=iso).region == chile.region)
+        self.assertAlmostEqual(float(region.mediana), median(valores), places=4)
+
+        # Con la metadata ya cargada no se vuelve a pedir, y solo se recalculan los años cargados
+        otro_anio = HechosGrupoAnio.objects.filter(anio=2016).values_list('pk', flat=True).first()
+        with FakeWorldBankAPI(min_year=2015) as api:
+            call_command('populate_dw', api_url=api.base_url, countries=['CHL'], years='2020:2020', stdout=StringIO())
+        self.assertFalse(any('/indicator/' not in p for p in api.requested_paths))
+        self.assertTrue(HechosGrupoAnio.objects.filter(pk=otro_anio).exists())
+        recalculado = HechosGrupoAnio.objects.get(agrupacion='mundo', anio=anio, id_indicador__nombre_indicador='Inflación')
+        self.assertEqual(recalculado.minimo, total.minimo)
+
+    def test_replay_reconstruye_desde_la_cache_sin_red(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_path = str(Path(tmp) / 'cache.sqlite3')
+            with FakeWorldBankAPI() as api:
+                api_url = api.base_url
+                call_command('populate_dw', api_url=api_url, cache=True, cache_path=cache_path, stdout=StringIO())
+            total = HechosEconomicos.objects.count()
+            HechosEconomicos.objects.all().delete()
+
+            # El servidor ya no existe: todo debe salir de la caché
+            salida = StringIO()
+            call_command('populate_dw', api_url=api_url, replay=True, cache_path=cache_path, retries=0, stdout=salida)
+
+        self.assertIn('0 solicitudes HTTP', salida.getvalue())
+        self.assertIn('8 respuestas desde caché', salida.getvalue())
+        self.assertEqual(HechosEconomicos.objects.count(), total)
+
+    def test_la_cache_se_cierra_si_la_ejecucion_falla(self):
+        with tempfile.TemporaryDirectory() as tmp, FakeWorldBankAPI() as api:
+            with mock.patch.object(ResponseCache, 'close', autospec=True, side_effect=ResponseCache.close) as close, \
+                    mock.patch('dw_etl.management.commands.populate_dw.EtlPipeline.run', side_effect=RuntimeError('falla')):
+                with self.assertRaises(RuntimeError):
+                    call_command(
+                        'populate_dw', api_url=api.base_url, cache=True, cache_path=str(Path(tmp) / 'cache.sqlite3'),
+                        stdout=StringIO(),
+                    )
+        close.assert_called_once()
+
+
+    def test_telemetria_de_cada_ejecucion(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            resumen_path = Path(tmp) / 'resumen.json'
+            perfil_path = Path(tmp) / 'etl.prof'
+            with FakeWorldBankAPI() as api:
+                call_command('populate_dw', api_url=api.base_url, summary_json=str(resumen_path), profile=str(perfil_path), stdout=StringIO())
+            resumen = json.loads(resumen_path.read_text(encoding='utf-8'))
+            self.assertTrue(perfil_path.stat().st_size > 0)
+
+        primera = EtlRun.objects.get()
+        self.assertEqual(resumen['id'], primera.pk)
+        self.assertEqual(resumen['estado'], 'exitoso')
+        self.assertEqual((primera.solicitudes, primera.respuestas_cache, primera.errores), (8 + 1, 0, 0))
+        self.assertGreater(primera.bytes_descargados, 0)
+        self.assertEqual(primera.hechos_insertados, HechosEconomicos.objects.count())
+        self.assertEqual(primera.hechos_actualizados + primera.hechos_sin_cambios, 0)
+        self.assertTrue({'extraccion', 'transformacion', 'carga', 'pipeline', 'pivote', 'agregados', 'crisis', 'exportaciones'} <= primera.tiempos.keys())
+        self.assertTrue(all(artifact_path(formato, {}).is_file() for formato, _ in settings.EXPORT_PREBUILD))
+        self.assertEqual(primera.parametros['retries'], 4)
+
+        # La misma carga otra vez no escribe hechos; un valor revisado es una actualización
+        def revisado(iso, wb_code, anio):
+            return 99.0 if (iso, wb_code, anio) == ('CHL', 'FP.CPI.TOTL.ZG', 2020) else valor_sintetico(iso, wb_code, anio)
+
+        with FakeWorldBankAPI(value_fn=revisado) as api:
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+        segunda = EtlRun.objects.order_by('-inicio').first()
+        self.assertEqual((segunda.hechos_insertados, segunda.hechos_actualizados), (0, 1))
+        self.assertEqual(segunda.hechos_sin_cambios, primera.hechos_insertados - 1)
+
+        # Una ejecución interrumpida queda registrada como fallida
+        with self.assertRaises(CommandError):
+            call_command('populate_dw', indicators=['Desconocido'], stdout=StringIO())
+        fallida = EtlRun.objects.order_by('-inicio').first()
+        self.assertEqual((fallida.estado, fallida.errores), ('fallido', 1))
+
+        datos = self.client.get(reverse('api_etl'), {'limite': 2}).json()
+        self.assertEqual([e['id'] for e in datos['ejecuciones']], [fallida.pk, segunda.pk])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ExportTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        generate_warehouse(paises=3, anios=5, start_year=2000)
+
+    def test_export_excel_streaming(self):
+        response = self.client.get(reverse('export_excel'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('datos_economicos_historicos.xlsx', response['Content-Disposition'])
+
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        filas = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(filas[0][:3], ('Año', 'País', 'Código ISO'))
+        self.assertEqual(len(filas), 1 + 3 * 5)
+        self.assertEqual(filas[1][:3], (2000, 'País 0000', 'A00'))
+        self.assertTrue(all(isinstance(v, (int, float)) for v in filas[1][3:]))
+
+    def test_export_json_streaming(self):
+        response = self.client.get(reverse('export_json'))
+        self.assertTrue(response.streaming)
+        filas = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(filas), 3 * 5)
+        self.assertEqual(
+            set(filas[0]),
+            {'anio', 'pais', 'codigo_iso', 'inflacion', 'crecimiento_pib', 'tipo_cambio_usd_local', 'ipc'},
+        )
+
+    def test_export_ndjson_con_filtros_y_gzip(self):
+        response = self.client.get(reverse('export_json'), {
+            'formato': 'ndjson', 'pais': 'A01,a02', 'desde': 2001, 'hasta': 2002, 'indicador': 'IPC', 'gzip': '1',
+        })
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lineas = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        filas = [json.loads(linea) for linea in lineas]
+        self.assertEqual({(f['codigo_iso'], f['anio']) for f in filas}, {('A01', 2001), ('A01', 2002), ('A02', 2001), ('A02', 2002)})
+        self.assertTrue(all(f['inflacion'] is None and f['ipc'] is not None for f in filas))
+
+    def test_export_json_filtro_invalido(self):
+        response = self.client.get(reverse('export_json'), {'desde': 'dos mil'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_parquet_tipado(self):
+        import pyarrow.parquet as pq
+
+        response = self.client.get(reverse('export_parquet'))
+        self.assertEqual(response.status_code, 200)
+        tabla = pq.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tabla.num_rows, 3 * 5)
+        self.assertEqual(str(tabla.schema.field('inflacion').type), 'double')
+        self.assertEqual(str(tabla.schema.field('anio').type), 'int32')
+
+    def test_export_parquet_ancho_con_filtro_de_indicador_y_etag(self):
+        import pyarrow.parquet as pq
+
+        response = self.client.get(reverse('export_parquet'), {'indicador': 'IPC'})
+        tabla = pq.read_table(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tabla.column_names, ['anio', 'pais', 'codigo_iso', 'ipc'])
+        condicional = self.client.get(reverse('export_parquet'), {'indicador': 'IPC'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(condicional.status_code, 304)
+        self.assertNotEqual(self.client.get(reverse('export_arrow'), {'indicador': 'IPC'})['ETag'], response['ETag'])
+
+    def test_export_columnar_particionado(self):
+        import pyarrow.dataset as ds
+
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('export_columnar', tmp, format='arrow', layout='long', partition_by='anio', stdout=StringIO())
+            self.assertTrue((Path(tmp) / 'anio=2000').is_dir())
+            tabla = ds.dataset(tmp, format='ipc', partitioning='hive').to_table()
+        self.assertEqual(tabla.num_rows, 3 * 5 * 4)
+
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class ArtifactTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        generate_warehouse(paises=3, anios=5, start_year=2000)
+
+    @override_settings(EXPORT_PREBUILD=[('xlsx', {'pais': ['A01', 'A02'], 'desde': 2003})])
+    def test_excel_y_csv_se_sirven_desde_disco(self):
+        response = self.client.get(reverse('export_excel'), {'pais': 'A01,a02', 'desde': 2003})
+        contenido = b''.join(response.streaming_content)
+        self.assertEqual(artifact_path('xlsx', {'pais': ['A01', 'A02'], 'desde': 2003}).read_bytes(), contenido)
+        self.assertEqual(len(list(load_workbook(BytesIO(contenido), read_only=True).active.iter_rows())), 1 + 2 * 2)
+
+        # Los mismos filtros en otro orden: el mismo archivo, sin consultas
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('export_excel'), {'desde': '2003', 'pais': ['A02', 'A01']})
+            self.assertEqual(b''.join(response.streaming_content), contenido)
+            condicional = self.client.get(
+                reverse('export_excel'), {'desde': '2003', 'pais': ['A02', 'A01']}, HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(condicional.status_code, 304)
+
+    def test_filtros_a_pedido_no_se_guardan(self):
+        response = self.client.get(reverse('export_csv'), {'indicador': 'IPC', 'desde': 2004})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        filas = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(filas[0], ['anio', 'pais', 'codigo_iso', 'inflacion', 'crecimiento_pib', 'tipo_cambio_usd_local', 'ipc'])
+        self.assertEqual(len(filas), 1 + 3)
+        self.assertTrue(all(fila[3] == '' and fila[6] != '' for fila in filas[1:]))
+
+        with self.captureOnCommitCallbacks() as encargos:
+            b''.join(self.client.get(reverse('export_json'), {'pais': 'A00'}).streaming_content)
+        self.assertEqual(encargos, [])
+        self.assertFalse(artifact_path('csv', {'indicador': ['IPC'], 'desde': 2004}).parent.exists())
+
+    @override_settings(EXPORT_WORKERS=1)
+    def test_json_en_streaming_hasta_que_existe_el_archivo(self):
+        with self.captureOnCommitCallbacks() as encargos:
+            response = self.client.get(reverse('export_json'))
+            en_vivo = b''.join(response.streaming_content)
+        self.assertNotIsInstance(response, FileResponse)
+        self.assertEqual(len(encargos), 1)
+
+        build_artifact('json', {})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('export_json'))
+            self.assertIsInstance(response, FileResponse)
+            self.assertEqual(b''.join(response.streaming_content), en_vivo)
+
+    def test_artefactos_siguen_disponibles_sin_la_cache(self):
+        call_command('build_exports', stdout=StringIO())
+        cache.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('export_csv'))
+            self.assertIsInstance(response, FileResponse)
+            self.assertEqual(b''.join(response.streaming_content), artifact_path('csv', {}).read_bytes())
+
+    def test_sendfile(self):
+        with override_settings(EXPORT_SENDFILE='X-Accel-Redirect'):
+            response = self.client.get(reverse('export_excel'))
+        ruta = artifact_path('xlsx', {})
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Accel-Redirect'], f'/exportaciones-internas/{ruta.parent.name}/{ruta.name}')
+        with override_settings(EXPORT_SENDFILE='X-Sendfile'):
+            self.assertEqual(self.client.get(reverse('export_excel'))['X-Sendfile'], str(ruta))
+
+    def test_build_exports_y_versiones_anteriores(self):
+        call_command('build_exports', format=['csv'], pais=['A00'], stdout=StringIO())
+        anterior = artifact_path('csv', {'pais': ['A00']})
+        self.assertTrue(anterior.is_file())
+
+        # Una carga nueva cambia la versión: el archivo anterior ya no se usa y se borra
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version()
+        self.assertNotEqual(artifact_path('csv', {'pais': ['A00']}), anterior)
+        call_command('build_exports', stdout=StringIO())
+        self.assertFalse(anterior.parent.exists())
+        self.assertTrue(all(artifact_path(formato, {}).is_file() for formato, _ in settings.EXPORT_PREBUILD))
+
+    def test_pedidos_repetidos_comparten_la_generacion(self):
+        liberar = threading.Event()
+        llamadas = []
+
+        def construir(formato, filtros, version):
+            llamadas.append(formato)
+            liberar.wait(5)
+            return formato
+
+        constructor = ArtifactBuilder(max_workers=2, construir=construir)
+        primero, repetido, otro = constructor.submit('csv', {}), constructor.submit('csv', {}), constructor.submit('json', {})
+        liberar.set()
+        self.assertIs(primero, repetido)
+        self.assertEqual((primero.result(), otro.result()), ('csv', 'json'))
+        constructor.shutdown()
+        self.assertEqual(sorted(llamadas), ['csv', 'json'])
+
+async def _leer(response):
+    return b''.join([bloque async for bloque in response.streaming_content])
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class AsyncExportTests(TransactionTestCase):
+    # Las exportaciones por ASGI generan los archivos en hilos con su propia conexión,
+    # que solo ven datos confirmados
+    def setUp(self):
+        generate_warehouse(paises=3, anios=5, start_year=2000)
+
+    async def test_json_y_series_con_aiterator(self):
+        response = await self.async_client.get(reverse('export_json'))
+        self.assertTrue(response.is_async)
+        filas = json.loads(await _leer(response))
+        esperadas = await sync_to_async(lambda: list(iter_json_rows()))()
+        self.assertEqual(filas, json.loads(json.dumps(esperadas)))
+
+        response = await self.async_client.get(reverse('export_json'), {'formato': 'ndjson', 'pais': 'A01', 'gzip': '1'})
+        lineas = gzip.decompress(await _leer(response)).decode().splitlines()
+        self.assertEqual({json.loads(linea)['codigo_iso'] for linea in lineas}, {'A01'})
+        self.assertEqual(len(lineas), 5)
+
+        datos = (await self.async_client.get(reverse('api_series'), {'pais': 'A00', 'indicador': 'IPC'})).json()
+        self.assertEqual(datos['anios'], list(range(2000, 2005)))
+        self.assertEqual([s['codigo_iso'] for s in datos['series']], ['A00'])
+
+    async def test_archivos_generados_fuera_del_event_loop(self):
+        import pyarrow.parquet as pq
+
+        response = await self.async_client.get(reverse('export_excel'))
+        self.assertTrue(response.is_async)
+        contenido = await _leer(response)
+        self.assertEqual(int(response['Content-Length']), len(contenido))
+        self.assertIn('datos_economicos_historicos.xlsx', response['Content-Disposition'])
+        self.assertEqual(len(list(load_workbook(BytesIO(contenido), read_only=True).active.iter_rows())), 1 + 3 * 5)
+
+        response = await self.async_client.get(reverse('export_parquet'))
+        self.assertEqual(pq.read_table(BytesIO(await _leer(response))).num_rows, 3 * 5)
+
+    async def test_instrumentacion_cuenta_las_consultas_async(self):
+        with self.assertLogs('dw_etl.instrumentation', 'INFO') as logs:
+            contenido = await _leer(await self.async_client.get(reverse('export_json')))
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['vista'], registro['consultas'], registro['bytes']), ('export_json', 1, len(contenido)))
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_clientes_lentos_simultaneos(self):
+        resultado = run_concurrent('/export/json/', 8, demora=0.05)
+        self.assertEqual(resultado.errores, 0)
+        self.assertEqual(resultado.bytes, 8 * len(json.dumps(list(iter_json_rows()), ensure_ascii=False, separators=(',', ':')).encode()))
+        # Las descargas se atienden a la vez, no una detrás de otra
+        self.assertLess(resultado.segundos, resultado.segundos_un_cliente * 4)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+
+    def test_visitas_repetidas_sin_consultas_e_invalidacion_por_etl(self):
+        with FakeWorldBankAPI(min_year=2015) as api, self.captureOnCommitCallbacks(execute=True):
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+
+        response = self.client.get(reverse('dashboard'), {'year': 2020})
+        self.assertEqual(response.status_code, 200)
+        with CaptureQueriesContext(connection) as consultas:
+            repetida = self.client.get(reverse('dashboard'), {'year': 2020})
+        self.assertEqual(len(consultas), 0)
+        self.assertEqual(repetida.content, response.content)
+
+        # Una nueva carga cambia los datos e invalida la página cacheada
+        with FakeWorldBankAPI(min_year=2015, value_fn=lambda iso, wb_code, anio: 123.45) as api, \
+                self.captureOnCommitCallbacks(execute=True):
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+        self.assertContains(self.client.get(reverse('dashboard'), {'year': 2020}), '123,4500')
+
+    def test_clave_por_anio_mostrado_y_version_fuera_de_la_cache(self):
+        with FakeWorldBankAPI(min_year=2015) as api, self.captureOnCommitCallbacks(execute=True):
+            call_command('populate_dw', api_url=api.base_url, stdout=StringIO())
+        ultimo = self.client.get(reverse('dashboard')).content
+
+        # Años inválidos o sin datos muestran el más reciente desde la misma entrada de la caché
+        with CaptureQueriesContext(connection) as consultas:
+            for year in ('abc', '1234', '', global_max_year()):
+                self.assertEqual(self.client.get(reverse('dashboard'), {'year': year}).content, ultimo)
+        self.assertEqual(len(consultas), 0)
+
+        # Vaciar (o desalojar) la caché no cambia la versión de los datos
+        version = data_version()
+        cache.clear()
+        self.assertEqual(data_version(), version)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class SeriesApiTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        generate_warehouse(paises=3, anios=5, start_year=2000)
+
+    def test_series_alineadas_en_una_consulta(self):
+        HechosPaisAnio.objects.filter(codigo_iso='A01', anio=2002).delete()
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_series'), {'pais': 'A00,A01', 'indicador': 'Inflación', 'desde': 2001})
+        datos = response.json()
+        self.assertEqual(datos['anios'], [2001, 2002, 2003, 2004])
+        self.assertEqual([(s['codigo_iso'], s['indicador']) for s in datos['series']], [('A00', 'inflacion'), ('A01', 'inflacion')])
+        self.assertIsNone(datos['series'][1]['valores'][1])
+        self.assertAlmostEqual(datos['series'][0]['valores'][0], valor_sintetico('A00', 'Inflación', 2001), places=4)
+
+    def test_indicador_sin_columna_en_el_pivote_es_un_error(self):
+        response = self.client.get(reverse('api_series'), {'indicador': 'Desempleo'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Desempleo', response.json()['error'])
+        self.assertEqual(self.client.get(reverse('export_csv'), {'indicador': 'Desempleo'}).status_code, 400)
+
+    def test_get_condicional_con_etag(self):
+        response = self.client.get(reverse('api_series'), {'pais': 'A00'})
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            repetida = self.client.get(reverse('api_series'), {'pais': 'A00'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repetida.status_code, 304)
+
+        # Otros parámetros u otra versión de los datos cambian el ETag
+        self.assertNotEqual(self.client.get(reverse('api_series'), {'pais': 'A01'})['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version()
+        self.assertEqual(self.client.get(reverse('api_series'), {'pais': 'A00'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        generate_warehouse(paises=8, anios=6, start_year=2000)
+
+    def test_ranking_de_todos_los_anios_e_indicadores_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_analitica'), {'top': 3, 'orden': 'desc'})
+        filas = response.json()['filas']
+        self.assertEqual(len(filas), 3 * 6 * 4)
+
+        primeros = [f for f in filas if f['indicador'] == 'Inflación' and f['anio'] == 2003]
+        esperado = sorted(
+            ((valor_sintetico(iso, 'Inflación', 2003) or 0.0, iso) for iso in ('A00', 'A01', 'A02', 'A03', 'A04', 'A05', 'A06', 'A07')),
+            reverse=True,
+        )[:3]
+        self.assertEqual([(f['puesto'], f['codigo_iso']) for f in primeros], [(1, esperado[0][1]), (2, esperado[1][1]), (3, esperado[2][1])])
+        self.assertEqual(primeros[0]['percentil'], 1.0)
+
+    def test_variacion_interanual_y_media_movil(self):
+        response = self.client.get(reverse('api_analitica'), {'tipo': 'series', 'ventana': 2, 'pais': 'A01', 'indicador': 'IPC'})
+        filas = response.json()['filas']
+        valores = [valor_sintetico('A01', 'IPC', anio) or 0.0 for anio in range(2000, 2006)]
+        self.assertEqual([f['anio'] for f in filas], list(range(2000, 2006)))
+        self.assertIsNone(filas[0]['variacion'])
+        self.assertAlmostEqual(filas[3]['variacion'], valores[3] - valores[2], places=4)
+        self.assertAlmostEqual(filas[3]['media_movil'], (valores[3] + valores[2]) / 2, places=4)
+
+        self.assertEqual(self.client.get(reverse('api_analitica'), {'tipo': 'series', 'ventana': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_analitica'), {'orden': 'x'}).status_code, 400)
+
+
+@override_settings(CACHES=CACHE_LOCAL, CRISIS_UMBRAL_DEVALUACION=20.0, CRISIS_ANIOS_RECESION=1, CRISIS_MARGEN_ANIOS=1)
+class CrisisTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        # Tipo de cambio y crecimiento del PIB por año
+        series = {
+            # Devaluación de 50% el año anterior a una recesión de dos años
+            'ARG': {2000: (1.0, 2.0), 2001: (1.5, 1.0), 2002: (1.6, -3.0), 2003: (1.7, -1.0), 2004: (1.7, 4.0)},
+            # Recesión sin devaluación fuerte, y devaluación fuerte sin recesión
+            'CHL': {2000: (500, 3.0), 2001: (520, -1.0), 2002: (530, 2.0), 2003: (800, 1.0)},
+            # Devaluación en la misma recesión, pero con un año sin dato antes
+            'BRA': {2000: (2.0, 1.0), 2002: (3.0, -2.0), 2003: (4.0, -1.0)},
+        }
+        for iso, valores in series.items():
+            pais = DimPais.objects.create(codigo_iso=iso, nombre_pais=iso)
+            HechosPaisAnio.objects.bulk_create(
+                HechosPaisAnio(anio=anio, id_pais=pais, nombre_pais=iso, codigo_iso=iso, tipo_cambio=tc, pib_crecimiento=pib)
+                for anio, (tc, pib) in valores.items()
+            )
+
+    def test_detecta_episodios_con_margen_y_tramos(self):
+        salida = StringIO()
+        call_command('detect_crisis', stdout=salida)
+        self.assertIn('2 episodios', salida.getvalue())
+
+        episodios = {e.id_pais.codigo_iso: e for e in EpisodioCrisis.objects.select_related('id_pais')}
+        self.assertEqual(set(episodios), {'ARG', 'BRA'})
+        arg = episodios['ARG']
+        self.assertEqual((arg.anio_inicio, arg.anio_fin, arg.duracion, arg.anio_devaluacion), (2002, 2003, 2, 2001))
+        self.assertAlmostEqual(float(arg.devaluacion_maxima), 50.0)
+        self.assertAlmostEqual(float(arg.crecimiento_minimo), -3.0)
+        # 2002 no es consecutivo con 2000: la devaluación de Brasil cuenta desde 2003
+        bra = episodios['BRA']
+        self.assertEqual((bra.anio_inicio, bra.anio_fin, bra.anio_devaluacion), (2002, 2003, 2003))
+
+        # Sin margen, la devaluación de Argentina del año anterior ya no cuenta
+        call_command('detect_crisis', margen_anios=0, stdout=StringIO())
+        self.assertEqual(list(EpisodioCrisis.objects.values_list('id_pais__codigo_iso', flat=True)), ['BRA'])
+
+    def test_cambio_de_umbrales_invalida_etag_y_dashboard(self):
+        for nombre in ('Inflación', 'Crecimiento PIB', 'Tipo de Cambio Dólar', 'IPC'):
+            DimIndicadorEconomico.objects.create(nombre_indicador=nombre)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('detect_crisis', stdout=StringIO())
+        etag = self.client.get(reverse('api_crisis'))['ETag']
+        self.assertContains(self.client.get(reverse('dashboard')), 'ARG')
+        with self.assertNumQueries(0):
+            self.client.get(reverse('dashboard'))
+
+        # Los mismos umbrales no cambian la tabla ni la versión
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('detect_crisis', stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('api_crisis'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('detect_crisis', margen_anios=0, stdout=StringIO())
+        self.assertEqual(self.client.get(reverse('api_crisis'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(reverse('dashboard'))
+        self.assertGreater(len(consultas), 0)
+
+    def test_api_con_episodios_guardados_y_umbrales_al_vuelo(self):
+        call_command('detect_crisis', stdout=StringIO())
+        datos = self.client.get(reverse('api_crisis'), {'pais': 'arg'}).json()
+        self.assertEqual([e['codigo_iso'] for e in datos['episodios']], ['ARG'])
+        self.assertEqual(datos['umbrales']['margen_anios'], 1)
+
+        # Otros umbrales se calculan al vuelo y no modifican la tabla
+        datos = self.client.get(reverse('api_crisis'), {'umbral': 40, 'anios': 2}).json()
+        self.assertEqual([e['codigo_iso'] for e in datos['episodios']], ['ARG'])
+        self.assertEqual(EpisodioCrisis.objects.count(), 2)
+        self.assertEqual(self.client.get(reverse('api_crisis'), {'anios': 'x'}).status_code, 400)
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class CorrelationTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        generate_warehouse(paises=4, anios=12, start_year=2000)
+
+    def serie(self, iso, columna):
+        return [float(v) for v in HechosPaisAnio.objects.filter(codigo_iso=iso).order_by('anio').values_list(columna, flat=True)]
+
+    def test_matrices_por_pais_globales_y_con_rezago(self):
+        datos = self.client.get(reverse('api_correlaciones'), {'rezagos': 2, 'pais': 'A01'}).json()
+        self.assertEqual([p['codigo_iso'] for p in datos['paises']], ['A01'])
+        i, j = datos['variables'].index('inflacion'), datos['variables'].index('crecimiento_pib')
+        inflacion, pib = self.serie('A01', 'inflacion'), self.serie('A01', 'pib_crecimiento')
+        matrices = datos['paises'][0]['matrices']
+        self.assertAlmostEqual(matrices['0'][i][j], np.corrcoef(inflacion, pib)[0, 1], places=4)
+        self.assertAlmostEqual(matrices['2'][i][j], np.corrcoef(inflacion[:-2], pib[2:])[0, 1], places=4)
+        self.assertEqual(matrices['0'][i][i], 1.0)
+
+        # Entre países: todos los pares (país, año) juntos
+        todos = [(self.serie(iso, 'inflacion'), self.serie(iso, 'pib_crecimiento')) for iso in ('A00', 'A01', 'A02', 'A03')]
+        x = [v for serie, _ in todos for v in serie]
+        y = [v for _, serie in todos for v in serie]
+        self.assertAlmostEqual(datos['global']['0'][i][j], np.corrcoef(x, y)[0, 1], places=4)
+
+        # La variación del tipo de cambio se deriva de la serie: su primer año no tiene dato
+        k = datos['variables'].index('variacion_tipo_cambio')
+        tipo_cambio = self.serie('A01', 'tipo_cambio')
+        pares = [((b / a - 1) * 100, g) for a, b, g in zip(tipo_cambio, tipo_cambio[1:], pib[1:]) if a != 0]
+        self.assertAlmostEqual(matrices['0'][k][j], np.corrcoef(*zip(*pares))[0, 1], places=4)
+
+    def test_resultado_cacheado_hasta_la_siguiente_carga(self):
+        self.client.get(reverse('api_correlaciones'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(reverse('api_correlaciones'), {'pais': 'A00'}).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_data_version()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api_correlaciones'))
+        self.assertEqual(self.client.get(reverse('api_correlaciones'), {'rezagos': 11}).status_code, 400)
+
+    def test_ranking_de_pares_separa_por_signo(self):
+        i, j = VARIABLES.index('variacion_tipo_cambio'), VARIABLES.index('crecimiento_pib')
+
+        def pais(iso, r):
+            matriz = [[None] * len(VARIABLES) for _ in VARIABLES]
+            matriz[i][j] = r
+            return {'codigo_iso': iso, 'pais': iso, 'matrices': {0: matriz}}
+
+        resultado = {'paises': [pais('A00', -0.5), pais('A01', 0.2), pais('A02', 0.7), pais('A03', None)]}
+        negativas, positivas = pair_ranking(resultado, 'variacion_tipo_cambio', 'crecimiento_pib', top=5)
+        self.assertEqual([v['codigo_iso'] for v in negativas], ['A00'])
+        self.assertEqual([v['codigo_iso'] for v in positivas], ['A02', 'A01'])
+
+
+
+@override_settings(CACHES=CACHE_LOCAL)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        registry.reset()
+        generate_warehouse(paises=8, anios=6, start_year=2000)
+        run_detection()
+
+    def test_presupuesto_de_consultas_por_vista(self):
+        # Con más países la cantidad de consultas no cambia: no hay consultas por fila
+        solicitudes = [(nombre, {}) for nombre in settings.VIEW_QUERY_BUDGETS] + [
+            ('api_series', {'pais': 'A00,A01', 'desde': 2001}),
+            ('api_analitica', {'tipo': 'series'}),
+            ('api_crisis', {'umbral': 5}),
+            ('export_json', {'formato': 'ndjson'}),
+        ]
+        for nombre, parametros in solicitudes:
+            limpiar_cache()
+            with self.subTest(vista=nombre, parametros=parametros), instrument() as metricas:
+                response = self.client.get(reverse(nombre), parametros)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(metricas.consultas, query_budget(nombre))
+
+    def test_cabeceras_log_y_metricas(self):
+        with self.assertLogs('dw_etl.instrumentation', 'INFO') as logs:
+            response = self.client.get(reverse('api_series'))
+        self.assertEqual(int(response['X-Response-Bytes']), len(response.content))
+        self.assertEqual(response['X-DB-Queries'], '1')
+        self.assertEqual(response['X-Query-Budget'], '2')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+, ser;dur=[\d.]+, total;dur=[\d.]+$')
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['vista'], registro['estado'], registro['consultas']), ('api_series', 200, 1))
+
+        # Streaming: el log se escribe al terminar el envío, con el tamaño real
+        with self.assertLogs('dw_etl.instrumentation', 'INFO') as logs:
+            contenido = b''.join(self.client.get(reverse('export_json')).streaming_content)
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual((registro['bytes'], registro['consultas']), (len(contenido), 1))
+
+        with override_settings(VIEW_QUERY_BUDGETS={'api_crisis': 0}), self.assertLogs('dw_etl.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('api_crisis'))
+        self.assertEqual(json.loads(logs.records[0].getMessage())['presupuesto_consultas'], 0)
+
+        metricas = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('dw_http_requests_total{view="api_series"} 1', metricas)
+        self.assertIn('dw_db_queries_total{view="export_json"} 1', metricas)
+        self.assertIn('dw_http_over_query_budget_total{view="api_crisis"} 1', metricas)
+
+
+class BenchmarkBaselineTests(TestCase):
+    def test_compara_contra_la_linea_base(self):
+        base = {'json': {25: Medicion(1000, 1.0, 3, 2**20)}}
+        with tempfile.TemporaryDirectory() as tmp:
+            ruta = Path(tmp) / 'baseline.json'
+            save_baseline(ruta, base)
+            base = load_baseline(ruta)
+
+        # Dentro de la tolerancia, o sin base para comparar: sin regresiones
+        self.assertEqual(compare({'json': {25: Medicion(1000, 1.2, 3, 2**20)}, 'excel': {25: Medicion(1, 9.0, 9, 0)}}, base), [])
+        regresiones = compare({'json': {25: Medicion(1000, 1.5, 4, 2**30)}}, base)
+        self.assertEqual(len(regresiones), 3)
+        self.assertTrue(all(r.startswith('json (25 países)') for r in regresiones))
+
+    def test_compare_sin_linea_base_falla(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaisesMessage(CommandError, 'No existe la línea base'):
+                call_command('benchmark', 'crisis', compare=str(Path(tmp) / 'baseline.json'), stdout=StringIO())
 
-# Create your tests here.
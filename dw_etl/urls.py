@@ -7,5 +7,14 @@ urlpatterns = [
     path('dashboard/', views.dashboard_view, name='dashboard'),
     path('', views.dashboard_view, name='home'),
     path('export/excel/', views.export_economic_data_excel, name='export_excel'),
+    path('export/csv/', views.export_economic_data_csv, name='export_csv'),
     path('export/json/', views.export_economic_data_json, name='export_json'), # Nueva URL para JSON
+    path('export/parquet/', views.export_economic_data_columnar, {'formato': 'parquet'}, name='export_parquet'),
+    path('export/arrow/', views.export_economic_data_columnar, {'formato': 'arrow'}, name='export_arrow'),
+    path('api/series/', views.time_series_api, name='api_series'),
+    path('api/analitica/', views.analytics_api, name='api_analitica'),
+    path('api/crisis/', views.crisis_api, name='api_crisis'),
+    path('api/correlaciones/', views.correlation_api, name='api_correlaciones'),
+    path('api/etl/', views.etl_runs_api, name='api_etl'),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
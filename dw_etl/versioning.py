@@ -0,0 +1,72 @@
+# dw_etl/versioning.py
+"""
+Versión de los datos del DW, guardada en un archivo (DATA_VERSION_PATH).
+
+Las entradas cacheadas que dependen de los datos (dashboard, respuestas de la API) y
+las exportaciones pre-generadas incluyen la versión en su clave o su ruta. El ETL la
+incrementa al terminar una carga, así que las entradas anteriores dejan de usarse sin
+tener que borrarlas una por una.
+
+La versión no se guarda en la caché de Django: esa caché desaloja entradas cuando se
+llena, y perder la versión invalidaría todo lo cacheado y dejaría inalcanzables las
+exportaciones pre-generadas.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+
+def _escribir(version, reemplazar):
+    """
+    Escribe la versión de forma atómica (un archivo temporal que se renombra o se
+    enlaza). Sin `reemplazar`, no hace nada y devuelve False si el archivo ya existe.
+    """
+    ruta = Path(settings.DATA_VERSION_PATH)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_name(f'.{ruta.name}.{os.getpid()}.{threading.get_ident()}')
+    temporal.write_text(str(version), encoding='ascii')
+    try:
+        if reemplazar:
+            os.replace(temporal, ruta)
+        else:
+            os.link(temporal, ruta)
+    except FileExistsError:
+        return False
+    finally:
+        temporal.unlink(missing_ok=True)
+    return True
+
+
+def data_version():
+    """
+    Versión actual de los datos. Si todavía no existe (primer uso) se crea una nueva.
+    """
+    ruta = Path(settings.DATA_VERSION_PATH)
+    try:
+        return int(ruta.read_text(encoding='ascii'))
+    except FileNotFoundError:
+        pass
+    version = time.time_ns()
+    if not _escribir(version, reemplazar=False):
+        # Otro proceso la creó antes
+        version = int(ruta.read_text(encoding='ascii'))
+    return version
+
+
+def bump_data_version():
+    """
+    Marca los datos como modificados. Dentro de una transacción, el cambio se aplica
+    recién cuando esta se confirma, para no cachear datos que aún no son visibles.
+    """
+    transaction.on_commit(lambda: _escribir(time.time_ns(), reemplazar=True))
+
+
+def versioned_key(*partes):
+    """
+    Clave de caché ligada a la versión actual de los datos.
+    """
+    return ':'.join(['dw_etl', str(data_version()), *map(str, partes)])
@@ -1,137 +1,154 @@
 # dw_etl/views.py
-from django.shortcuts import render
-from django.db.models import F, Case, When, Value, DecimalField
-from django.db.models.functions import Coalesce
-from django.http import HttpResponse, JsonResponse # Importar JsonResponse
-from openpyxl import Workbook
-from openpyxl.styles import Font, Border, Side, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+import hashlib
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition
+from django.utils.text import compress_sequence
 from datetime import datetime
-import json # Importar la librería json
 
-from .models import HechosEconomicos, DimPais, DimIndicadorEconomico, DimFecha
+from .analytics import analytics_report, rankings
+from .artifacts import (
+    FORMATOS_ARTEFACTO, artifact_filters, build_artifact, build_temporary, builder, find_artifact, is_prebuilt,
+)
+from .correlations import correlation_matrices, correlation_report, pair_ranking
+from .crisis import crisis_report
+from .etl.telemetry import run_summary
+from .exports import (
+    LAYOUTS_COLUMNARES, ColumnarUnavailable, ExportFilterError, acompress_sequence, aiter_json_rows, astream_json_array,
+    astream_ndjson, build_columnar_file, filter_hechos, filter_pivot, iter_json_rows, stream_json_array,
+    stream_ndjson,
+)
+from .instrumentation import prometheus_text, registry, serialization
+from .models import DimPais, DimIndicadorEconomico, EpisodioCrisis, EtlRun, HechosEconomicos, HechosGrupoAnio, HechosPaisAnio
+from .series import aaligned_series
+from .versioning import versioned_key
 
 def dashboard_view(request):
     """
     Vista para mostrar un dashboard con los datos económicos históricos.
     Permite seleccionar un año para visualizar y muestra un gráfico de evolución.
+
+    El contexto y la página renderizada se guardan en la caché por año mostrado, con la
+    versión de los datos en la clave: las visitas repetidas no consultan la base de
+    datos y una nueva carga del ETL invalida todo lo anterior.
+    """
+    # La clave usa el año resuelto (no el texto pedido): un ?year= cualquiera no agrega entradas
+    clave_anios = versioned_key('dashboard', 'anios')
+    anios = cache.get(clave_anios)
+    if anios is None:
+        anios = _available_years()
+        cache.set(clave_anios, anios, settings.DASHBOARD_CACHE_TIMEOUT)
+    year = _resolve_year(request.GET.get('year'), anios)
+    clave_pagina = versioned_key('dashboard', 'html', year)
+    html = cache.get(clave_pagina)
+    if html is None:
+        clave_contexto = versioned_key('dashboard', 'contexto', year)
+        context = cache.get(clave_contexto)
+        if context is None:
+            context = build_dashboard_context(year, anios)
+            if 'error_message' not in context:
+                cache.set(clave_contexto, context, settings.DASHBOARD_CACHE_TIMEOUT)
+        with serialization():
+            html = render_to_string('dw_etl/dashboard.html', context, request=request)
+        if 'error_message' not in context:
+            cache.set(clave_pagina, html, settings.DASHBOARD_CACHE_TIMEOUT)
+    return HttpResponse(html)
+
+
+def _available_years():
+    return list(HechosPaisAnio.objects.values_list('anio', flat=True).distinct().order_by('-anio'))
+
+
+def _resolve_year(selected_year, available_years):
+    """
+    Año a mostrar: el pedido si tiene datos; si no (o no es un año), el más reciente
+    disponible.
     """
-    # Recuperar los objetos de indicadores económicos
     try:
-        inflacion_indicador = DimIndicadorEconomico.objects.get(nombre_indicador='Inflación')
-        pib_indicador = DimIndicadorEconomico.objects.get(nombre_indicador='Crecimiento PIB')
-        tipo_cambio_indicador = DimIndicadorEconomico.objects.get(nombre_indicador='Tipo de Cambio Dólar')
-        ipc_indicador = DimIndicadorEconomico.objects.get(nombre_indicador='IPC')
-    except DimIndicadorEconomico.DoesNotExist:
-        return render(request, 'dw_etl/dashboard.html', {'error_message': 'Uno o más indicadores económicos no se encontraron en la base de datos. Por favor, asegúrate de que el comando populate_dw se ejecutó correctamente.'})
+        if int(selected_year) in available_years:
+            return int(selected_year)
+    except (TypeError, ValueError):
+        pass
+    return available_years[0] if available_years else datetime.now().year
+
+
+def build_dashboard_context(selected_year=None, available_years=None):
+    """
+    Calcula el contexto del dashboard para el año pedido (o el más reciente disponible).
+    `available_years` son los años con datos, si ya se leyeron.
+    """
+    # Verificar que existan los indicadores económicos
+    indicadores_requeridos = ['Inflación', 'Crecimiento PIB', 'Tipo de Cambio Dólar', 'IPC']
+    if DimIndicadorEconomico.objects.filter(nombre_indicador__in=indicadores_requeridos).count() < len(indicadores_requeridos):
+        return {'error_message': 'Uno o más indicadores económicos no se encontraron en la base de datos. Por favor, asegúrate de que el comando populate_dw se ejecutó correctamente.'}
 
-    # Obtener todos los años disponibles en DimFecha para el selector
-    available_years_with_data = HechosEconomicos.objects.values_list('id_fecha__anio', flat=True).distinct().order_by('-id_fecha__anio')
-    available_years = sorted(list(available_years_with_data), reverse=True)
+    # Obtener todos los años con datos (desde la tabla pivoteada HechosPaisAnio) para el selector
+    if available_years is None:
+        available_years = _available_years()
 
     # Determinar el año a mostrar (por defecto, el más reciente disponible)
-    selected_year = request.GET.get('year')
-    if selected_year:
-        try:
-            selected_year = int(selected_year)
-            # Si el año seleccionado no está en los disponibles, usar el más reciente
-            if selected_year not in available_years:
-                selected_year = available_years[0] if available_years else datetime.now().year
-        except ValueError:
-            # Si hay un error en el valor del año, usar el más reciente
-            selected_year = available_years[0] if available_years else datetime.now().year
-    else:
-        # Si no se selecciona año, usar el más reciente disponible
-        selected_year = available_years[0] if available_years else datetime.now().year
-    
-    # Obtener el objeto DimFecha para el año seleccionado
-    try:
-        fecha_seleccionada = DimFecha.objects.get(anio=selected_year)
-    except DimFecha.DoesNotExist:
-        # Esto no debería ocurrir si available_years se basa en hechos existentes
-        return render(request, 'dw_etl/dashboard.html', {'error_message': f'No se encontraron datos de fecha para el año {selected_year}. Por favor, selecciona otro año o ejecuta populate_dw.'})
-
-
-    # Preparar un diccionario para almacenar los datos por país para el año seleccionado
-    dashboard_data_dict = {}
-    for pais in DimPais.objects.all().order_by('nombre_pais'):
-        dashboard_data_dict[pais.nombre_pais] = {
-            'nombre_pais': pais.nombre_pais, 'iso': pais.codigo_iso,
-            'inflacion': None, 'pib_crecimiento': None, 'tipo_cambio': None, 'ipc': None,
-        }
-
-    # Recuperar todos los hechos económicos para el año seleccionado
-    hechos = HechosEconomicos.objects.filter(id_fecha=fecha_seleccionada).select_related('id_pais', 'id_indicador')
-
-    for hecho in hechos:
-        pais_nombre = hecho.id_pais.nombre_pais
-        indicador_nombre = hecho.id_indicador.nombre_indicador
-
-        if pais_nombre in dashboard_data_dict:
-            if indicador_nombre == 'Inflación':
-                dashboard_data_dict[pais_nombre]['inflacion'] = hecho.porcentaje_inflacion
-            elif indicador_nombre == 'Crecimiento PIB':
-                dashboard_data_dict[pais_nombre]['pib_crecimiento'] = hecho.variacion_pib_anual
-            elif indicador_nombre == 'Tipo de Cambio Dólar':
-                dashboard_data_dict[pais_nombre]['tipo_cambio'] = hecho.tipo_cambio_usd_local_promedio_cierre
-            elif indicador_nombre == 'IPC':
-                dashboard_data_dict[pais_nombre]['ipc'] = hecho.ipc_o_devaluacion
-
-    # Convertir el diccionario a una lista para pasar al template
-    dashboard_data = list(dashboard_data_dict.values())
+    selected_year = _resolve_year(selected_year, available_years)
 
-    # --- Lógica de Análisis Comparativo (para el año seleccionado) ---
-    best_inflation_country = None
-    min_inflation = float('inf')
-
-    for data in dashboard_data:
-        if data['inflacion'] is not None and data['inflacion'] != 'N/D':
-            try:
-                current_inflation = float(data['inflacion'])
-                if current_inflation < min_inflation:
-                    min_inflation = current_inflation
-                    best_inflation_country = data['nombre_pais']
-            except ValueError:
-                pass # Ignorar si el valor no es un número válido
-
-    # --- Preparar datos para el gráfico de evolución histórica (Chile) ---
-    chile_data = {}
-    try:
-        chile_pais = DimPais.objects.get(nombre_pais='Chile')
-        chile_inflation_facts = HechosEconomicos.objects.filter(
-            id_pais=chile_pais,
-            id_indicador=inflacion_indicador,
-            porcentaje_inflacion__isnull=False
-        ).select_related('id_fecha').order_by('id_fecha__anio')
-
-        chile_pib_facts = HechosEconomicos.objects.filter(
-            id_pais=chile_pais,
-            id_indicador=pib_indicador,
-            variacion_pib_anual__isnull=False
-        ).select_related('id_fecha').order_by('id_fecha__anio')
-
-        chile_inflation_history = [{'year': f.id_fecha.anio, 'value': float(f.porcentaje_inflacion)} for f in chile_inflation_facts]
-        chile_pib_history = [{'year': f.id_fecha.anio, 'value': float(f.variacion_pib_anual)} for f in chile_pib_facts]
-
-        # Combinar y asegurar que los años estén alineados para el gráfico
-        all_chile_years = sorted(list(set([d['year'] for d in chile_inflation_history] + [d['year'] for d in chile_pib_history])))
-        
-        chile_chart_data = {
-            'labels': all_chile_years,
-            'inflation_data': [next((d['value'] for d in chile_inflation_history if d['year'] == year), None) for year in all_chile_years],
-            'pib_data': [next((d['value'] for d in chile_pib_history if d['year'] == year), None) for year in all_chile_years],
-        }
-
-    except DimPais.DoesNotExist:
-        chile_chart_data = None
-        # self.stdout.write(self.style.WARNING('No se encontró el país Chile para el gráfico histórico.'))
-    except DimIndicadorEconomico.DoesNotExist:
-        chile_chart_data = None
-        # self.stdout.write(self.style.WARNING('No se encontraron indicadores para el gráfico histórico de Chile.'))
-    except Exception as e:
-        chile_chart_data = None
-        # self.stdout.write(self.style.ERROR(f'Error al preparar datos históricos de Chile: {e}'))
+    # Filas ya pivoteadas del año seleccionado, por país
+    filas_anio = {
+        fila['id_pais']: fila
+        for fila in HechosPaisAnio.objects.filter(anio=selected_year).values('id_pais', 'inflacion', 'pib_crecimiento', 'tipo_cambio', 'ipc')
+    }
+
+    # Una fila por país (los países sin datos en el año se muestran como N/D)
+    dashboard_data = []
+    for pais in DimPais.objects.order_by('nombre_pais').values('id', 'nombre_pais', 'codigo_iso'):
+        fila = filas_anio.get(pais['id'], {})
+        dashboard_data.append({
+            'nombre_pais': pais['nombre_pais'], 'iso': pais['codigo_iso'],
+            'inflacion': fila.get('inflacion'), 'pib_crecimiento': fila.get('pib_crecimiento'),
+            'tipo_cambio': fila.get('tipo_cambio'), 'ipc': fila.get('ipc'),
+        })
 
+    # --- Lógica de Análisis Comparativo (para el año seleccionado) ---
+    # Se lee de los agregados precalculados por el ETL (HechosGrupoAnio)
+    agregados_anio = HechosGrupoAnio.objects.filter(anio=selected_year, id_indicador__nombre_indicador='Inflación')
+    total_inflacion = agregados_anio.filter(agrupacion='mundo').values('minimo', 'id_pais_minimo__nombre_pais').first()
+    best_inflation_country = total_inflacion['id_pais_minimo__nombre_pais'] if total_inflacion else None
+    min_inflation = total_inflacion['minimo'] if total_inflacion else None
+
+    # Inflación por región: cantidad de países, mediana, mínimo y máximo
+    regional_inflation = list(
+        agregados_anio.filter(agrupacion='region').order_by('grupo').values(
+            'grupo', 'cantidad', 'mediana', 'minimo', 'maximo', 'id_pais_minimo__nombre_pais',
+        )
+    )
+
+    # Rankings del año (puesto y percentil calculados en la base de datos)
+    hechos_anio = HechosEconomicos.objects.filter(anio=selected_year)
+    inflation_ranking = list(rankings(hechos_anio.filter(id_indicador__nombre_indicador='Inflación'), top=5, orden='asc'))
+    growth_ranking = list(rankings(hechos_anio.filter(id_indicador__nombre_indicador='Crecimiento PIB'), top=5, orden='desc'))
+
+    # Episodios de devaluación con recesión más recientes (calculados por el ETL)
+    crisis_episodes = list(
+        EpisodioCrisis.objects.order_by('-anio_fin', 'id_pais__nombre_pais').values(
+            'id_pais__nombre_pais', 'anio_inicio', 'anio_fin', 'crecimiento_minimo', 'devaluacion_maxima', 'anio_devaluacion',
+        )[:10]
+    )
+
+    # Correlación entre la variación del tipo de cambio y el crecimiento del PIB (matrices cacheadas)
+    correlaciones = correlation_matrices()
+    i, j = correlaciones['variables'].index('variacion_tipo_cambio'), correlaciones['variables'].index('crecimiento_pib')
+    negativas, positivas = pair_ranking(correlaciones, 'variacion_tipo_cambio', 'crecimiento_pib')
+    exchange_gdp_correlation = {
+        'global': correlaciones['global'][0][i][j],
+        'global_rezago': correlaciones['global'][1][i][j] if 1 in correlaciones['global'] else None,
+        'negativas': negativas,
+        'positivas': positivas,
+    }
 
     # Preparar el contexto para el template
     context = {
@@ -139,144 +156,340 @@ def dashboard_view(request):
         'current_year': selected_year, # Ahora es el año seleccionado
         'available_years': available_years, # Años para el selector
         'best_inflation_country': best_inflation_country,
-        'min_inflation_value': min_inflation if min_inflation != float('inf') else 'N/D',
-        'chile_chart_data': chile_chart_data, # Datos para el gráfico de Chile
-        'analysis_message_devaluation_recession': "La identificación de periodos donde coinciden una fuerte devaluación con recesión requiere un análisis de series de tiempo y la definición de umbrales para 'fuerte devaluación' y 'recesión' (ej. dos trimestres consecutivos de crecimiento negativo del PIB). Este tipo de análisis se realiza de forma más efectiva en herramientas de BI como Power BI, utilizando el archivo Excel exportado que contiene la data histórica completa.",
-        'analysis_message_exchange_gdp_relation': "La relación entre el tipo de cambio y el crecimiento del PIB es compleja y varía por país y periodo. Generalmente, una devaluación puede hacer las exportaciones más baratas (impulsando el PIB) pero también encarecer las importaciones (afectando el IPC y el poder adquisitivo). Un análisis de correlación y causalidad a lo largo del tiempo es crucial, y se puede realizar eficientemente en Power BI con los datos históricos exportados.",
-        'conclusion_message': "El modelo de Data Warehouse implementado y poblado con datos históricos de la API del Banco Mundial ha demostrado ser efectivo para centralizar y estructurar información económica clave. El dashboard permite una visualización rápida por año y la identificación del país con menor inflación. Para análisis más profundos de tendencias, correlaciones y eventos históricos complejos (como devaluación y recesión, o la relación tipo de cambio-crecimiento), la exportación a Excel para herramientas de BI como Power BI es la vía recomendada, aprovechando la riqueza de la data histórica cargada.",
+        'min_inflation_value': min_inflation if min_inflation is not None else 'N/D',
+        'regional_inflation': regional_inflation,
+        'inflation_ranking': inflation_ranking,
+        'growth_ranking': growth_ranking,
+        'analysis_message_devaluation_recession': (
+            f"Se consideran los años seguidos de crecimiento negativo del PIB (al menos {settings.CRISIS_ANIOS_RECESION}) "
+            f"en que el tipo de cambio subió {settings.CRISIS_UMBRAL_DEVALUACION:g}% o más respecto del año anterior, "
+            f"durante la recesión o hasta {settings.CRISIS_MARGEN_ANIOS} año(s) antes de su inicio. "
+            "Los episodios se recalculan después de cada carga del ETL; la API /api/crisis/ permite probar otros umbrales."
+        ),
+        'crisis_episodes': crisis_episodes,
+        'analysis_message_exchange_gdp_relation': "La relación entre el tipo de cambio y el crecimiento del PIB es compleja y varía por país y periodo. Generalmente, una devaluación puede hacer las exportaciones más baratas (impulsando el PIB) pero también encarecer las importaciones (afectando el IPC y el poder adquisitivo). Abajo, la correlación entre la variación anual del tipo de cambio y el crecimiento del PIB, el mismo año y al año siguiente (más detalle en /api/correlaciones/).",
+        'exchange_gdp_correlation': exchange_gdp_correlation,
+        'conclusion_message': "El modelo de Data Warehouse implementado y poblado con datos históricos de la API del Banco Mundial ha demostrado ser efectivo para centralizar y estructurar información económica clave. El dashboard permite una visualización rápida por año, la identificación del país con menor inflación, los episodios en que una fuerte devaluación coincidió con una recesión y la relación entre tipo de cambio y crecimiento de cada país, calculados directamente sobre el DW. Para otros análisis, las exportaciones a Excel, CSV, JSON o Parquet y las APIs de series, analítica, crisis y correlaciones permiten llevar la data histórica cargada a herramientas de BI como Power BI.",
     }
-    return render(request, 'dw_etl/dashboard.html', context)
-
-
-def export_economic_data_excel(request):
-    """
-    Vista para exportar TODOS los datos económicos históricos a un archivo Excel.
-    """
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="datos_economicos_historicos.xlsx"'
-
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Datos Económicos Históricos"
-
-    # Definir estilos
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    border_style = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-    center_aligned_text = Alignment(horizontal="center", vertical="center")
-
-    # Encabezados de la tabla
-    headers = ["Año", "País", "Código ISO", "Inflación (%)", "Crecimiento PIB (%)", "Tipo Cambio (USD/Local)", "IPC (Índice)"]
-    sheet.append(headers)
-
-    # Aplicar estilos a la fila de encabezados
-    for col_num, header_title in enumerate(headers, 1):
-        cell = sheet.cell(row=1, column=col_num)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.border = border_style
-        cell.alignment = center_aligned_text
-        sheet.column_dimensions[get_column_letter(col_num)].width = 20 # Ajustar ancho de columna
-
-    # Obtener TODOS los hechos económicos históricos
-    # Usamos select_related para optimizar las consultas a DimFecha, DimPais, DimIndicadorEconomico
-    hechos = HechosEconomicos.objects.select_related('id_fecha', 'id_pais', 'id_indicador').order_by('id_fecha__anio', 'id_pais__nombre_pais', 'id_indicador__nombre_indicador')
-
-    # Agrupar los datos para facilitar la exportación por año y país
-    export_data_structured = {}
-    for hecho in hechos:
-        anio = hecho.id_fecha.anio
-        pais_nombre = hecho.id_pais.nombre_pais
-        indicador_nombre = hecho.id_indicador.nombre_indicador
-
-        if anio not in export_data_structured:
-            export_data_structured[anio] = {}
-        if pais_nombre not in export_data_structured[anio]:
-            export_data_structured[anio][pais_nombre] = {
-                'nombre_pais': pais_nombre,
-                'iso': hecho.id_pais.codigo_iso,
-                'inflacion': None,
-                'pib_crecimiento': None,
-                'tipo_cambio': None,
-                'ipc': None,
-            }
-        
-        if indicador_nombre == 'Inflación':
-            export_data_structured[anio][pais_nombre]['inflacion'] = hecho.porcentaje_inflacion
-        elif indicador_nombre == 'Crecimiento PIB':
-            export_data_structured[anio][pais_nombre]['pib_crecimiento'] = hecho.variacion_pib_anual
-        elif indicador_nombre == 'Tipo de Cambio Dólar':
-            export_data_structured[anio][pais_nombre]['tipo_cambio'] = hecho.tipo_cambio_usd_local_promedio_cierre
-        elif indicador_nombre == 'IPC':
-            export_data_structured[anio][pais_nombre]['ipc'] = hecho.ipc_o_devaluacion
-
-    # Escribir los datos en la hoja de cálculo
-    for anio in sorted(export_data_structured.keys()):
-        for pais_nombre in sorted(export_data_structured[anio].keys()):
-            data = export_data_structured[anio][pais_nombre]
-            row_data = [
-                anio,
-                data['nombre_pais'],
-                data['iso'],
-                data['inflacion'] if data['inflacion'] is not None else 'N/D',
-                data['pib_crecimiento'] if data['pib_crecimiento'] is not None else 'N/D',
-                data['tipo_cambio'] if data['tipo_cambio'] is not None else 'N/D',
-                data['ipc'] if data['ipc'] is not None else 'N/D',
-            ]
-            sheet.append(row_data)
-
-    # Guardar el libro de trabajo en la respuesta HTTP
-    workbook.save(response)
+    return context
+
+
+def _versioned_etag(nombre):
+    """
+    ETag de una API JSON o una exportación: depende de los parámetros y de la versión de
+    los datos, por lo que una solicitud condicional se responde con 304 sin consultar la
+    base de datos.
+    """
+    def etag(request, *args, **kwargs):
+        parametros = sorted((clave, valor) for clave, valores in request.GET.lists() for valor in valores)
+        # Los argumentos de la URL (el formato columnar) también distinguen la respuesta
+        parametros += sorted(kwargs.items())
+        return hashlib.sha256(versioned_key(nombre, parametros).encode()).hexdigest()[:32]
+    return etag
+
+
+def _es_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+
+async def _run_sync(request, fn, *args):
+    """
+    Ejecuta código síncrono (ORM, openpyxl, pyarrow) desde una vista async. Con ASGI
+    corre en un hilo del pool, así que varias exportaciones se generan en paralelo sin
+    bloquear el event loop ni al resto de las vistas; con WSGI, en el hilo de la solicitud.
+    """
+    if not _es_asgi(request):
+        return await sync_to_async(fn)(*args)
+
+    def en_hilo():
+        try:
+            return fn(*args)
+        finally:
+            # La conexión de este hilo no la cierra el fin de la solicitud
+            close_old_connections()
+    return await sync_to_async(en_hilo, thread_sensitive=False)()
+
+
+async def _aread_file(archivo, tamano=FileResponse.block_size):
+    leer = sync_to_async(archivo.read, thread_sensitive=False)
+    try:
+        while bloque := await leer(tamano):
+            yield bloque
+    finally:
+        archivo.close()
+
+
+async def _aencode(bloques):
+    async for bloque in bloques:
+        yield bloque.encode()
+
+
+def _attachment(request, archivo, filename, content_type):
+    """
+    Respuesta de descarga de un archivo generado. Con ASGI el archivo se envía con un
+    iterador async: un cliente lento no ocupa un hilo mientras descarga.
+    """
+    if not _es_asgi(request):
+        return FileResponse(archivo, as_attachment=True, filename=filename, content_type=content_type)
+    tamano = archivo.seek(0, os.SEEK_END)
+    archivo.seek(0)
+    response = StreamingHttpResponse(_aread_file(archivo), content_type=content_type)
+    response['Content-Length'] = tamano
+    response['Content-Disposition'] = content_disposition_header(True, filename)
     return response
 
-def export_economic_data_json(request):
-    """
-    Vista para exportar TODOS los datos económicos históricos a un archivo JSON.
-    """
-    # Obtener TODOS los hechos económicos históricos
-    hechos = HechosEconomicos.objects.select_related('id_fecha', 'id_pais', 'id_indicador').order_by('id_fecha__anio', 'id_pais__nombre_pais', 'id_indicador__nombre_indicador')
-
-    # Estructurar los datos en un formato de lista de diccionarios para JSON
-    json_data_structured = []
-    current_row = {}
-    last_key = None # Para agrupar por Año, País, ISO
-
-    for hecho in hechos:
-        current_key = (hecho.id_fecha.anio, hecho.id_pais.nombre_pais, hecho.id_pais.codigo_iso)
-
-        if current_key != last_key:
-            if current_row: # Si ya hay una fila en construcción, añadirla a la lista
-                json_data_structured.append(current_row)
-            
-            # Iniciar una nueva fila
-            current_row = {
-                'anio': hecho.id_fecha.anio,
-                'pais': hecho.id_pais.nombre_pais,
-                'codigo_iso': hecho.id_pais.codigo_iso,
-                'inflacion': None,
-                'crecimiento_pib': None,
-                'tipo_cambio_usd_local': None,
-                'ipc': None,
-            }
-            last_key = current_key
-        
-        # Asignar el valor del indicador a la clave correcta en la fila actual
-        indicador_nombre = hecho.id_indicador.nombre_indicador
-        if indicador_nombre == 'Inflación':
-            current_row['inflacion'] = float(hecho.porcentaje_inflacion) if hecho.porcentaje_inflacion is not None else None
-        elif indicador_nombre == 'Crecimiento PIB':
-            current_row['crecimiento_pib'] = float(hecho.variacion_pib_anual) if hecho.variacion_pib_anual is not None else None
-        elif indicador_nombre == 'Tipo de Cambio Dólar':
-            current_row['tipo_cambio_usd_local'] = float(hecho.tipo_cambio_usd_local_promedio_cierre) if hecho.tipo_cambio_usd_local_promedio_cierre is not None else None
-        elif indicador_nombre == 'IPC':
-            current_row['ipc'] = float(hecho.ipc_o_devaluacion) if hecho.ipc_o_devaluacion is not None else None
-    
-    # Añadir la última fila si existe
-    if current_row:
-        json_data_structured.append(current_row)
-
-    # Crear la respuesta HTTP con el JSON
-    response = JsonResponse(json_data_structured, safe=False, json_dumps_params={'indent': 4})
-    response['Content-Disposition'] = 'attachment; filename="datos_economicos_historicos.json"'
+
+def _attachment_artifact(request, archivo, formato):
+    tipo = FORMATOS_ARTEFACTO[formato]
+    return _attachment(request, archivo, f'datos_economicos_historicos.{tipo.extension}', tipo.content_type)
+
+
+def _serve_artifact(request, ruta, formato):
+    """
+    Descarga de una exportación pre-generada. Con EXPORT_SENDFILE el archivo lo envía el
+    servidor web (X-Sendfile o X-Accel-Redirect) y Django solo responde las cabeceras.
+    """
+    cabecera = settings.EXPORT_SENDFILE
+    if not cabecera:
+        return _attachment_artifact(request, open(ruta, 'rb'), formato)
+    tipo = FORMATOS_ARTEFACTO[formato]
+    filename = f'datos_economicos_historicos.{tipo.extension}'
+    response = HttpResponse(content_type=tipo.content_type)
+    if cabecera == 'X-Accel-Redirect':
+        response[cabecera] = settings.EXPORT_SENDFILE_URL + ruta.relative_to(settings.EXPORT_ARTIFACTS_DIR).as_posix()
+    else:
+        response[cabecera] = str(ruta)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
     return response
 
+
+async def _export_artifact(request, formato):
+    """
+    Sirve la exportación pre-generada para los filtros de la solicitud. Si todavía no
+    existe, la genera (fuera del event loop con ASGI): la guarda para las siguientes si
+    es una de EXPORT_PREBUILD, y si no la envía desde un archivo temporal.
+    """
+    try:
+        filtros = artifact_filters(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    ruta = find_artifact(formato, filtros)
+    if ruta is None and not is_prebuilt(formato, filtros):
+        archivo = await _run_sync(request, build_temporary, formato, filtros)
+        return _attachment_artifact(request, archivo, formato)
+    ruta = ruta or await _run_sync(request, build_artifact, formato, filtros)
+    return _serve_artifact(request, ruta, formato)
+
+
+@condition(etag_func=_versioned_etag('export_excel'))
+async def export_economic_data_excel(request):
+    """
+    Vista para exportar los datos económicos históricos a un archivo Excel, escrito en
+    modo write-only. Se sirve el archivo pre-generado para la versión de los datos.
+
+    Parámetros opcionales: los filtros de la exportación JSON (pais, indicador, desde, hasta).
+    """
+    return await _export_artifact(request, 'xlsx')
+
+
+@condition(etag_func=_versioned_etag('export_csv'))
+async def export_economic_data_csv(request):
+    """
+    Vista para exportar los datos económicos históricos en CSV (las columnas de la
+    exportación JSON). Se sirve el archivo pre-generado para la versión de los datos.
+
+    Parámetros opcionales: los filtros de la exportación JSON (pais, indicador, desde, hasta).
+    """
+    return await _export_artifact(request, 'csv')
+
+
+@condition(etag_func=_versioned_etag('export_json'))
+async def export_economic_data_json(request):
+    """
+    Vista para exportar los datos económicos históricos en JSON. Si ya existe el archivo
+    pre-generado para la versión de los datos y los filtros, se sirve ese archivo; si no,
+    se envía en streaming (con ASGI las filas se leen con `aiterator()`) y, si los
+    filtros son de EXPORT_PREBUILD, el archivo se encarga al pool de segundo plano para
+    las siguientes solicitudes.
+
+    Parámetros opcionales:
+    - formato: 'json' (arreglo, por defecto) o 'ndjson' (una fila por línea).
+    - pais, indicador: códigos ISO / nombres de indicador (repetidos o separados por comas).
+    - desde, hasta: rango de años.
+    - gzip=1: comprime la respuesta (Content-Encoding: gzip); siempre en streaming.
+    """
+    formato = request.GET.get('formato', 'json')
+    if formato not in ('json', 'ndjson'):
+        return JsonResponse({'error': "El parámetro formato debe ser 'json' o 'ndjson'."}, status=400)
+    try:
+        filtros = artifact_filters(request.GET)
+        filas_pivote, claves = filter_pivot(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if request.GET.get('gzip') != '1':
+        ruta = find_artifact(formato, filtros)
+        if ruta is not None:
+            return _serve_artifact(request, ruta, formato)
+        if is_prebuilt(formato, filtros):
+            # La transacción (y la conexión) son las del ORM síncrono
+            await sync_to_async(builder.schedule)(formato, filtros)
+
+    if _es_asgi(request):
+        filas = aiter_json_rows(filas_pivote, claves)
+        contenido = _aencode(astream_ndjson(filas) if formato == 'ndjson' else astream_json_array(filas))
+        if request.GET.get('gzip') == '1':
+            contenido = acompress_sequence(contenido)
+    else:
+        filas = iter_json_rows(filas_pivote, claves)
+        bloques = stream_ndjson(filas) if formato == 'ndjson' else stream_json_array(filas)
+        contenido = (bloque.encode() for bloque in bloques)
+        if request.GET.get('gzip') == '1':
+            contenido = compress_sequence(contenido)
+    content_type = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+
+    response = StreamingHttpResponse(contenido, content_type=f'{content_type}; charset=utf-8')
+    if request.GET.get('gzip') == '1':
+        response['Content-Encoding'] = 'gzip'
+    response['Content-Disposition'] = f'attachment; filename="datos_economicos_historicos.{formato}"'
+    return response
+
+
+@condition(etag_func=_versioned_etag('export_columnar'))
+async def export_economic_data_columnar(request, formato):
+    """
+    Vista para exportar los hechos en formato columnar (Parquet o Arrow IPC) para
+    herramientas de BI, con columnas numéricas tipadas (sin 'N/D').
+
+    Parámetros opcionales: layout ('wide' por defecto, o 'long') y los mismos filtros
+    de la exportación JSON (pais, indicador, desde, hasta). Para datasets particionados
+    por año o país se usa el comando export_columnar.
+    """
+    layout = request.GET.get('layout', 'wide')
+    if layout not in LAYOUTS_COLUMNARES:
+        return JsonResponse({'error': "El parámetro layout debe ser 'wide' o 'long'."}, status=400)
+    try:
+        queryset, claves = (filter_hechos(request.GET), None) if layout == 'long' else filter_pivot(request.GET)
+        archivo = await _run_sync(request, build_columnar_file, formato, layout, queryset, claves)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except ColumnarUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=501)
+
+    content_type = 'application/vnd.apache.parquet' if formato == 'parquet' else 'application/vnd.apache.arrow.file'
+    return _attachment(request, archivo, f'datos_economicos_historicos.{formato}', content_type)
+
+
+def _json(datos):
+    """
+    JsonResponse de una API, midiendo la serialización.
+    """
+    with serialization():
+        return JsonResponse(datos)
+
+
+@condition(etag_func=_versioned_etag('series'))
+async def time_series_api(request):
+    """
+    API JSON de series de tiempo alineadas para cualquier conjunto de países ×
+    indicadores × rango de años.
+
+    Parámetros opcionales (los mismos filtros de la exportación JSON):
+    - pais, indicador: códigos ISO / nombres de indicador (repetidos o separados por comas).
+    - desde, hasta: rango de años.
+
+    Respuesta: {"anios": [...], "series": [{"codigo_iso", "pais", "indicador", "valores": [...]}]},
+    con un valor por año de `anios` en cada serie (null donde no hay dato).
+    """
+    try:
+        datos = await aaligned_series(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _json(datos)
+
+
+@condition(etag_func=_versioned_etag('analitica'))
+def analytics_api(request):
+    """
+    API JSON de analítica sobre los valores anuales, calculada en la base de datos con
+    funciones de ventana.
+
+    Parámetros opcionales: los filtros de la exportación JSON (pais, indicador, desde,
+    hasta) y
+    - tipo=ranking (por defecto): puesto y percentil de los `top` países con menor
+      (orden=asc) o mayor (orden=desc) valor de cada año e indicador.
+    - tipo=series: variación interanual y media móvil de `ventana` años de cada serie.
+
+    Respuesta: {"tipo", ..., "filas": [{"anio", "codigo_iso", "pais", "indicador", "valor", ...}]}.
+    """
+    try:
+        datos = analytics_report(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _json(datos)
+
+
+@condition(etag_func=_versioned_etag('crisis'))
+def crisis_api(request):
+    """
+    API JSON de episodios en que una fuerte devaluación coincide con una recesión.
+
+    Parámetros opcionales:
+    - pais: códigos ISO (repetidos o separados por comas).
+    - desde, hasta: años que debe tocar el episodio.
+    - umbral, anios, margen: otros umbrales (devaluación mínima en %, años de recesión y
+      años de margen previo); el detector se ejecuta al vuelo sin guardar el resultado.
+
+    Respuesta: {"umbrales": {...}, "episodios": [{"codigo_iso", "pais", "anio_inicio", "anio_fin", ...}]}.
+    """
+    try:
+        datos = crisis_report(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _json(datos)
+
+
+@condition(etag_func=_versioned_etag('correlaciones'))
+def correlation_api(request):
+    """
+    API JSON de matrices de correlación entre indicadores (y la variación anual del tipo
+    de cambio), por país y entre todos los países, con rezagos de 0 a `rezagos` años.
+
+    Parámetros opcionales: rezagos (0-10, por defecto 3) y pais (códigos ISO).
+
+    Respuesta: {"variables": [...], "anios": [desde, hasta], "global": {rezago: matriz},
+    "paises": [{"codigo_iso", "pais", "matrices": {rezago: matriz}}]}; la celda [i][j]
+    correlaciona la variable i en el año t con la variable j en t + rezago (null si hay
+    pocos datos).
+    """
+    try:
+        datos = correlation_report(request.GET)
+    except ExportFilterError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return _json(datos)
+
+
+def etl_runs_api(request):
+    """
+    API JSON de las últimas ejecuciones del ETL (tabla EtlRun), de la más reciente a la
+    más antigua: tiempos por etapa, solicitudes, bytes, caché, hechos insertados /
+    actualizados / sin cambios, errores y rendimiento.
+
+    Parámetros opcionales: limite (1-100, por defecto 20).
+    """
+    try:
+        limite = int(request.GET.get('limite') or 20)
+    except ValueError:
+        limite = 0
+    if not 1 <= limite <= 100:
+        return JsonResponse({'error': 'El parámetro limite debe ser un entero entre 1 y 100.'}, status=400)
+    return _json({'ejecuciones': [run_summary(e) for e in EtlRun.objects.order_by('-inicio')[:limite]]})
+
+
+def metrics_view(request):
+    """
+    Métricas de las vistas de este proceso (solicitudes, consultas SQL, tiempo en la
+    base de datos y de serialización, bytes y duración) en el formato de texto de
+    Prometheus, por vista.
+    """
+    return HttpResponse(prometheus_text(registry.snapshot()), content_type='text/plain; version=0.0.4; charset=utf-8')